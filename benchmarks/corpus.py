@@ -0,0 +1,114 @@
+'''
+
+benchmarks.corpus
+
+Seeded generator of synthetic .mala templates. The same seed and size
+always give the same template, so runs on different commits compare the
+same input. A template covers what the lexer and compiler care about:
+nested [for]/[if]/[switch]/[cache] blocks, injections with strings and
+braces inside, actions, comments, <style>/<script> elements and escapes.
+
+The names the template uses are all defined by its own [script/] block,
+so it renders without any context.
+
+'''
+
+import random
+
+SCRIPT = '''[script/]
+rows  = [{"id": i, "name": f"row {i}", "price": i * 3 % 97, "tags": ["a", "b"][: i % 3]} for i in range(40)]
+user  = {"name": "Jane", "admin": True, "lang": "en"}
+title = "Synthetic page"
+def money(value):
+    return f"${value:.2f}"
+def label(row):
+    return "{" + row["name"] + "}"
+[/script]
+'''
+
+WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit",
+         "sed", "do", "eiusmod", "tempor", "incididunt", "labore", "magna", "aliqua")
+
+class MalangeCorpus:
+    '''Builds one template from a seed.'''
+    def __init__(self, seed: int = 0, depth: int = 3):
+        '''
+            parameter:
+                seed  int : Seed of the generator.
+                depth int : Deepest nesting of blocks.
+        '''
+        self.random : random.Random = random.Random(seed)
+        self.depth  : int           = depth
+        self.blocks : int           = 0 # Blocks made, to vary the names of loop targets.
+
+    def words(self, low: int = 3, high: int = 12) -> str:
+        return " ".join(self.random.choice(WORDS) for _ in range(self.random.randint(low, high)))
+    def static(self) -> str:
+        '''Plain HTML, with the odd comment and escape.'''
+        kind = self.random.random()
+        if kind < 0.08:
+            return f"<!-- {self.words()} [not a block] ${{not an injection}} -->\n"
+        if kind < 0.14:
+            return f"<p>Escaped: \\[{self.random.choice(WORDS)}\\] and \\${{literal\\}}</p>\n"
+        if kind < 0.18:
+            return ("<style>\n.card > h2 { color: #333; } /* " + self.words() + " */\n"
+                    ".card:hover { box-shadow: 0 0 4px #999; }\n</style>\n")
+        if kind < 0.21:
+            return "<script>\nif (a > b && c < d) { console.log('" + self.random.choice(WORDS) + "'); }\n</script>\n"
+        tag = self.random.choice(("p", "span", "div", "li", "em"))
+        return f"<{tag} class=\"{self.random.choice(WORDS)}\">{self.words()}</{tag}>\n"
+    def injection(self, row: str) -> str:
+        '''An injection, reading the loop target if there is one.'''
+        choices = ['${title}', '${user["name"]}', '${money(3.5)}', '${len(rows)}',
+                   '${ {"a": 1, "b": 2}["b"] }', '${"}" + "{" if user["admin"] else \'\'}']
+        if row:
+            choices += [f'${{{row}["name"]}}', f'${{money({row}["price"])}}', f'${{label({row})}}',
+                        f'${{", ".join({row}["tags"]) or "none"}}']
+        return f"<b>{self.random.choice(choices)}</b>\n"
+    def action(self) -> str:
+        return f"<button @{{on.click(lambda: None)}}>{self.random.choice(WORDS)}</button>\n"
+    def block(self, level: int, row: str) -> str:
+        '''A block with a body, nesting further while level allows.'''
+        self.blocks += 1
+        kind = self.random.random()
+        if kind < 0.35:
+            target = f"r{self.blocks}"
+            iterable = f"rows[:{self.random.randint(1, 6)}]"
+            key = f' key={target}["id"]' if self.random.random() < 0.3 else ""
+            return f"[for {target} in {iterable}{key}/]\n{self.body(level + 1, target)}[/for]\n"
+        if kind < 0.65:
+            text = (f"[if user[\"admin\"] and {self.random.randint(0, 9)} > 4/]\n{self.body(level + 1, row)}"
+                    f"[/elif user[\"lang\"] == \"de\"/]\n{self.body(level + 1, row)}")
+            if self.random.random() < 0.5:
+                text += f"[/else/]\n{self.body(level + 1, row)}"
+            return text + "[/if]\n"
+        if kind < 0.85:
+            return (f"[switch user[\"lang\"]/]\n[/case \"en\"/]\n{self.body(level + 1, row)}"
+                    f"[/case \"fr\" | \"de\"/]\n{self.body(level + 1, row)}[/case _/]\n{self.static()}[/switch]\n")
+        return f"[cache (\"c\", {self.blocks}) ttl=60/]\n{self.body(level + 1, row)}[/cache]\n"
+    def body(self, level: int, row: str = "") -> str:
+        '''A few sections, blocks only while level < depth.'''
+        parts = []
+        for _ in range(self.random.randint(2, 5)):
+            kind = self.random.random()
+            if kind < 0.25 and level < self.depth:
+                parts.append(self.block(level, row))
+            elif kind < 0.55:
+                parts.append(self.injection(row))
+            elif kind < 0.6:
+                parts.append(self.action())
+            else:
+                parts.append(self.static())
+        return "".join(parts)
+    def __call__(self, size: int) -> str:
+        '''Return a template of at least size characters.'''
+        parts, length = [SCRIPT], len(SCRIPT)
+        while length < size:
+            part = f"<section>\n{self.body(0)}</section>\n"
+            parts.append(part)
+            length += len(part)
+        return "".join(parts)
+
+def generate(size: int, seed: int = 0, depth: int = 3) -> str:
+    '''Return a template of at least size characters, the same for the same arguments.'''
+    return MalangeCorpus(seed, depth)(size)
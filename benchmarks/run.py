@@ -0,0 +1,210 @@
+'''
+
+benchmarks.run
+
+Benchmarks of the hot path of malange_core, on a template made by
+benchmarks.corpus:
+- lex_mbs, lex_stream_mbs : Lexing throughput of LexerHeader and of an mmap LexerStreamHeader.
+- compile_ms              : compile_template, lexing included.
+- render_p50_us ...       : Latency percentiles of render_bytes.
+- *_peak_kb               : Peak memory traced by tracemalloc while lexing, compiling and rendering.
+- startup_cold_ms ...     : MalangeProject startup on a project of such templates, with an
+                            empty __malacache__ and with a full one, in a fresh interpreter.
+
+Usage, from the repository root:
+    python -m benchmarks.run run --output base.json
+    python -m benchmarks.run run --output new.json
+    python -m benchmarks.run compare base.json new.json --threshold 10
+
+compare exits with 1 when a metric is worse than the base by more than
+threshold percent, so it can gate a change.
+
+'''
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+
+from typing import Any, Callable
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "packages", "malange_core", "src")
+if SOURCE not in sys.path: # Run from a checkout, without installing it.
+    sys.path.insert(0, SOURCE)
+
+from malange_core.internal.engine.lexer.main import LexerMain
+from malange_core.internal.engine.lexer.processor import LexerHeader
+from malange_core.internal.engine.lexer.stream import LexerStreamHeader
+from malange_core.internal.engine.compiler import compile_template
+from malange_core.internal.engine.render import render_bytes
+
+from benchmarks.corpus import generate
+
+# Metric -> True if higher is better. Metrics not in here are not compared.
+METRICS: dict[str, bool] = {
+    "lex_mbs"          : True,
+    "lex_stream_mbs"   : True,
+    "compile_ms"       : False,
+    "render_p50_us"    : False,
+    "render_p90_us"    : False,
+    "render_p99_us"    : False,
+    "lex_peak_kb"      : False,
+    "compile_peak_kb"  : False,
+    "render_peak_kb"   : False,
+    "startup_cold_ms"  : False,
+    "startup_warm_ms"  : False,
+}
+
+def best(function: Callable[[], Any], repeat: int) -> float:
+    '''Return the fastest of repeat calls, in seconds.'''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def peak(function: Callable[[], Any]) -> float:
+    '''Return the peak memory traced while function runs, in KB.'''
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+def percentile(values: list[float], share: float) -> float:
+    '''Return the value at share (0 to 1) of the sorted values, nearest rank.'''
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+def lex(source: str) -> None:
+    LexerMain(LexerHeader(source, "bench.mala", "")).process()
+
+def lex_stream(path: str) -> None:
+    LexerMain(LexerStreamHeader.map(path, "bench.mala", os.path.dirname(path))).process()
+
+def project(directory: str, source: str, pages: int) -> None:
+    '''Write a project of pages templates, the same one in different directories.'''
+    os.makedirs(os.path.join(directory, "pages"), exist_ok=True)
+    for index in range(pages):
+        name = "index.mala" if index == 0 else os.path.join("pages", f"page{index}.mala")
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as file:
+            file.write(source)
+
+STARTUP = '''
+import sys, time, types
+sys.path.insert(0, {source!r})
+start = time.perf_counter()
+from malange_core.internal.manager.project import MalangeProject
+from malange_core.internal.manager.config import MalangeModeType
+conf = types.ModuleType("config")
+conf.MODE, conf.PLUGINS = MalangeModeType.NORMAL, {{}}
+conf.GATEWAY    = type("GATEWAY", (), {{}})
+conf.MIDDLEWARE = type("MIDDLEWARE", (), {{}})
+conf.ENGINE     = type("ENGINE", (), {{"EXECUTIVES": {{}}}})
+MalangeProject()(conf, {directory!r})
+print(time.perf_counter() - start)
+'''
+
+def startup(directory: str) -> float:
+    '''Return the startup time of a project, in a new interpreter since the logger is global.'''
+    result = subprocess.run([sys.executable, "-c", STARTUP.format(source=SOURCE, directory=directory)],
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.split()[-1])
+
+def run(size: int, seed: int, repeat: int, pages: int) -> dict[str, Any]:
+    '''Run every benchmark, return the results.'''
+    source  = generate(size, seed)
+    results = {"size": len(source), "seed": seed, "repeat": repeat,
+               "python": platform.python_version(), "machine": platform.machine()}
+    megabytes = len(source.encode("utf-8")) / 1e6
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.mala")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(source)
+        results["lex_mbs"]        = megabytes / best(lambda: lex(source), repeat)
+        results["lex_stream_mbs"] = megabytes / best(lambda: lex_stream(path), repeat)
+        results["lex_peak_kb"]    = peak(lambda: lex(source))
+    template = compile_template(source, "bench.mala")
+    results["compile_ms"]      = best(lambda: compile_template(source, "bench.mala"), repeat) * 1e3
+    results["compile_peak_kb"] = peak(lambda: compile_template(source, "bench.mala"))
+    render_bytes(template) # Warm up, the [cache/] blocks are filled by the first render.
+    times = []
+    for _ in range(max(repeat * 20, 100)):
+        start = time.perf_counter()
+        render_bytes(template)
+        times.append(time.perf_counter() - start)
+    results["render_p50_us"]  = percentile(times, 0.50) * 1e6
+    results["render_p90_us"]  = percentile(times, 0.90) * 1e6
+    results["render_p99_us"]  = percentile(times, 0.99) * 1e6
+    results["render_peak_kb"] = peak(lambda: render_bytes(template))
+    directory = tempfile.mkdtemp()
+    try:
+        project(directory, source, pages)
+        results["startup_cold_ms"] = startup(directory) * 1e3 # Fills __malacache__.
+        results["startup_warm_ms"] = statistics.median(startup(directory) for _ in range(repeat)) * 1e3
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+def compare(base: dict[str, Any], new: dict[str, Any], threshold: float) -> list[str]:
+    '''Print a table of the metrics in both, return the regressions past threshold percent.'''
+    regressions = []
+    print(f"{'metric':<18} {'base':>12} {'new':>12} {'change':>9}")
+    for metric, higher in METRICS.items():
+        if metric not in base or metric not in new or not base[metric]:
+            continue
+        change = (new[metric] - base[metric]) / base[metric] * 100
+        worse  = -change if higher else change # Positive when the new result is worse.
+        flag   = ""
+        if worse > threshold:
+            flag = "  REGRESSION"
+            regressions.append(metric)
+        print(f"{metric:<18} {base[metric]:>12.2f} {new[metric]:>12.2f} {change:>+8.1f}%{flag}")
+    return regressions
+
+def main(argv: list[str] = None) -> int:
+    parser   = argparse.ArgumentParser(prog="benchmarks.run", description="Benchmarks of malange_core.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    running  = commands.add_parser("run", help="Run the benchmarks.")
+    running.add_argument("--size",   type=int, default=200_000, help="Characters of the template.")
+    running.add_argument("--seed",   type=int, default=0,       help="Seed of the corpus.")
+    running.add_argument("--repeat", type=int, default=5,       help="Runs per timing, the best is kept.")
+    running.add_argument("--pages",  type=int, default=20,      help="Templates of the startup project.")
+    running.add_argument("--output", help="Write the results to this JSON file.")
+    comparing = commands.add_parser("compare", help="Compare two results, exit with 1 on a regression.")
+    comparing.add_argument("base")
+    comparing.add_argument("new")
+    comparing.add_argument("--threshold", type=float, default=10.0, help="Percent a metric may worsen.")
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        results = run(args.size, args.seed, args.repeat, args.pages)
+        text    = json.dumps(results, indent=2)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as file:
+                file.write(text + "\n")
+        print(text)
+        return 0
+    with open(args.base, encoding="utf-8") as file:
+        base = json.load(file)
+    with open(args.new, encoding="utf-8") as file:
+        new = json.load(file)
+    if (base.get("size"), base.get("seed")) != (new.get("size"), new.get("seed")):
+        print("warning: the results are from different corpora.", file=sys.stderr)
+    regressions = compare(base, new, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed past {args.threshold}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
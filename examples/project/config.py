@@ -1,13 +1,15 @@
 from malange_core.internal.manager.config import MalangeModeType
+from malange_core.internal.engine.executive.css import MalangeCSSExecutive
 
 MODE    = MalangeModeType.DEBUG
 PLUGINS = {}
 
 class GATEWAY:
-    pass
+    WORKERS = None # Workers of `malange serve`, None for the CPU count.
+    STATS   = None # Path serving the counters of the workers as JSON, e.g. "/__workers__".
 
 class MIDDLEWARE:
-    pass
+    CHAIN = [] # MalangeMiddleware classes around every page, outermost first.
 
 class ENGINE:
     EXECUTIVES = {
@@ -17,3 +19,6 @@ class ENGINE:
             }
         }
     }
+
+class EXPORT: # Optional, used by `malange build`, see MalangeProject.export().
+    OUTPUT = "dist" # Where the static files go.
@@ -0,0 +1,37 @@
+'''
+
+    malange_core.api.engine
+
+    Provides the engine API used inside [script/] blocks.
+
+    - react(value, kind)      : A reactive value, injections and bindings reading it are updated.
+    - computed(function)      : A value derived from reactive values, cached until one changes.
+    - effect(function, callback) : Run function again whenever what it read changes.
+    - batch()                 : Context manager, the changes made inside it are flushed once.
+    - Markup(html)            : A str injected as it is, ${ ... } escapes everything else.
+    - escape(value)           : The value escaped as Markup, for building HTML in a script.
+
+    Changes made in the same tick of a running event loop are batched as well.
+    Injections are updated on a live page, see MalangeEngine.live(); a page
+    rendered once reads its values once.
+
+'''
+
+from typing import Any, Callable, Optional
+
+from malange_core.internal.engine.reactive import (GRAPH, MalangeReact,
+                                                   MalangeComputed, MalangeEffect)
+from malange_core.internal.engine.markup import Markup, escape
+
+def react(value: Any, kind: Optional[type] = None) -> MalangeReact:
+    '''Create a reactive value, kind (if given) is checked on every change.'''
+    return MalangeReact(value, kind)
+def computed(function: Callable[[], Any]) -> MalangeComputed:
+    '''Create a value derived from reactive values.'''
+    return MalangeComputed(function)
+def effect(function: Callable[[], Any], callback: Optional[Callable[[Any], None]] = None) -> MalangeEffect:
+    '''Run function now and whenever a reactive value it read changes, callback gets the result.'''
+    return MalangeEffect(function, callback)
+def batch():
+    '''Group several changes into one flush.'''
+    return GRAPH.batch()
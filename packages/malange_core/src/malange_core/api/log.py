@@ -6,7 +6,7 @@
 
     How it works is:
     - During locking (stored in Logger.LOCK), Logger is still in the configuration phase.
-    - That means setting up basicConfig, and the only valid logger name is malange_core
+    - That means setting up the output pipeline, and the only valid logger name is malange_mgr
     - During locking, other components are not permitted to run. Thus you must init with no name.
     - Then, you must call the instance to feed the project name. The data will be stored in Logger.NAME
     - After that, self.conf() is called with argument of the log level in accordance to the mode.
@@ -16,14 +16,45 @@
     - Post-locking, if you init with no name, we assume you to be a malange project. But there can
         only be one chance to init. The moment you try to init again, it will throw error. The bool
         is Logger.PROJ.
-    - 
+    - Every component (malange_mgr, malange_proj, each plugin) has its own logging.Logger, and so
+        its own level. conf() takes the levels of the components that should not use the mode's.
+
+    How a message goes out:
+    - Pass the arguments instead of formatting them, log.info("Loaded %d templates.", count), the
+        message is only formatted if the level is enabled. A disabled level costs one check.
+    - Records are put on a queue and written by a QueueListener thread, so the thread that logs
+        never waits on the stream. Arguments are formatted in that thread too, so they should not
+        be changed after the call. The queue is drained when the interpreter exits.
+    - A forked child starts a listener of its own. It is stopped at exit like the one of the parent,
+        and by multiprocessing in its workers (e.g. of a ProcessPoolExecutor), which end with
+        os._exit(). Another child that ends with os._exit() should call MalangeLogger.stop() first
+        so what it logged is written.
 
 '''
 
+import os
 import sys
+import queue
+import atexit
 import logging
+import logging.handlers
+import multiprocessing.util
+
+from typing import Any, Literal, Optional
+
+FORMAT: str = "%(asctime)s [%(levelname)s] %(name)s : %(message)s"
 
-from typing import Literal, Optional, TYPE_CHECKING
+class MalangeQueueHandler(logging.handlers.QueueHandler):
+    '''Puts records on the queue as they are, the listener thread formats them.'''
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record # The queue never leaves the process, so the record needs no pickling.
+
+def finalize(logger: type) -> None:
+    '''
+        Stop the listener of a multiprocessing worker, which ends with os._exit() once its
+        finalizers ran. It is the last one, so what the others log is written too.
+    '''
+    multiprocessing.util.Finalize(None, logger.stop, exitpriority=-100)
 
 class MalangeLogger:
     '''Logging API for Malange.'''
@@ -32,39 +63,83 @@ class MalangeLogger:
     LOCK    : bool                     = True   # Check if the Logger is locked or not.
     PROJ    : bool                     = False  # Check if project logger has been initialized or not.
     PLUGINS : dict[str, bool]          = {}     # Check if plugin logger has been initialized or not.
+    # OUTPUT PIPELINE
+    LEVEL    : int                                     = logging.WARNING # Level of the mode.
+    LEVELS   : dict[str, int]                          = {}   # Levels of components set by conf().
+    HANDLER  : Optional[logging.Handler]               = None # Shared by the component loggers.
+    LISTENER : Optional[logging.handlers.QueueListener] = None
+    RUNNING  : bool                                    = False # LISTENER is started in this process.
     def __init__(self, name: str = ""):
         '''Set up locking phase and system of logger registration.'''
         if MalangeLogger.LOCK: # During locking, that means Logger is still in the configuration phase.
-            logging.basicConfig(
-                level=logging.WARNING,
-                format="%(asctime)s [%(levelname)s] %(message)s"
-            )
-            if name == "": # As such, the only valid component is the core.
-                self.name = "malange_mgr"
-            else:
+            MalangeLogger.pipeline()
+            self.name = "malange_mgr" # As such, the only valid component is the core.
+            self.__setup()
+            if name != "":
                 self.error("The only component allowed during logging LOCK is MGR.")
         else: # But if locking is no longer enabled, anything can run.
+            self.name = name or "malange_proj"
+            self.__setup()
             if name == "": # If no name is provided, auto-assume malange project.
                 if MalangeLogger.PROJ:
-                    self.critical("Project logger has been initialized.")
-                self.name = "malange_proj"
+                    self.critical("Project logger has been initialized.", RuntimeError)
                 MalangeLogger.PROJ = True # You can't initialize again.
             else: # If name is provided, auto-assume malange plugin.
-                if name in MalangeLogger.PLUGINS: # Check if the plugin is installed.
-                    if not MalangeLogger.PLUGINS[name]: # Check if the plugin has been initialized.
-                        self.name = name
-                    else:
-                        self.critical(f"Plugin logger by the name of {name} has been initialized.")
-                else:
+                if name not in MalangeLogger.PLUGINS: # Check if the plugin is installed.
                     self.critical(
-    f"Plugin logger by the name of {name} does not exist in the PLUGINS project config entity.") 
-    def conf(self, log: Literal[10, 20, 30, 40, 50]) -> None:
-        '''Configure the logger to exit locking phase with proper configuration.'''
-        if MalangeLogger.LOCK: # If LOCK is True, set up basicConfig again
-            logging.basicConfig(
-                level=log,
-                format="%(asctime)s [%(levelname)s] %(message)s"
-            )
+    f"Plugin logger by the name of {name} does not exist in the PLUGINS project config entity.", KeyError)
+                if MalangeLogger.PLUGINS[name]: # Check if the plugin has been initialized.
+                    self.critical(f"Plugin logger by the name of {name} has been initialized.", RuntimeError)
+                MalangeLogger.PLUGINS[name] = True
+    def __setup(self) -> None:
+        '''Attach the logger of this component to the queue.'''
+        self.__logger: logging.Logger = logging.getLogger(self.name)
+        self.__logger.propagate = False # Not written twice if the root logger has handlers.
+        if MalangeLogger.HANDLER not in self.__logger.handlers:
+            self.__logger.addHandler(MalangeLogger.HANDLER)
+        self.__logger.setLevel(MalangeLogger.LEVELS.get(self.name, MalangeLogger.LEVEL))
+    @classmethod
+    def pipeline(cls) -> None:
+        '''Start the queue and its listener thread, once per process.'''
+        if cls.LISTENER is not None:
+            return
+        stream = logging.StreamHandler(sys.stderr)
+        stream.setFormatter(logging.Formatter(FORMAT))
+        records      = queue.SimpleQueue()
+        cls.HANDLER  = MalangeQueueHandler(records)
+        cls.LISTENER = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+        cls.LISTENER.start()
+        cls.RUNNING  = True
+        atexit.register(cls.stop) # Inherited by forked children, where it stops their own listener.
+        os.register_at_fork(after_in_child=cls.forked)
+        multiprocessing.util.register_after_fork(cls, finalize)
+    @classmethod
+    def forked(cls) -> None:
+        '''Start a listener in a forked child, the thread of the parent does not run there.'''
+        records = queue.SimpleQueue() # The queue of the parent may hold records it writes itself.
+        cls.HANDLER.queue = records
+        cls.LISTENER = logging.handlers.QueueListener(records, *cls.LISTENER.handlers, respect_handler_level=True)
+        cls.LISTENER.start()
+        cls.RUNNING  = True
+    @classmethod
+    def stop(cls) -> None:
+        '''Write what is left on the queue and stop the listener of this process, if it runs.'''
+        if cls.RUNNING:
+            cls.RUNNING = False
+            cls.LISTENER.stop()
+    def conf(self, log: Literal[10, 20, 30, 40, 50], levels: Optional[dict[str, int]] = None) -> None:
+        '''
+            Configure the logger to exit locking phase with proper configuration.
+
+            parameter:
+                log    int  : Level of the mode, used by the components not in levels.
+                levels dict : Component name -> level, e.g. {"malange_proj": logging.DEBUG}.
+        '''
+        if MalangeLogger.LOCK: # If LOCK is True, set the levels of the components.
+            MalangeLogger.LEVEL  = log
+            MalangeLogger.LEVELS = dict(levels or {})
+            for name in ("malange_mgr", "malange_proj", *MalangeLogger.PLUGINS):
+                logging.getLogger(name).setLevel(MalangeLogger.LEVELS.get(name, log))
             MalangeLogger.LOCK = False
         else:
             self.error("self.conf of Logger can only be run during locking phase.")
@@ -74,28 +149,41 @@ class MalangeLogger:
             MalangeLogger.PLUGINS = dict.fromkeys(name, False)
         else:
             self.error("self.plugin of Logger can only be run during locking phase.")
+    def level(self, log: int) -> None:
+        '''Change the level of this component, e.g. to debug a plugin in production.'''
+        MalangeLogger.LEVELS[self.name] = log
+        self.__logger.setLevel(log)
+    def enabled(self, log: int) -> bool:
+        '''Return True if a message of that level is written, to skip building costly arguments.'''
+        return self.__logger.isEnabledFor(log)
 
     # LOGGING SYSTEM
-    def debug(self, msg: str):
+    def debug(self, msg: str, *args: Any):
         '''For debug logging.'''
-        logging.debug(f"{self.name} : {msg}")
-    def info(self, msg: str):
+        if self.__logger.isEnabledFor(logging.DEBUG):
+            self.__logger.debug(msg, *args, stacklevel=2)
+    def info(self, msg: str, *args: Any):
         '''For info logging.'''
-        logging.info(f"{self.name} : {msg}")    
-    def warning(self, msg: str):
+        if self.__logger.isEnabledFor(logging.INFO):
+            self.__logger.info(msg, *args, stacklevel=2)
+    def warning(self, msg: str, *args: Any):
         '''For warning logging.'''
-        logging.warning(f"{self.name} : {msg}")
-    def error(self, msg: str):
+        if self.__logger.isEnabledFor(logging.WARNING):
+            self.__logger.warning(msg, *args, stacklevel=2)
+    def error(self, msg: str, *args: Any):
         '''For error logging.'''
-        logging.error(f"{self.name} : {msg}")
-    def critical(self, msg: str, error: Optional[Exception] = None):
-        '''For critical logging.'''
+        if self.__logger.isEnabledFor(logging.ERROR):
+            self.__logger.error(msg, *args, stacklevel=2)
+    def critical(self, msg: str, error: Optional[Exception] = None, *args: Any):
+        '''For critical logging, then raise error (an exception, or a class raised with msg % args).'''
         has_exception: bool = sys.exc_info()[0] is not None
-        logging.critical(f"{self.name} : {msg}", exc_info=has_exception)
+        self.__logger.critical(msg, *args, exc_info=has_exception, stacklevel=2)
         if error is None: # If no error is passed.
             raise
         elif isinstance(error, Exception): # If error is passed.
-            raise error()
+            raise error
+        elif isinstance(error, type) and issubclass(error, Exception): # If error class is passed.
+            raise error(msg % args if args else msg)
         else: # If error is not an exception.
-            logging.critical(f"{self.name} : Passed error object is not an exception.", exc_info=has_exception)
+            self.__logger.critical("Passed error object is not an exception.", exc_info=has_exception)
             raise
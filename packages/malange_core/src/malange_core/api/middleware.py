@@ -0,0 +1,17 @@
+'''
+
+    malange_core.api.middleware
+
+    Provides the middleware API, listed in MIDDLEWARE.CHAIN of the project config.
+
+    - MalangeMiddleware : Base class, override request(context) and/or response(context, response).
+    - MalangeResponse   : Returned by request() to answer in place of the page.
+    - PAGE              : Context key of the template being served.
+
+    How the chain runs is described in malange_core.internal.middleware.
+
+'''
+
+from malange_core.internal.middleware import PAGE, MalangeMiddleware, MalangeResponse
+
+__all__ = ["PAGE", "MalangeMiddleware", "MalangeResponse"]
@@ -0,0 +1,35 @@
+'''
+
+    malange_core.api.profile
+
+    Provides the profiler API, to see where the time of a project goes.
+
+    - enable()   : Start recording, PROFILE in the project config does it at startup.
+    - disable()  : Stop recording, what was recorded is kept.
+    - snapshot() : The stats, {phase: {key: {count, total_ns, mean_ns, max_ns}}}.
+    - reset()    : Drop what was recorded.
+    - dump(path) : Write a snapshot as JSON.
+
+    The phases and their keys are listed in malange_core.internal.manager.profile.
+
+'''
+
+from typing import Any
+
+from malange_core.internal.manager.profile import PROFILER
+
+def enable() -> None:
+    '''Start recording.'''
+    PROFILER.enable()
+def disable() -> None:
+    '''Stop recording, the stats are kept.'''
+    PROFILER.enable(False)
+def snapshot() -> dict[str, dict[str, dict[str, Any]]]:
+    '''Return a copy of the stats.'''
+    return PROFILER.snapshot()
+def reset() -> None:
+    '''Drop the stats.'''
+    PROFILER.reset()
+def dump(path: str) -> None:
+    '''Write the stats to path as JSON.'''
+    PROFILER.dump(path)
@@ -4,25 +4,197 @@ malange_core.internal.engine
 
 This contains all files regarding the machinary to handle engines.
 - Lexer base class and systems to manage it.
-- Parser to construct a full AST from it.
+- Parser to construct a full AST from it, stored as a flat arena of arrays.
+- Compiled templates and their __malacache__.
+- Rendering compiled templates, and the fragment cache of [cache/] blocks.
+- Live pages, patched region by region as their reactive values change.
+- Reloading a template after an edit, lexing again only what changed.
 
 '''
 
-from typing import TYPE_CHECKING
+import os
+import time
 
-from malange_core.internal.engine.executive import MalangeExecutive
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterator, Optional
+
+from malange_core.internal.engine.executive import ExecutiveTable, MalangeExecutive, executive_table
+from malange_core.internal.engine.compiler import MalangeTemplate, compile_template
+from malange_core.internal.engine.cache import CACHE_DIR, MalangeCache, engine_key, source_digest
+from malange_core.internal.engine.build import MalangeBuild, build
+from malange_core.internal.engine.render import STREAM_CHUNK, live, prepare, render_bytes, stream, stream_async
+from malange_core.internal.engine.live import MalangeLivePage
+from malange_core.internal.engine.script import load_source
+from malange_core.internal.engine.fragment import MalangeFragments, MemoryFragments
+from malange_core.internal.engine.lexer.main import LexerMain
+from malange_core.internal.engine.lexer.processor import LexerHeader
+from malange_core.internal.engine.lexer.incremental import LexerIncremental, difference
+from malange_core.internal.manager.profile import PROFILER, profiled, profiled_async
 
 if TYPE_CHECKING: # To prevent circular imports, only import for type checking.
     from malange_core.internal.manager.project import MalangeProject
 
+def find_executives(tree: dict) -> Iterator[type]:
+    '''Yield every executive class in the nested EXECUTIVES dict.'''
+    for value in tree.values():
+        if isinstance(value, dict):
+            yield from find_executives(value)
+        else:
+            yield value
+
+def find_templates(pwd: str) -> Iterator[str]:
+    '''Yield the path of every .mala file under pwd, skipping hidden and cache directories.'''
+    for root, dirs, files in os.walk(pwd):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d != CACHE_DIR)
+        for name in sorted(files):
+            if name.endswith(".mala"):
+                yield os.path.join(root, name)
+
 class MalangeEngine:
-    def __init__(self, project: MalangeProject):
-        self.__proj: MalangeProject = project
+    def __init__(self, project: 'MalangeProject'):
+        self.__proj: 'MalangeProject' = project
         self.__conf                 = project.ENGINE
         self.__log                  = project.log
         self.__run()
+    @property
+    def log(self):
+        '''The logger of the project.'''
+        return self.__log
     def __run(self):
         try:
             self.__exec: dict[str, MalangeExecutive] = self.__conf.EXECUTIVES
         except AttributeError:
             self.__log.critical("EXECUTIVES is not found as an attr of ENGINE config entity.")
+        try: # Resolved once, one instance per executive class.
+            self.executives: ExecutiveTable = executive_table(self.__exec)
+        except TypeError as error:
+            self.__log.critical(str(error), TypeError)
+        self.cache     : MalangeCache               = MalangeCache(engine_key(find_executives(self.__exec)),
+                                                                   self.executives)
+        self.templates : dict[str, MalangeTemplate] = {}
+        self.lives     : dict[str, tuple]           = {} # (digest, template) compiled live, see live().
+        self.lexers    : dict[str, LexerIncremental] = {} # Lexemes of the templates reloaded, see reload().
+        self.fragments : MalangeFragments           = getattr(self.__conf, "FRAGMENTS", None)
+        if self.fragments is None:
+            self.fragments = MemoryFragments()
+        if not isinstance(self.fragments, MalangeFragments):
+            self.__log.critical("FRAGMENTS of ENGINE config entity is not a MalangeFragments.", TypeError)
+        self.__load()
+    def __load(self):
+        '''Load every template of the project, see build().'''
+        result = self.build()
+        for path, error in result.failures.items():
+            self.__log.error("Template %s failed to compile: %s", path, error)
+        if result.failures:
+            self.__log.critical(f"{len(result.failures)} template(s) failed to compile.", SyntaxError)
+        self.__log.info("Templates loaded: %d, from cache: %d, compiled: %d.",
+                        len(self.templates), result.cached, result.compiled)
+    def build(self, workers: Optional[int] = None) -> MalangeBuild:
+        '''
+            Find every template under the project pwd and compile them, templates not
+            valid in __malacache__ are compiled in parallel over a process pool.
+
+            parameter:
+                workers int : Size of the pool, default is ENGINE.BUILD_WORKERS or the CPU count.
+            return:
+                MalangeBuild : The templates and the failures, by path.
+        '''
+        pwd    = self.__proj.retrive_pwd()
+        result = build(find_templates(pwd), self.cache,
+                       workers or getattr(self.__conf, "BUILD_WORKERS", None))
+        for path, template in result.templates.items():
+            self.templates[os.path.relpath(path, pwd)] = template
+        return result
+    def warm(self) -> None:
+        '''
+            Do now what the first render of every template would: prepare its code, and run
+            its script if it runs once. Called before forking workers, so they share it all.
+        '''
+        for template in self.templates.values():
+            script = prepare(template)["script"]
+            if isinstance(template.script, str):
+                script = load_source(template.script_file())
+            if script is not None and script.static:
+                script.names()
+    def template(self, name: str) -> MalangeTemplate:
+        '''Return the template at name, relative to the project pwd.'''
+        try:
+            return self.templates[name]
+        except KeyError:
+            self.__log.critical(f"Template {name} is not found.", KeyError)
+    def reload(self, name: str) -> MalangeTemplate:
+        '''
+            Compile a template again if its file changed, e.g. when a dev server sees it saved.
+            Its lexemes are kept from the last reload, so only the range of the file that
+            changed is lexed again (see malange_core.internal.engine.lexer.incremental).
+
+            parameter:
+                name str : Path of the template, relative to the project pwd.
+            return:
+                MalangeTemplate : The template, the same one if the file did not change.
+            raise:
+                SyntaxError : The template is invalid, the one before is kept.
+        '''
+        template = self.template(name)
+        with open(template.path, "rb") as file:
+            data = file.read()
+        digest = source_digest(data)
+        if digest == template.digest:
+            return template
+        source = data.decode("utf-8")
+        lexer  = self.lexers.get(name)
+        if lexer is None: # The text it was compiled from is not kept, the first reload lexes it all.
+            lexer = self.lexers[name] = LexerIncremental(LexerMain(LexerHeader(source, template.path, "")))
+        else:
+            lexer.edit(*difference(lexer.text, source))
+        template = compile_template(source, template.path, digest, self.executives, lexemes=lexer.buffer())
+        self.cache.store(template.path, template)
+        self.templates[name] = template
+        return template
+    def render(self, name: str, context: Optional[dict[str, Any]] = None) -> bytes:
+        '''
+            Render a template.
+
+            parameter:
+                name    str  : Path of the template, relative to the project pwd.
+                context dict : Names given to the template before its script runs.
+            return:
+                bytes : The output.
+        '''
+        if not PROFILER.enabled:
+            return render_bytes(self.template(name), context, self.fragments)
+        start  = time.perf_counter_ns()
+        output = render_bytes(self.template(name), context, self.fragments)
+        PROFILER.record("render", name, time.perf_counter_ns() - start)
+        return output
+    def stream(self, name: str, context: Optional[dict[str, Any]] = None,
+               size: int = STREAM_CHUNK) -> Iterator[bytes]:
+        '''Render a template lazily, see render() and malange_core.internal.engine.render.stream.'''
+        chunks = stream(self.template(name), context, size, self.fragments)
+        return profiled(chunks, "render", name) if PROFILER.enabled else chunks
+    def stream_async(self, name: str, context: Optional[dict[str, Any]] = None,
+                     size: int = STREAM_CHUNK) -> AsyncIterator[bytes]:
+        '''Render a template as an async generator, injections may be awaitables.'''
+        chunks = stream_async(self.template(name), context, size, self.fragments)
+        return profiled_async(chunks, "render", name) if PROFILER.enabled else chunks
+    def live(self, name: str, context: Optional[dict[str, Any]] = None) -> MalangeLivePage:
+        '''
+            Render a template for a page that stays open, e.g. over a websocket: a gateway
+            sends page.output, then what page.subscribe() gives it as reactive values change,
+            and calls page.dispose() when the page closes. The template is compiled live the
+            first time, and again when it changed, not kept in __malacache__.
+
+            parameter:
+                name    str  : Path of the template, relative to the project pwd.
+                context dict : Names given to the template before its script runs.
+            return:
+                MalangeLivePage : The page, see malange_core.internal.engine.live.
+        '''
+        template = self.template(name)
+        digest, compiled = self.lives.get(name, (None, None))
+        if digest != template.digest: # Compiled from the file the template was, or a newer one.
+            with open(template.path, "rb") as file:
+                data = file.read()
+            compiled = compile_template(data.decode("utf-8"), template.path, source_digest(data),
+                                        self.executives, live=True)
+            self.lives[name] = (template.digest, compiled)
+        return live(compiled, context, self.fragments)
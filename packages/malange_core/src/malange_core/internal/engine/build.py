@@ -0,0 +1,125 @@
+'''
+    malange_core.internal.engine.build
+
+    Compiling the templates of a whole project at once. Templates still
+    valid in __malacache__ are loaded in place, the rest are fanned out to
+    a process pool. Code objects can not be pickled, so workers send back
+    the marshalled template, the same form the cache stores, along with
+    what their profiler recorded when profiling is enabled. Workers start
+    from a forkserver (or are spawned where there is none), not forked from
+    a process whose threads may hold locks. If the pool breaks, e.g. a
+    worker is killed, what it did not send back is compiled in place.
+'''
+
+import os
+import time
+import marshal
+import multiprocessing
+
+from typing import Iterable, Iterator, Optional
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from malange_core.internal.engine.compiler import MalangeTemplate
+from malange_core.internal.engine.cache import MalangeCache, source_digest
+from malange_core.internal.engine.executive import executive_classes, instantiate
+from malange_core.internal.manager.profile import PROFILER
+
+class MalangeBuild:
+    '''Result of a build: compiled templates and the failures, both by path.'''
+    def __init__(self):
+        self.templates : dict[str, MalangeTemplate] = {}
+        self.failures  : dict[str, str]             = {} # Path -> error message.
+        self.cached    : int                        = 0  # Loaded from __malacache__.
+        self.compiled  : int                        = 0  # Compiled by this build.
+
+def build_one(path: str, key: str, profile: bool = False,
+              executives: tuple = ()) -> tuple[str, bool, bytes, Optional[dict]]:
+    '''
+        Compile one template and store it in the cache, run inside a worker.
+
+        parameter:
+            path       str   : Path of the .mala file.
+            key        str   : The engine key of the cache.
+            profile    bool  : Profile the compile in the worker, and send back the stats.
+            executives tuple : The executive classes, see executive_classes(). They are
+                               instantiated once per worker, so their caches are kept.
+        return:
+            tuple : (path, True, marshalled template, stats) or (path, False, error message, stats),
+                    stats is None unless profile.
+    '''
+    if profile:
+        PROFILER.reset()
+        PROFILER.enable()
+    try:
+        template = MalangeCache(key, instantiate(executives)).get(path)
+    except Exception as error: # One failing template, e.g. in an executive, does not fail the build.
+        return (path, False, f"{type(error).__name__}: {error}".encode(), PROFILER.snapshot() if profile else None)
+    return (path, True, marshal.dumps(template.dump()), PROFILER.snapshot() if profile else None)
+
+def start_method() -> str:
+    '''Return how pool workers are started: forkserver where there is one, else spawn.'''
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+def collect(result: MalangeBuild, done: Iterator[tuple], left: dict[str, None]) -> None:
+    '''Add what build_one returned to result, and drop its path from left.'''
+    for path, ok, data, stats in done:
+        left.pop(path, None)
+        if stats:
+            PROFILER.merge(stats)
+        if ok:
+            result.templates[path] = MalangeTemplate.load(marshal.loads(data))
+            result.compiled += 1
+        else:
+            result.failures[path] = data.decode()
+
+def build(paths: Iterable[str], cache: MalangeCache, workers: Optional[int] = None) -> MalangeBuild:
+    '''
+        Compile every template, in parallel when more than one needs compiling.
+
+        parameter:
+            paths   Iterable[str] : Paths of the .mala files.
+            cache   MalangeCache  : The cache to load from and store to.
+            workers int           : Size of the process pool, default is the CPU count.
+        return:
+            MalangeBuild : The templates and failures.
+    '''
+    result  = MalangeBuild()
+    missing = []
+    for path in paths: # Cache hits are cheaper to load here than to ship around.
+        try:
+            with open(path, "rb") as file:
+                digest = source_digest(file.read())
+        except OSError as error:
+            result.failures[path] = f"{type(error).__name__}: {error}"
+            continue
+        if PROFILER.enabled:
+            start    = time.perf_counter_ns()
+            template = cache.load(path, digest)
+            if template is not None:
+                PROFILER.record("cache", path, time.perf_counter_ns() - start)
+        else:
+            template = cache.load(path, digest)
+        if template is None:
+            missing.append(path)
+        else:
+            result.templates[path] = template
+            result.cached += 1
+    cache.hits += result.cached
+
+    classes = executive_classes(cache.executives)
+    workers = min(workers or os.cpu_count() or 1, len(missing))
+    left    = dict.fromkeys(missing) # Not compiled yet, in order.
+    if workers > 1:
+        context = multiprocessing.get_context(start_method())
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                collect(result, pool.map(build_one, missing, [cache.key] * len(missing),
+                                         [PROFILER.enabled] * len(missing), [classes] * len(missing),
+                                         chunksize=max(1, len(missing) // (workers * 4))), left)
+        except BrokenProcessPool: # The rest is compiled below.
+            pass
+    # A single template is not worth the start up of a pool, the compile is profiled in place.
+    collect(result, (build_one(path, cache.key, False, classes) for path in list(left)), left)
+    cache.misses += len(missing)
+    return result
@@ -0,0 +1,139 @@
+'''
+    malange_core.internal.engine.cache
+
+    The __malacache__ layer, working like __pycache__: the compiled form
+    of foo.mala is kept at __malacache__/foo.<cache tag>.malc next to it.
+
+    An entry is only used when all of these match:
+    - The magic bytes, and the Python magic number (marshal of code objects).
+    - The engine key: CACHE_VERSION plus the version of every executive.
+    - The hash of the source.
+
+    A file of STREAM_SIZE or more is mapped instead of read: it is hashed
+    and lexed from the mapping through a LexerStreamHeader, then decoded
+    once for the compile, which slices the text (see LexerBuffer.characters()).
+'''
+
+import os
+import sys
+import mmap
+import marshal
+import hashlib
+import importlib.util
+
+from typing import Iterable, Optional
+
+from malange_core.internal.engine.compiler import MalangeTemplate, compile_template
+from malange_core.internal.engine.executive import ExecutiveTable
+from malange_core.internal.engine.lexer.main import LexerMain
+from malange_core.internal.engine.lexer.processor import LexerHeader
+from malange_core.internal.engine.lexer.stream import LexerStreamHeader
+
+CACHE_DIR     = "__malacache__"
+CACHE_MAGIC   = b"MALC"
+CACHE_VERSION = 14 # Bumped whenever the compiled form of a template changes.
+STREAM_SIZE   = 1 << 20 # Files this large are lexed from an mmap, see MalangeCache.get().
+
+def source_digest(data: bytes) -> str:
+    '''Hash the source of a template.'''
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def engine_key(executives: Iterable[type] = ()) -> str:
+    '''Hash everything besides the source that changes the compiled form.'''
+    parts = [str(CACHE_VERSION), importlib.util.MAGIC_NUMBER.hex()]
+    for executive in sorted(executives, key=lambda cls: (cls.__module__, cls.__qualname__)):
+        parts.append(f"{executive.__module__}.{executive.__qualname__}={getattr(executive, 'VERSION', '')}")
+    return hashlib.blake2b("\n".join(parts).encode(), digest_size=16).hexdigest()
+
+class MalangeCache:
+    '''Reading and writing compiled templates to __malacache__.'''
+    def __init__(self, key: str, executives: Optional[ExecutiveTable] = None):
+        '''
+            parameter:
+                key        str            : The engine key, see engine_key().
+                executives ExecutiveTable : Executives templates are compiled with.
+        '''
+        self.key        : str            = key
+        self.executives : ExecutiveTable = executives or {}
+        self.hits       : int            = 0
+        self.misses     : int            = 0
+    def path(self, source: str) -> str:
+        '''Return the cache path of a source path.'''
+        directory, name = os.path.split(source)
+        stem = os.path.splitext(name)[0]
+        return os.path.join(directory, CACHE_DIR, f"{stem}.{sys.implementation.cache_tag}.malc")
+    def load(self, source: str, digest: str) -> Optional[MalangeTemplate]:
+        '''Return the cached template, or None if there is none or it is stale.'''
+        try:
+            with open(self.path(source), "rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+        if data[:4] != CACHE_MAGIC:
+            return None
+        try:
+            key, cached_digest, payload = marshal.loads(data[4:])
+        except (EOFError, ValueError, TypeError):
+            return None # Corrupted or written by another Python.
+        if key != self.key or cached_digest != digest:
+            return None
+        template = MalangeTemplate.load(payload)
+        template.path = source # Where it is now, the project may have been moved or copied with its cache.
+        return template
+    def store(self, source: str, template: MalangeTemplate) -> bool:
+        '''Write the template, return False if the cache directory is not writable.'''
+        path = self.path(source)
+        temp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp, "wb") as file:
+                file.write(CACHE_MAGIC + marshal.dumps((self.key, template.digest, template.dump())))
+            os.replace(temp, path) # Atomic, so readers never see a half written entry.
+        except OSError:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            return False
+        return True
+    def get(self, source: str) -> MalangeTemplate:
+        '''
+            Return the compiled template of a source path, compiling and storing it on a miss.
+
+            parameter:
+                source str : Path of the .mala file.
+            return:
+                MalangeTemplate : The compiled template.
+            raise:
+                OSError     : The source can not be read.
+                SyntaxError : The template is invalid.
+        '''
+        with open(source, "rb") as file:
+            if os.fstat(file.fileno()).st_size >= STREAM_SIZE:
+                return self.__mapped(source, file)
+            data = file.read()
+        digest   = source_digest(data)
+        template = self.load(source, digest)
+        if template is not None:
+            self.hits += 1
+            return template
+        self.misses += 1
+        template = compile_template(data.decode("utf-8"), source, digest, self.executives)
+        self.store(source, template)
+        return template
+    def __mapped(self, source: str, file) -> MalangeTemplate:
+        '''get() of a large file, hashed and lexed from an mmap of it.'''
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            digest   = source_digest(mapped)
+            template = self.load(source, digest)
+            if template is not None:
+                self.hits += 1
+                return template
+            self.misses += 1
+            lexemes = LexerMain(LexerStreamHeader(mapped, source, "")).process()
+            text    = str(mapped, "utf-8")
+            lexemes.characters(mapped)
+        lexemes.header = LexerHeader(text, source, "")
+        template = compile_template(text, source, digest, self.executives, lexemes=lexemes)
+        self.store(source, template)
+        return template
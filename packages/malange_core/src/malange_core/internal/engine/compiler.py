@@ -0,0 +1,669 @@
+'''
+    malange_core.internal.engine.compiler
+
+    Turning the source of a .mala file into its compiled form, the
+    MalangeTemplate, which is what the engine keeps and caches.
+    - Tree     : The syntax tree, as a MalangeTree (see parser), the compile walks it.
+    - Script   : The code object of the [script/] block, or the src of [/script src=.../].
+    - Specials : The code objects of every ${ ... } and @{ ... }.
+    - Program  : The code defining the render function, see RenderBuilder.
+    - Async    : The same as an async generator, see Asynchronous.
+
+    The render function is generated from the template as a whole: every
+    run of static text between injections and blocks is one pre-encoded
+    bytes constant, blocks are plain Python statements, and the output is
+    yielded chunk by chunk as each section is ready, so a [for] over a
+    large list streams instead of being built up in memory.
+
+    An injection is escaped as text, as an attribute value if it is in
+    quotes inside a tag, or as an unquoted value anywhere else in a tag
+    (see malange_core.internal.engine.markup). A [for] whose body is only
+    static text and injections, none of them unquoted, renders through a
+    row function returning the values of one element, so its output is
+    escaped and joined in batches of rows instead of yielded piece by piece.
+
+    Compiled live (see malange_core.internal.engine.live) every injection in
+    text and every [if/], [for/] and [switch/] block outside of a [for/] or
+    a [cache/] block is a region, rendered by its own function through
+    REGION, the condition of an [if/] is a computed value through TRUTH,
+    and an @{ ... } is watched through BIND. That program is only
+    rendered live, it has no async generator.
+
+    The content of an element matching an executive (see
+    malange_core.internal.engine.executive) is replaced by its output in
+    the static run. A HEAVY executive runs on the executive pool, its
+    constant is only filled in by RenderBuilder.finish().
+'''
+
+import os
+import re
+import ast
+import copy
+import time
+import types
+import hashlib
+
+from concurrent.futures import Future
+from typing import Optional, Union
+
+from malange_core.internal.engine.lexer.main import LexerMain
+from malange_core.internal.engine.lexer.buffer import LexerBuffer
+from malange_core.internal.engine.lexer.processor import LexerHeader
+from malange_core.internal.engine.parser import (MalangeTree, parse, INJECTION, ACTION, BLOCK, BRANCH,
+                                                 SOURCE, TAG, SCRIPT, ESCAPE, ELEMENT as RAW_ELEMENT)
+from malange_core.internal.engine.executive import ExecutiveTable, MalangeExecutive, executive_pool
+from malange_core.internal.engine.script import load_source
+from malange_core.internal.manager.profile import PROFILER
+
+RENDER = "__malange_render__" # The render generator, defined in the namespace of the template.
+RENDER_ASYNC = "__malange_render_async__" # The render async generator, the same way.
+TEXT   = "__malange_text__"   # Turns the value of an injection into bytes, see markup.text().
+ATTR   = "__malange_attr__"   # The same in a quoted attribute value, see markup.attribute().
+UNQUOTED = "__malange_unquoted__" # The same elsewhere inside a tag, see markup.unquoted().
+TEXT_ASYNC = "__malange_text_async__" # The same in the async generator, see render.text_async().
+ATTR_ASYNC = "__malange_attr_async__" # The same in the async generator, see render.attribute_async().
+UNQUOTED_ASYNC = "__malange_unquoted_async__" # The same in the async generator, see render.unquoted_async().
+BATCH  = "__malange_batch__"  # Renders the rows of a [for] in batches, see render.batched().
+BATCH_ASYNC = "__malange_batch_async__" # The same in the async generator.
+AITER  = "__malange_aiter__"  # Iterates anything in an async for, see render.async_iter().
+CACHED = "__malange_cached__" # Renders a [cache/] block through the fragment cache, see render.cached().
+CACHED_ASYNC = "__malange_cached_async__" # The same in the async generator.
+FRAGMENTS = "__malange_fragments__" # The fragment cache backend, see malange_core.internal.engine.fragment.
+KEYED  = "__malange_keyed__"  # Renders a keyed [for/] block, see render.keyed().
+KEYED_ASYNC = "__malange_keyed_async__" # The same in the async generator.
+LIVE   = "__malange_live__"   # The page of a live render, None otherwise, see malange_core.internal.engine.live.
+REGION = "__malange_region__" # Renders a region of a live page, see live.region().
+BIND   = "__malange_bind__"   # Watches an @{ ... } of a live page, see live.action().
+TRUTH  = "__malange_truth__"  # The truth of an [if/] condition of a live page, see live.truth().
+ELEMENT = "__malange_element__" # Parameter of the key and item functions of a keyed [for/].
+
+TTL = re.compile(r"\s+ttl\s*=") # Where the ttl of a [cache/] block starts.
+KEY = re.compile(r"\s+key\s*=") # Where the key of a keyed [for/] block may start.
+SRC = re.compile(r'''\s+src\s*=\s*(?:"([^"]*)"|'([^']*)')''') # The file of [/script src=.../].
+# Where the static text changes context: out of text into a tag, or in a tag.
+CONTEXT = (re.compile(r"<[A-Za-z]"), re.compile(r"""[>"']"""), re.compile('"'), re.compile("'"))
+IN_TEXT, IN_TAG, IN_DOUBLE, IN_SINGLE = range(4)
+ESCAPERS = (TEXT, UNQUOTED, ATTR, ATTR) # The helper escaping an injection, by context.
+# Elements whose content is not markup, a region marker would show in it.
+RAW_TEXT = {name: re.compile(f"</{name}", re.IGNORECASE) for name in ("script", "style", "textarea", "title")}
+RAW_NAME = re.compile(r"[A-Za-z][\w-]*")
+NO_ARGUMENTS = ast.arguments([], [], None, [], [], None, [])
+
+class MalangeTemplate:
+    '''Compiled form of a .mala file.'''
+    def __init__(self, path: str, digest: str, tree: MalangeTree,
+                 script: Union[types.CodeType, str, None], specials: tuple[tuple, ...],
+                 program: Optional[types.CodeType], program_async: Optional[types.CodeType]):
+        '''
+            parameter:
+                path     str      : Path of the source file.
+                digest   str      : Hash of the source, see malange_core.internal.engine.cache.
+                tree     MalangeTree : The syntax tree.
+                script   CodeType : The [script/] block, the path of the file of [/script src=.../]
+                                    relative to the template (a str), or None if there is none.
+                specials tuple    : (kind, start, end, code), kind is "$" or "@".
+                program  CodeType : Defines the render generator RENDER when executed, None
+                                    if the template awaits and can only be rendered async.
+                program_async CodeType : Defines the render async generator RENDER_ASYNC, None
+                                         if the template was compiled live.
+        '''
+        self.path     : str                      = path
+        self.digest   : str                      = digest
+        self.tree     : MalangeTree              = tree
+        self.script   : Union[types.CodeType, str, None] = script
+        self.specials : tuple                    = specials
+        self.program  : Optional[types.CodeType] = program
+        self.program_async : Optional[types.CodeType] = program_async
+        self.runtime  : dict                     = {} # Kept by the renderer, see render.prepare(), not dumped.
+    def dump(self) -> tuple:
+        '''Return the template as a tuple marshal can write.'''
+        return (self.path, self.digest, self.tree.dump(), self.script, self.specials,
+                self.program, self.program_async)
+    @classmethod
+    def load(cls, data: tuple) -> "MalangeTemplate":
+        '''Rebuild the template from what dump() returned.'''
+        path, digest, tree, script, specials, program, program_async = data
+        return cls(path, digest, MalangeTree().load(tree), script, specials, program, program_async)
+    def script_file(self) -> Optional[str]:
+        '''Return the path of the file of [/script src=.../], None if the script is not one.'''
+        if not isinstance(self.script, str):
+            return None
+        return os.path.join(os.path.dirname(self.path), self.script)
+
+def shift_lines(code: types.CodeType, lines: int) -> types.CodeType:
+    '''Move a code object and the ones nested in it down by lines.'''
+    consts = tuple(shift_lines(const, lines) if isinstance(const, types.CodeType) else const
+                   for const in code.co_consts)
+    return code.replace(co_firstlineno=code.co_firstlineno + lines, co_consts=consts)
+
+def parse_code(source: str, path: str, start: int, end: int, mode: str, line: int,
+               prefix: str = "", suffix: str = "") -> ast.AST:
+    '''
+        Parse prefix + source[start:end] + suffix starting at line (0-based), see compile_code.
+        The prefix and suffix must not add lines before the code.
+    '''
+    code = source[start:end]
+    if mode == "eval" or prefix:
+        line += code.count("\n", 0, len(code) - len(code.lstrip()))
+        code  = code.strip()
+    try:
+        tree = ast.parse(prefix + code + suffix, path, mode)
+    except SyntaxError as error:
+        if error.lineno is not None:
+            error.lineno += line
+        raise
+    return ast.increment_lineno(tree, line) if line else tree
+
+def compile_code(source: str, path: str, start: int, end: int, mode: str, line: int) -> types.CodeType:
+    '''Compile source[start:end] starting at line (0-based), keeping the line numbers in tracebacks.'''
+    code = source[start:end]
+    if mode == "eval":
+        line += code.count("\n", 0, len(code) - len(code.lstrip()))
+        code  = code.strip()
+    try:
+        compiled = compile(code, path, mode)
+    except SyntaxError as error:
+        if error.lineno is not None:
+            error.lineno += line
+        raise
+    return shift_lines(compiled, line) if line else compiled
+
+
+class RenderBuilder:
+    '''Builds the render function of a template while its lexemes are walked in order.'''
+    def __init__(self, source: str, path: str, digest: str = "", live: bool = False):
+        self.source  : str                  = source
+        self.path    : str                  = path
+        self.digest  : str                  = digest or hashlib.blake2b(source.encode("utf-8"), digest_size=16).hexdigest()
+        self.body    : list[ast.stmt]       = [] # Statements of the render function.
+        self.current : Optional[list]       = self.body # Where statements go, None between [switch/] and [/case/].
+        self.frames  : list[list]           = [] # Open blocks as [name, node, outer body, else seen].
+        self.pieces  : list                 = [] # The static run so far, str or Future of str.
+        self.waiting : bool                 = False # A Future is among the pieces.
+        self.pending : list[tuple]          = [] # (constant, pieces) filled in by finish().
+        self.sources : list[tuple[str, int]] = [] # (src, offset) of every [/script src=.../].
+        self.static  : int                  = 0  # Offset the rest of the static run starts at.
+        self.blocks  : int                  = 0  # Nested functions made, to name them.
+        self.counted : list[int]            = [0, 0] # (offset, line) lines are counted up to.
+        self.context : int                  = IN_TEXT # Where the static text so far ends, see scan().
+        self.awaits  : bool                 = False # Some code awaits, only the async generator compiles.
+        self.live    : bool                 = live  # Make regions, see malange_core.internal.engine.live.
+        self.fixed   : int                  = 0  # Open [for/] and [cache/] blocks, nothing in them is a region.
+        self.opening : Optional[str]        = None # Name of the raw text element whose tag is open.
+        self.raw     : Optional[str]        = None # Name of the raw text element the static text is in.
+    def line_of(self, offset: int) -> int:
+        '''Return the line (0-based) of offset, offsets are asked in order.'''
+        self.counted[1] += self.source.count("\n", self.counted[0], offset)
+        self.counted[0]  = offset
+        return self.counted[1]
+    def error(self, offset: int, msg: str) -> SyntaxError:
+        return SyntaxError(f"{self.path}:{self.line_of(offset) + 1}: {msg}")
+
+    # Static text.
+    def scan(self, text: str) -> None:
+        '''Follow the static text in and out of tags, so an injection knows how to be escaped.'''
+        position = 0
+        while True:
+            if self.raw is not None: # Only its end tag leaves a raw text element.
+                match = RAW_TEXT[self.raw].search(text, position)
+                if match is None:
+                    return
+                position, self.raw, self.context = match.end(), None, IN_TAG
+                continue
+            match = CONTEXT[self.context].search(text, position)
+            if match is None:
+                return
+            position = match.end()
+            if self.context == IN_TEXT:
+                self.context = IN_TAG
+                if self.live:
+                    name = RAW_NAME.match(text, position - 1)[0].lower()
+                    self.opening = name if name in RAW_TEXT else None
+            elif self.context == IN_TAG:
+                self.context = {">": IN_TEXT, '"': IN_DOUBLE, "'": IN_SINGLE}[match[0]]
+                if match[0] == ">" and self.opening is not None:
+                    self.raw, self.opening = self.opening, None
+            else:
+                self.context = IN_TAG
+    def skip(self, start: int, end: int) -> None:
+        '''Leave source[start:end] out of the output, the static run goes on after it.'''
+        self.pieces.append(self.source[self.static:start])
+        self.static = end
+    def replace(self, start: int, end: int, output: Union[str, Future]) -> None:
+        '''Put output (of an executive, or its Future) in place of source[start:end].'''
+        self.pieces.append(self.source[self.static:start])
+        self.pieces.append(output)
+        self.waiting = self.waiting or isinstance(output, Future)
+        self.static  = end
+    def flush(self, offset: int) -> None:
+        '''End the static run at offset, as one bytes constant.'''
+        self.pieces.append(self.source[self.static:offset])
+        for piece in self.pieces: # Executive output is the content of an element, not tags.
+            if isinstance(piece, str):
+                self.scan(piece)
+        if self.waiting: # The constant is filled in by finish(), so the compile goes on meanwhile.
+            if self.current is None:
+                raise self.error(offset, "only [/case/] may follow [switch/].")
+            constant = ast.Constant(b"")
+            self.pending.append((constant, self.pieces))
+            self.emit(constant)
+            self.pieces, self.waiting, self.static = [], False, offset
+            return
+        chunk = "".join(self.pieces).encode("utf-8")
+        self.pieces.clear()
+        self.static = offset
+        if not chunk:
+            return
+        if self.current is None:
+            if chunk.strip():
+                raise self.error(offset, "only [/case/] may follow [switch/].")
+            return
+        self.emit(ast.Constant(chunk))
+
+    # Dynamic slots.
+    def emit(self, value: ast.expr) -> None:
+        '''Yield value (bytes) as the next chunk of the output.'''
+        self.current.append(ast.Expr(ast.Yield(value)))
+    def inject(self, start: int, end: int, expression: ast.expr) -> None:
+        '''An injection from start to end, expression is its code.'''
+        self.watch(expression, start, end)
+        self.flush(start)
+        if self.current is None:
+            raise self.error(start, "only [/case/] may follow [switch/].")
+        call = ast.Call(ast.Name(ESCAPERS[self.context], ast.Load()), [expression], [])
+        if self.regional():
+            self.current.append(self.region(ast.Lambda(NO_ARGUMENTS, ast.Tuple([call], ast.Load()))))
+        else:
+            self.emit(call)
+        self.static = end
+    def action(self, start: int, end: int, expression: ast.expr) -> None:
+        '''An @{ ... } from start to end, it renders nothing, live its value is watched.'''
+        if not self.live or self.fixed or any(isinstance(node, ast.Await) for node in ast.walk(expression)):
+            self.skip(start, end) # Bound by the gateway.
+            return
+        self.flush(start)
+        if self.current is None:
+            raise self.error(start, "only [/case/] may follow [switch/].")
+        self.blocks += 1
+        marker = b' data-malange-action="%d"' % self.blocks if self.context == IN_TAG else b""
+        self.emit(ast.Call(ast.Name(BIND, ast.Load()), [ast.Name(LIVE, ast.Load()), ast.Constant(self.blocks),
+                           ast.Lambda(NO_ARGUMENTS, expression), ast.Constant(marker)], []))
+        self.static = end
+    def condition(self, test: ast.expr) -> ast.expr:
+        '''The test of an [if/] or [/elif/], live its region only reruns when its truth changes.'''
+        if not self.live or self.fixed:
+            return test
+        return ast.Call(ast.Name(TRUTH, ast.Load()), [ast.Name(LIVE, ast.Load()), ast.Lambda(NO_ARGUMENTS, test)], [])
+    def regional(self) -> bool:
+        '''Whether what starts here is a region of a live page.'''
+        return self.live and not self.fixed and self.context == IN_TEXT and self.raw is None
+    def region(self, function: ast.expr) -> ast.stmt:
+        '''Yield from the region rendered by function, a name or a lambda.'''
+        self.blocks += 1
+        return ast.Expr(ast.YieldFrom(ast.Call(ast.Name(REGION, ast.Load()), [
+            ast.Name(LIVE, ast.Load()), ast.Constant(self.blocks), function], [])))
+    def watch(self, code: ast.AST, start: int, end: int) -> None:
+        '''Note whether code, from start to end of the source, awaits.'''
+        if (not self.awaits and "await" in self.source[start:end]
+            and any(isinstance(node, ast.Await) for node in ast.walk(code))):
+            self.awaits = True
+    def leave(self) -> None:
+        '''Done with the current body, Python needs a statement in it.'''
+        if self.current is not None and not self.current:
+            self.current.append(ast.Pass())
+    def scoped(self, statement: ast.stmt, region: bool = False) -> ast.stmt:
+        '''
+            Wrap statement in a nested generator and yield from it, so names it binds (e.g.
+            the target of a for) stay inside the block instead of shadowing the namespace.
+            If region, the generator renders a region of a live page.
+        '''
+        self.blocks += 1
+        name = f"__malange_block_{self.blocks}__"
+        self.current.append(ast.FunctionDef(name, NO_ARGUMENTS,
+                                            [statement, ast.Return(), ast.Expr(ast.Yield())], [], None))
+        if region:
+            return self.region(ast.Name(name, ast.Load()))
+        return ast.Expr(ast.YieldFrom(ast.Call(ast.Name(name, ast.Load()), [], [])))
+
+    # Blocks.
+    def block(self, opener: str, closer: str, start: int, end: int, header: int) -> None:
+        '''
+            A block tag from start to end, its name and arguments start at header.
+
+            parameter:
+                opener str : "[" or "[/".
+                closer str : "/]" or "]".
+        '''
+        self.flush(start)
+        text  = self.source[header:end - len(closer)]
+        parts = text.split(None, 1)
+        name  = parts[0] if parts else ""
+        rest  = header + text.index(name) + len(name) if parts else header # Arguments start here.
+        stop  = end - len(closer)
+        def parse(mode: str, prefix: str = "", suffix: str = "", lines: int = 0,
+                  begin: int = rest, until: int = stop) -> ast.AST:
+            code = parse_code(self.source, self.path, begin, until, mode,
+                              self.line_of(begin) - lines, prefix, suffix)
+            self.watch(code, begin, until)
+            return code
+        if opener == "[" and closer == "/]": # Opening tag.
+            if self.current is None:
+                raise self.error(start, "only [/case/] may follow [switch/].")
+            if name == "for":
+                for key in reversed(list(KEY.finditer(self.source, rest, stop))):
+                    try: # A key= inside the iterable, e.g. sorted(rows, key=f), is not the key.
+                        node = parse("exec", "for ", ":\n pass", until=key.start()).body[0]
+                        key  = parse("eval", begin=key.end()).body
+                        break
+                    except SyntaxError:
+                        pass
+                else:
+                    key  = None
+                    node = parse("exec", "for ", ":\n pass").body[0]
+                region = self.regional()
+                self.fixed += 1
+                if key is None:
+                    node.body = []
+                    self.frames.append([name, node, self.current, False])
+                    self.current.append(self.scoped(node, region))
+                    self.current = node.body
+                else: # Each element renders through its own function, so it can be kept by key.
+                    self.blocks += 1
+                    element   = ast.arguments([], [ast.arg(ELEMENT)], None, [], [], None, [])
+                    bind      = ast.Assign([node.target], ast.Name(ELEMENT, ast.Load()))
+                    function  = ast.FunctionDef(f"__malange_key_{self.blocks}__", element,
+                                                [copy.deepcopy(bind), ast.Return(key)], [], None)
+                    item      = ast.FunctionDef(f"__malange_item_{self.blocks}__", element,
+                                                [bind], [], None)
+                    iterate   = ast.Lambda(NO_ARGUMENTS, node.iter)
+                    keyed     = ast.Call(ast.Name(KEYED, ast.Load()), [ast.Name(LIVE, ast.Load()),
+                        ast.Constant(self.blocks), iterate, ast.Name(function.name, ast.Load()),
+                        ast.Name(item.name, ast.Load())], [])
+                    self.current += [function, item, self.region(ast.Lambda(NO_ARGUMENTS, keyed)) if region
+                                     else ast.Expr(ast.YieldFrom(keyed))]
+                    self.frames.append([name, item, self.current, False])
+                    self.current = item.body
+            elif name == "if":
+                node = ast.If(self.condition(parse("eval").body), [], [])
+                self.frames.append([name, node, self.current, False])
+                self.current.append(self.scoped(node, True) if self.regional() else node)
+                self.current = node.body
+            elif name == "switch":
+                node = ast.Match(parse("eval").body, [])
+                self.frames.append([name, node, self.current, False])
+                self.current.append(self.scoped(node, self.regional()))
+                self.current = None
+            elif name == "cache":
+                ttl = None
+                for ttl in TTL.finditer(self.source, rest, stop): # The last one, the key may hold one.
+                    pass
+                until = stop if ttl is None else ttl.start()
+                key   = (parse("eval", until=until).body if self.source[rest:until].strip()
+                         else ast.Constant(None))
+                ttl   = ast.Constant(None) if ttl is None else parse("eval", begin=ttl.end()).body
+                self.blocks += 1
+                self.fixed  += 1
+                block = f"__malange_block_{self.blocks}__"
+                node  = ast.FunctionDef(block, NO_ARGUMENTS, [], [], None)
+                self.current.append(node)
+                self.current.append(ast.Expr(ast.YieldFrom(ast.Call(ast.Name(CACHED, ast.Load()), [
+                    ast.Name(FRAGMENTS, ast.Load()),
+                    ast.Tuple([ast.Constant(self.path), ast.Constant(self.digest), ast.Constant(self.blocks), key],
+                              ast.Load()),
+                    ttl, ast.Name(block, ast.Load())], []))))
+                self.frames.append([name, node, self.current, False])
+                self.current = node.body
+            else:
+                raise self.error(start, f"unknown block [{name}/].")
+        elif opener == "[/" and closer == "/]": # Middle tag.
+            frame = self.frames[-1] if self.frames else [None, None, None, False]
+            if name in ("elif", "else"):
+                if frame[0] != "if" or frame[3]:
+                    raise self.error(start, f"[/{name}/] outside of an [if/] block, or after [/else/].")
+                self.leave()
+                if name == "elif":
+                    node = ast.If(self.condition(parse("eval").body), [], [])
+                    frame[1].orelse = [node]
+                    frame[1], self.current = node, node.body
+                else:
+                    frame[3], self.current = True, frame[1].orelse
+            elif name == "case":
+                if frame[0] != "switch":
+                    raise self.error(start, "[/case/] outside of a [switch/] block.")
+                # The pattern is on the second line of the parsed code.
+                case = parse("exec", "match _:\n case ", ":\n  pass", 1).body[0].cases[0]
+                self.leave()
+                case.body = []
+                frame[1].cases.append(case)
+                self.current = case.body
+            elif name == "script": # [/script src=.../] is the script of the template, not output.
+                match = SRC.match(self.source, rest, stop)
+                if match is None:
+                    raise self.error(start, '[/script/] needs a src="..." file.')
+                self.sources.append((match[1] if match[1] is not None else match[2], start))
+            else:
+                raise self.error(start, f"unknown block [/{name}/].")
+        elif opener == "[/" and closer == "]": # Closing tag.
+            if not self.frames or self.frames[-1][0] != name:
+                raise self.error(start, f"[/{name}] does not close an open block.")
+            name, node, outer, _ = self.frames.pop()
+            if name == "switch" and not node.cases:
+                raise self.error(start, "[switch/] needs at least one [/case/].")
+            self.leave()
+            if name in ("for", "cache"):
+                self.fixed -= 1
+            if isinstance(node, ast.For):
+                self.rows(node, outer)
+            if isinstance(node, ast.FunctionDef): # A generator, even if nothing is yielded.
+                node.body += [ast.Return(), ast.Expr(ast.Yield())]
+            self.current = outer
+        else:
+            raise self.error(start, f"[{name}] is not a block tag, escape it as \\[.")
+        self.static = end
+    def rows(self, node: ast.For, outer: list[ast.stmt]) -> None:
+        '''
+            Render a closed [for] through BATCH if its body only yields static text and
+            injections: a row function returns the values of an element, the static runs
+            between them are given once.
+        '''
+        if not (len(outer) >= 2 and isinstance(outer[-2], ast.FunctionDef) and outer[-2].body[0] is node):
+            return
+        statics, values, quotes = [], [], []
+        for statement in node.body:
+            value = statement.value.value if isinstance(statement, ast.Expr) else None
+            if not isinstance(value, ast.Yield):
+                return
+            if isinstance(value.value, ast.Constant):
+                if len(statics) > len(values): # Two runs in a row, the second one is not known yet.
+                    return
+                statics.append(value.value)
+            elif (isinstance(value.value, ast.Call) and isinstance(value.value.func, ast.Name)
+                  and value.value.func.id in (TEXT, ATTR)):
+                expression = value.value.args[0]
+                if any(isinstance(child, (ast.Await, ast.Yield, ast.YieldFrom, ast.NamedExpr))
+                       for child in ast.walk(expression)):
+                    return # Only valid, or only the same, in the body of the render function.
+                if len(statics) == len(values):
+                    statics.append(ast.Constant(b""))
+                values.append(expression)
+                quotes.append(value.value.func.id == ATTR)
+            else:
+                return
+        if len(statics) == len(values):
+            statics.append(ast.Constant(b""))
+        self.blocks += 1
+        element = ast.arguments([], [ast.arg(ELEMENT)], None, [], [], None, [])
+        row     = ast.FunctionDef(f"__malange_row_{self.blocks}__", element, [
+                      ast.Assign([node.target], ast.Name(ELEMENT, ast.Load())),
+                      ast.Return(ast.Tuple(values, ast.Load()))], [], None)
+        batch = ast.Call(ast.Name(BATCH, ast.Load()), [node.iter, ast.Name(row.name, ast.Load()),
+                         ast.Tuple(statics, ast.Load()), ast.Constant(tuple(quotes))], [])
+        call  = outer[-1].value.value
+        if call.func.id == REGION: # The region now renders the batches.
+            call.args[2] = ast.Lambda(NO_ARGUMENTS, batch)
+            outer[-2] = row
+        else: # In place of the block function holding the for.
+            outer[-2:] = [row, ast.Expr(ast.YieldFrom(batch))]
+    def finish(self) -> tuple[Optional[types.CodeType], Optional[types.CodeType]]:
+        '''
+            Close the static run, return the code defining RENDER and the one defining
+            RENDER_ASYNC, the latter is None if live.
+        '''
+        if self.frames:
+            name = self.frames[-1][0]
+            raise SyntaxError(f"{self.path}: [{name}/] is never closed by [/{name}].")
+        self.flush(len(self.source))
+        for constant, pieces in self.pending: # Wait for the executives on the pool.
+            constant.value = "".join(piece if isinstance(piece, str) else piece.result()
+                                     for piece in pieces).encode("utf-8")
+        module = ast.parse(f"def {RENDER}():\n"
+                           f"    return\n"
+                           f"    yield\n") # A generator, even if nothing is yielded.
+        module.body[0].body[0:0] = self.body
+        module = ast.fix_missing_locations(module)
+        # Awaits only compile in the async generator. The sync one is compiled first, so the
+        # async one can be made by changing the same tree in place.
+        program = None if self.awaits else compile(module, self.path, "exec")
+        if self.live:
+            return program, None
+        return program, compile(Asynchronous().visit(module), self.path, "exec")
+
+class Asynchronous(ast.NodeTransformer):
+    '''
+        Turn the module built by RenderBuilder into the async one:
+        - The render and block functions become async generators.
+        - A [for] iterates with AITER, so async iterables and awaitables work too.
+        - yield from a block becomes an async for over it, CACHED, KEYED and BATCH become
+          their async versions, key and row functions stay plain functions.
+        - An injection goes through TEXT_ASYNC, ATTR_ASYNC or UNQUOTED_ASYNC, which escape its value or
+          return an awaitable of it escaped for the renderer to await.
+    '''
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.stmt:
+        self.generic_visit(node)
+        if node.name.startswith(("__malange_key_", "__malange_row_")): # Called for their value.
+            return node
+        name = RENDER_ASYNC if node.name == RENDER else node.name
+        return ast.copy_location(ast.AsyncFunctionDef(name, node.args, node.body, [], None), node)
+    def visit_For(self, node: ast.For) -> ast.AsyncFor:
+        self.generic_visit(node)
+        iterable = located(node.iter, ast.Call(located(node.iter, ast.Name(AITER, ast.Load())), [node.iter], []))
+        return ast.copy_location(ast.AsyncFor(node.target, iterable, node.body, node.orelse), node)
+    def visit_Expr(self, node: ast.Expr) -> ast.stmt:
+        value = node.value
+        if isinstance(value, ast.YieldFrom):
+            if isinstance(value.value.func, ast.Name) and value.value.func.id in ASYNC:
+                value.value.func.id = ASYNC[value.value.func.id]
+            chunk = located(node, ast.Name("__malange_chunk__", ast.Store()))
+            again = located(node, ast.Name("__malange_chunk__", ast.Load()))
+            return ast.copy_location(ast.AsyncFor(chunk, value.value, [
+                located(node, ast.Expr(located(node, ast.Yield(again))))], []), node)
+        if (isinstance(value, ast.Yield) and isinstance(value.value, ast.Call)
+            and isinstance(value.value.func, ast.Name)):
+            if value.value.func.id in INJECT_ASYNC:
+                value.value.func.id = INJECT_ASYNC[value.value.func.id]
+        return node
+
+def located(like: ast.AST, node: ast.AST) -> ast.AST:
+    '''Give node the location of like, so the tree needs no other fix_missing_locations() pass.'''
+    return ast.copy_location(node, like)
+
+ASYNC = {CACHED: CACHED_ASYNC, KEYED: KEYED_ASYNC, BATCH: BATCH_ASYNC} # Helpers of the async generator.
+INJECT_ASYNC = {TEXT: TEXT_ASYNC, ATTR: ATTR_ASYNC, UNQUOTED: UNQUOTED_ASYNC} # Escapers of the async generator.
+
+def execute(executive: MalangeExecutive, attributes: dict[str, Optional[str]],
+            source: str, path: str, start: int, end: int) -> str:
+    '''Run an executive on source[start:end], its errors become a SyntaxError at start.'''
+    try:
+        return executive(source[start:end], attributes)
+    except Exception as error:
+        line = source.count("\n", 0, start) + 1
+        raise SyntaxError(f"{path}:{line}: {type(executive).__name__} failed: {error!r}") from error
+
+def compile_template(source: str, path: str, digest: str = "",
+                     executives: Optional[ExecutiveTable] = None, live: bool = False,
+                     lexemes: Optional[LexerBuffer] = None) -> MalangeTemplate:
+    '''
+        Lex and compile the source of a .mala file.
+
+        parameter:
+            source     str            : The file text.
+            path       str            : Path of the file, used as the filename of the code objects.
+            digest     str            : Hash of the source.
+            executives ExecutiveTable : Executives by (tag, attribute, value), see executive_table().
+            live       bool           : Compile for a live page, see malange_core.internal.engine.live.
+            lexemes    LexerBuffer    : The lexemes of source if known, e.g. kept by a LexerIncremental.
+        return:
+            MalangeTemplate : The compiled template.
+        raise:
+            SyntaxError : The script block, a special or a block is not valid.
+    '''
+    profile  = PROFILER.enabled
+    if profile:
+        start = time.perf_counter_ns()
+    if lexemes is None:
+        lexemes = LexerMain(LexerHeader(source, path, "")).process()
+    if profile:
+        lexed = time.perf_counter_ns()
+        PROFILER.record("lex", path, lexed - start)
+    tree     = parse(lexemes, source)
+    kinds, heads, tails = tree.kinds, tree.heads, tree.tails
+    starts, ends        = tree.starts, tree.ends
+    builder  = RenderBuilder(source, path, digest, live)
+    specials = []
+    script   = None
+    for index, entering in tree.events():
+        kind = kinds[index]
+        if not entering:
+            if kind == BLOCK and tails[index] != -1: # Its closing tag.
+                builder.block("[/", "]", tails[index], ends[index], tails[index] + 2)
+            elif kind == RAW_ELEMENT and executives and tails[index] != -1:
+                attributes = {tree.name(child): None if heads[child] == -1 else source[heads[child]:tails[child]]
+                              for child in tree.children(index)}
+                for attribute, value in attributes.items():
+                    executive = executives.get((tree.name(index), attribute, value))
+                    if executive is None:
+                        continue
+                    arguments = (executive, attributes, source, path, heads[index], tails[index])
+                    if executive.HEAVY:
+                        output = executive_pool().submit(execute, *arguments)
+                    else:
+                        output = execute(*arguments)
+                    builder.replace(heads[index], tails[index], output)
+                    break
+        elif kind == INJECTION or kind == ACTION:
+            code = parse_code(source, path, heads[index], tails[index], "eval", builder.line_of(heads[index]))
+            specials.append(("$" if kind == INJECTION else "@", heads[index], tails[index],
+                             compile(code, path, "eval", ast.PyCF_ALLOW_TOP_LEVEL_AWAIT))) # ${await f()}
+            if kind == INJECTION:
+                builder.inject(starts[index], ends[index], code.body)
+            else:
+                builder.action(starts[index], ends[index], code.body)
+        elif kind == BLOCK:
+            builder.block("[", "/]", starts[index], heads[index], starts[index] + 1)
+        elif kind == BRANCH:
+            builder.block("[/", "/]", starts[index], heads[index], starts[index] + 2)
+        elif kind == SOURCE or kind == TAG:
+            builder.block("[" if heads[index] == starts[index] + 1 else "[/",
+                          "]" if tails[index] == ends[index] - 1 else "/]",
+                          starts[index], ends[index], heads[index])
+        elif kind == SCRIPT:
+            if script is not None:
+                raise SyntaxError(f"{path}: only one [script/] block is allowed.")
+            script = compile_code(source, path, heads[index], tails[index], "exec",
+                                  builder.line_of(heads[index]))
+            builder.skip(starts[index], ends[index])
+        elif kind == ESCAPE: # \x renders as x.
+            builder.skip(starts[index], heads[index])
+    for src, offset in builder.sources:
+        where = f"{path}:{source.count(chr(10), 0, offset) + 1}"
+        if script is not None:
+            raise SyntaxError(f"{where}: only one [script/] block is allowed.")
+        try: # Compiled now so errors show at build time, the compiled file is kept for the renderer.
+            load_source(os.path.join(os.path.dirname(path), src))
+        except (OSError, SyntaxError) as error:
+            raise SyntaxError(f"{where}: script {src} can not be loaded: {error}") from error
+        script = src
+    template = MalangeTemplate(path, digest, tree, script, tuple(specials), *builder.finish())
+    if profile:
+        PROFILER.record("compile", path, time.perf_counter_ns() - lexed)
+    return template
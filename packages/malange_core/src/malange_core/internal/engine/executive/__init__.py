@@ -3,9 +3,110 @@
     malange_core.internal.engine.executive
 
     This contains the base template classes for executives.
-    Executives will
+    Executives will process the content of an element at compile time,
+    chosen by a tag, an attribute and its value, e.g. <style lang="css">
+    in ENGINE.EXECUTIVES = {"style": {"lang": {"css": MalangeCSSExecutive}}}.
+
+    The engine resolves EXECUTIVES once into a flat table keyed by (tag,
+    attribute, value), with one instance per executive class. An instance
+    keeps its results by a hash of the content, so the same block in many
+    templates is processed once. HEAVY executives run on a thread pool
+    while the rest of the template compiles.
 
 '''
 
+import hashlib
+import functools
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 class MalangeExecutive:
-    pass
\ No newline at end of file
+    VERSION : str  = "0"   # Bump when the output changes, so __malacache__ entries are invalidated.
+    HEAVY   : bool = False # Run on the executive thread pool, see executive_pool().
+    def __init__(self):
+        self.hits      : int            = 0
+        self.misses    : int            = 0
+        self.__results : dict[str, str] = {} # Hash of the content and attributes -> output.
+        self.__lock    : threading.Lock = threading.Lock()
+    def execute(self, content: str, attributes: dict[str, str]) -> str:
+        '''
+            Process the content of an element, override this. The output must only
+            depend on the arguments, it is cached by their hash.
+
+            parameter:
+                content    str  : The text between the opening and the closing tag.
+                attributes dict : The attributes of the opening tag, None as the value of a bare one.
+            return:
+                str : What goes in place of content.
+        '''
+        return content
+    def __call__(self, content: str, attributes: dict[str, str]) -> str:
+        '''Return the output of execute(), from the cache if that content was processed before.'''
+        digest = hashlib.blake2b(repr((content, sorted(attributes.items()))).encode(), digest_size=16).hexdigest()
+        with self.__lock:
+            output = self.__results.get(digest)
+            if output is not None:
+                self.hits += 1
+                return output
+            self.misses += 1
+        output = self.execute(content, attributes) # Outside the lock, other contents may run meanwhile.
+        with self.__lock:
+            self.__results[digest] = output
+        return output
+
+ExecutiveTable = dict[tuple[str, str, str], MalangeExecutive]
+
+def flatten(tree: dict) -> tuple[tuple[tuple[str, str, str], type], ...]:
+    '''
+        Turn the nested EXECUTIVES dict into ((tag, attribute, value), class) pairs.
+
+        raise:
+            TypeError : The dict is not three levels of str keys with executive classes at the bottom.
+    '''
+    pairs = []
+    if not isinstance(tree, dict):
+        raise TypeError("EXECUTIVES is not a dictionary.")
+    for tag, attributes in tree.items():
+        if not isinstance(attributes, dict):
+            raise TypeError(f"EXECUTIVES[{tag!r}] is not a dictionary of attributes.")
+        for attribute, values in attributes.items():
+            if not isinstance(values, dict):
+                raise TypeError(f"EXECUTIVES[{tag!r}][{attribute!r}] is not a dictionary of values.")
+            for value, executive in values.items():
+                if not all(isinstance(key, str) for key in (tag, attribute, value)):
+                    raise TypeError(f"EXECUTIVES has a key that is not a str under {tag!r}.")
+                if not (isinstance(executive, type) and issubclass(executive, MalangeExecutive)):
+                    raise TypeError(f"EXECUTIVES[{tag!r}][{attribute!r}][{value!r}] is not a MalangeExecutive.")
+                pairs.append(((tag.lower(), attribute.lower(), value), executive))
+    return tuple(pairs)
+
+@functools.cache
+def instantiate(pairs: tuple[tuple[tuple[str, str, str], type], ...]) -> ExecutiveTable:
+    '''Build the dispatch table, one instance per class, once per process for the same pairs.'''
+    instances, table = {}, {}
+    for key, executive in pairs:
+        if executive not in instances:
+            instances[executive] = executive()
+        table[key] = instances[executive]
+    return table
+
+def executive_table(tree: dict) -> ExecutiveTable:
+    '''Return the dispatch table of the nested EXECUTIVES dict, see flatten().'''
+    return instantiate(flatten(tree))
+
+def executive_classes(table: ExecutiveTable) -> tuple[tuple[tuple[str, str, str], type], ...]:
+    '''Return the pairs a table was built from, to build it again in a build worker.'''
+    return tuple((key, type(executive)) for key, executive in table.items())
+
+EXECUTIVE_POOL : Optional[ThreadPoolExecutor] = None
+POOL_LOCK      : threading.Lock               = threading.Lock()
+
+def executive_pool() -> ThreadPoolExecutor:
+    '''Return the thread pool of the HEAVY executives, started on first use.'''
+    global EXECUTIVE_POOL
+    with POOL_LOCK:
+        if EXECUTIVE_POOL is None:
+            EXECUTIVE_POOL = ThreadPoolExecutor(thread_name_prefix="malange_executive")
+        return EXECUTIVE_POOL
@@ -0,0 +1,44 @@
+'''
+
+    malange_core.internal.engine.executive.css
+
+    The CSS executive, it minifies <style lang="css"> blocks: comments
+    are dropped (but /*! ... */ ones), runs of whitespace become one space,
+    and spaces next to { } ; , > and after : are removed, as well as the
+    last ; of a rule. Strings are kept as they are.
+
+'''
+
+import re
+
+from malange_core.internal.engine.executive import MalangeExecutive
+
+# Strings, comments, whitespace, punctuation, or anything else up to one of those.
+CSS_TOKENS = re.compile(r'''("(?:\\.|[^"\\])*"?|'(?:\\.|[^'\\])*'?)|(/\*.*?(?:\*/|$))|(\s+)|([{};,>]|[^"'/\s{};,>]+|/)''',
+                        re.S)
+TIGHT = set("{};,>") # No space is needed on either side of these.
+
+def minify(css: str) -> str:
+    '''Return the CSS without what does not change its meaning.'''
+    output : list[str] = []
+    space  : bool      = False # Whitespace (or a comment) was skipped since the last output.
+    for string, comment, blank, other in CSS_TOKENS.findall(css):
+        if blank or (comment and not comment.startswith("/*!")):
+            space = True
+            continue
+        text = string or comment or other
+        if space and output:
+            last = output[-1][-1]
+            if last not in TIGHT and last != ":" and text[0] not in TIGHT:
+                output.append(" ")
+        space = False
+        if text[0] == "}" and output and output[-1] == ";":
+            output.pop() # The last declaration needs no ;
+        output.append(text)
+    return "".join(output)
+
+class MalangeCSSExecutive(MalangeExecutive):
+    '''Minifies CSS, see minify().'''
+    VERSION = "1"
+    def execute(self, content: str, attributes: dict[str, str]) -> str:
+        return minify(content)
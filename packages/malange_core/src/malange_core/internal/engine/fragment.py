@@ -0,0 +1,183 @@
+'''
+    malange_core.internal.engine.fragment
+
+    Backends of the [cache key ttl=.../] ... [/cache] block, which keep
+    the rendered bytes of a section so it renders once per key instead of
+    once per request. The key of an entry is (template path, digest of the
+    template source, block number, value of the key expression): once the
+    template is edited its blocks miss, and the entries of the old source
+    are left for the backend to evict or expire.
+    - MalangeFragments : The interface, with the hit, miss and eviction counters.
+    - MemoryFragments  : Bounded LRU in the process, entries expire after their ttl.
+    - DiskFragments    : A directory shared by several workers, one file per entry.
+      Its keys are made of None, str and int, whose repr every worker agrees on.
+
+    The backend is ENGINE.FRAGMENTS, a MemoryFragments by default.
+'''
+
+import os
+import time
+import struct
+import hashlib
+import threading
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional
+
+def stable(key: Any) -> bool:
+    '''Whether the repr of key is the same in every process: None, str, int, or tuples of them.'''
+    if isinstance(key, tuple):
+        return all(stable(item) for item in key)
+    return key is None or isinstance(key, (str, int))
+
+class MalangeFragments(ABC):
+    '''Base class of the fragment cache backends.'''
+    def __init__(self):
+        self.hits      : int = 0
+        self.misses    : int = 0
+        self.evictions : int = 0 # Entries dropped to make room, or because they expired.
+    @abstractmethod
+    def get(self, key: Any) -> Optional[bytes]:
+        '''Return the fragment, None if there is none or it expired.'''
+    @abstractmethod
+    def set(self, key: Any, value: bytes, ttl: Optional[float] = None) -> None:
+        '''Store the fragment for ttl seconds, forever (until evicted) if None.'''
+    @abstractmethod
+    def clear(self) -> None:
+        '''Drop every fragment.'''
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+class MemoryFragments(MalangeFragments):
+    '''Fragments kept in the process, least recently used first out.'''
+    def __init__(self, capacity: int = 1024):
+        '''
+            parameter:
+                capacity int : Most fragments kept.
+        '''
+        super().__init__()
+        self.capacity  : int            = capacity
+        self.__entries : OrderedDict    = OrderedDict() # Key -> (expiry or None, bytes).
+        self.__lock    : threading.Lock = threading.Lock()
+    def get(self, key: Any) -> Optional[bytes]:
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] is not None and entry[0] <= time.monotonic():
+                del self.__entries[key]
+                self.evictions += 1
+                self.misses    += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    def set(self, key: Any, value: bytes, ttl: Optional[float] = None) -> None:
+        expires = None if ttl is None else time.monotonic() + ttl
+        with self.__lock:
+            self.__entries[key] = (expires, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.capacity:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+class DiskFragments(MalangeFragments):
+    '''
+        Fragments kept as files in a directory, so every worker of a server shares them.
+        A file is the expiry time (wall clock, 0 for none) followed by the bytes, written
+        atomically the same way as __malacache__ entries.
+    '''
+    HEADER = struct.Struct("<d")
+
+    def __init__(self, directory: str, capacity: int = 16384):
+        '''
+            parameter:
+                directory str : Where the fragments are kept, created if missing.
+                capacity  int : Most fragments kept, the least recently used are removed past it.
+        '''
+        super().__init__()
+        self.directory : str = directory
+        self.capacity  : int = capacity
+        self.__stored  : int = 0 # Stores since the directory was last counted.
+        os.makedirs(directory, exist_ok=True)
+    def path(self, key: Any) -> str:
+        '''
+            Return the file of a key, keys are told apart by their repr.
+
+            raise:
+                TypeError : The key is not made of None, str and int, so its repr may differ
+                            between workers, or name another key.
+        '''
+        if not stable(key):
+            raise TypeError(f"Fragment key {key!r} is not made of None, str, int and tuples of them.")
+        return os.path.join(self.directory, hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest())
+    def get(self, key: Any) -> Optional[bytes]:
+        path = self.path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except OSError:
+            self.misses += 1
+            return None
+        if len(data) < self.HEADER.size:
+            self.misses += 1
+            return None
+        expires = self.HEADER.unpack_from(data)[0]
+        if expires and expires <= time.time():
+            self.__remove(path)
+            self.misses += 1
+            return None
+        try:
+            os.utime(path) # The modification time orders the files for eviction.
+        except OSError:
+            pass
+        self.hits += 1
+        return data[self.HEADER.size:]
+    def set(self, key: Any, value: bytes, ttl: Optional[float] = None) -> None:
+        path = self.path(key)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp, "wb") as file:
+                file.write(self.HEADER.pack(0.0 if ttl is None else time.time() + ttl) + value)
+            os.replace(temp, path)
+        except OSError:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            return
+        self.__stored += 1
+        if self.__stored >= max(1, self.capacity // 16): # Counting the directory is not free.
+            self.__stored = 0
+            self.__prune()
+    def clear(self) -> None:
+        for entry in os.scandir(self.directory):
+            self.__remove(entry.path, count=False)
+    def __remove(self, path: str, count: bool = True) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            return # Removed by another worker.
+        if count:
+            self.evictions += 1
+    def __prune(self) -> None:
+        '''Remove the least recently used files past the capacity.'''
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                pass
+        if len(entries) > self.capacity:
+            entries.sort()
+            for _, path in entries[:len(entries) - self.capacity]:
+                self.__remove(path)
@@ -0,0 +1,127 @@
+'''
+    malange_core.internal.engine.lexer.buffer
+
+    Lexemes stored as parallel arrays instead of one object per lexeme.
+    - kinds  array('H') : Token id, 0 is plain text.
+    - starts array('I') : Start offset.
+    - ends   array('I') : End offset (exclusive).
+    - modes  array('B') : Value of the mode the lexeme was found in.
+
+    The text is only sliced from the header when asked for, and LexerView
+    gives the same attributes as a LexerLexeme for code iterating it.
+
+    Lexed through a LexerStreamHeader the offsets are bytes, characters()
+    turns them into offsets of the decoded text, which the parser and the
+    compiler slice.
+'''
+
+import re
+import bisect
+
+from array import array
+from enum import Enum
+from typing import Iterable, Iterator, Optional
+
+CONTINUATION = re.compile(rb"[\x80-\xbf]") # UTF-8 bytes that do not start a char.
+
+class LexerView:
+    '''A lexeme of a LexerBuffer, read from the arrays on access.'''
+    __slots__ = ("buffer", "index")
+    def __init__(self, buffer: "LexerBuffer", index: int):
+        self.buffer : LexerBuffer = buffer
+        self.index  : int         = index
+    @property
+    def token(self) -> Optional[Enum]:
+        return self.buffer.TOKENS[self.buffer.kinds[self.index]]
+    @property
+    def start(self) -> int:
+        return self.buffer.starts[self.index]
+    @property
+    def end(self) -> int:
+        return self.buffer.ends[self.index]
+    @property
+    def mode(self) -> Enum:
+        return self.buffer.MODES(self.buffer.modes[self.index])
+    @property
+    def text(self) -> str:
+        return self.buffer.text(self.index)
+    def __repr__(self) -> str:
+        token = self.token
+        return f"LexerView({'TEXT' if token is None else token.name}, {self.start}, {self.end})"
+
+class LexerBuffer:
+    '''Struct of arrays holding the lexemes of one file.'''
+    def __init__(self, tokens: type[Enum], modes: type[Enum], header = None):
+        '''
+            parameter:
+                tokens type[Enum] : The TOKENS enum of the processor.
+                modes  type[Enum] : The mode enum of the processor.
+                header            : Where the text is read from, it needs read(start, end).
+        '''
+        self.TOKENS : tuple[Optional[Enum], ...] = (None,) + tuple(tokens) # Token id -> token.
+        self.ids    : dict[Optional[Enum], int]  = {token: i for i, token in enumerate(self.TOKENS)}
+        self.MODES  : type[Enum]                 = modes
+        self.kinds  : array                      = array("H")
+        self.starts : array                      = array("I")
+        self.ends   : array                      = array("I")
+        self.modes  : array                      = array("B")
+        self.header                              = header
+    def extend(self, found: Iterable[tuple[Optional[Enum], int, int, Enum]]) -> None:
+        '''Append (token, start, end, mode) tuples, as yielded by LexerTable.scan.'''
+        ids    = self.ids
+        kinds  = self.kinds.append
+        starts = self.starts.append
+        ends   = self.ends.append
+        modes  = self.modes.append
+        try:
+            for token, start, end, mode in found:
+                kinds(ids[token])
+                starts(start)
+                ends(end)
+                modes(mode.value)
+        except OverflowError:
+            exit(1) # ERROR: The file is too large for the offsets of a LexerBuffer.
+
+    def characters(self, data) -> "LexerBuffer":
+        '''
+            Turn byte offsets into offsets of data decoded as UTF-8, in place. Every byte
+            starts a char but the continuation ones, so an offset moves back by the number
+            of them before it; nothing moves in ASCII.
+
+            parameter:
+                data bytes | mmap : The bytes that were lexed.
+            return:
+                LexerBuffer : The buffer itself.
+        '''
+        skipped = [match.start() for match in CONTINUATION.finditer(data)]
+        if skipped:
+            for target in (self.starts, self.ends):
+                target[:] = array("I", [offset - bisect.bisect_left(skipped, offset) for offset in target])
+        return self
+    def text(self, index: int) -> str:
+        '''Return the text of a lexeme, sliced from the header.'''
+        if self.header is None:
+            exit(1) # ERROR: The buffer has no header to read the text from.
+        return self.header.read(self.starts[index], self.ends[index])
+    def __len__(self) -> int:
+        return len(self.kinds)
+    def __getitem__(self, index: int) -> LexerView:
+        if index < 0:
+            index += len(self.kinds)
+        if not 0 <= index < len(self.kinds):
+            raise IndexError("LexerBuffer index out of range")
+        return LexerView(self, index)
+    def __iter__(self) -> Iterator[LexerView]:
+        for index in range(len(self.kinds)):
+            yield LexerView(self, index)
+
+    # Storage, used by the __malacache__.
+    def dump(self) -> tuple[bytes, bytes, bytes, bytes]:
+        '''Return the arrays as bytes.'''
+        return (self.kinds.tobytes(), self.starts.tobytes(), self.ends.tobytes(), self.modes.tobytes())
+    def load(self, data: tuple[bytes, bytes, bytes, bytes]) -> "LexerBuffer":
+        '''Fill the arrays from what dump() returned.'''
+        for target, raw in zip((self.kinds, self.starts, self.ends, self.modes), data):
+            del target[:]
+            target.frombytes(raw)
+        return self
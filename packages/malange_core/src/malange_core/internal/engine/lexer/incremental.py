@@ -0,0 +1,203 @@
+'''
+    malange_core.internal.engine.lexer.incremental
+
+    Re-lexing only the part of a file an edit touched, for hot reload.
+
+    Lexemes tile the whole file, so they are kept as lengths rather than
+    offsets and nothing after an edit has to be shifted. A lexeme found
+    while the stack of the LexerState is empty (and not right after plain
+    text) is a safe checkpoint, its mode alone is enough to restart the
+    scan there. After an edit the scan restarts from the last checkpoint
+    before it, and stops at the first checkpoint past it that lines up
+    with an old one in the same mode.
+
+    A saved file only gives its new text, difference() finds the range
+    that changed, and buffer() gives the lexemes to the parser the way
+    LexerProcessor.buffer() does (see MalangeEngine.reload()).
+'''
+
+import itertools
+
+from array import array
+from enum import Enum
+from typing import Iterator, Optional
+
+from malange_core.internal.engine.lexer.table import LexerState
+from malange_core.internal.engine.lexer.buffer import LexerBuffer
+from malange_core.internal.engine.lexer.processor import LexerProcessor, LexerHeader
+
+def difference(old: str, new: str) -> tuple[int, int, str]:
+    '''
+        Return (start, end, text), new is old with old[start:end] replaced by text.
+        The shared prefix and suffix are found by halving, comparing slices at once.
+    '''
+    low, high = 0, min(len(old), len(new))
+    while low < high: # Longest shared prefix.
+        middle = (low + high + 1) // 2
+        if old[low:middle] == new[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    start, size, high = low, 0, min(len(old), len(new)) - low
+    while size < high: # Longest shared suffix, not overlapping the prefix.
+        middle = (size + high + 1) // 2
+        if old[len(old) - middle:len(old) - size] == new[len(new) - middle:len(new) - size]:
+            size = middle
+        else:
+            high = middle - 1
+    return start, len(old) - size, new[start:len(new) - size]
+
+class LexerIncremental:
+    '''Lexemes of one file, updated edit by edit.'''
+    BLOCK: int = 512 # Lexemes per block, blocks keep the lookup of an offset cheap.
+
+    def __init__(self, lexer: LexerProcessor):
+        '''
+            Lex the whole file once.
+
+            parameter:
+                lexer LexerProcessor : The processor, its header must be a LexerHeader.
+        '''
+        if not isinstance(lexer.header(), LexerHeader):
+            exit(1) # ERROR: Incremental lexing needs the whole text, not a stream header.
+        self.__table  = lexer.TABLE
+        self.__tokens = lexer.TOKENS
+        self.__header : LexerHeader             = lexer.header()
+        self.__start  : Enum                    = lexer.state().mode
+        self.text     : str                     = lexer.header().text()
+        self.__blocks : list[list[tuple]]       = [] # (token, length, mode, safe) per lexeme.
+        self.__sizes  : list[int]               = [] # Chars covered by each block.
+        self.__packed : list[Optional[tuple]]   = [] # (kinds, lengths, modes) arrays per block, see buffer().
+        self.__splice(0, 0, 0, list(self.__relex(lexer.state(), 0, self.text)))
+
+    def __relex(self, state: LexerState, start: int, text: str) -> Iterator[tuple]:
+        '''
+            Scan text from start, yielding (token, start, end, mode, safe).
+            A token right after plain text is never safe: where the text ends depends
+            on the token itself, so a restart has to begin with the text.
+        '''
+        stack = state.stack # Mutated in place by the contexts, read before each token runs.
+        plain = False
+        for token, begin, end, mode in self.__table.scan(text, state, start):
+            yield (token, begin, end, mode, not stack and (token is None or not plain))
+            plain = token is None
+
+    def __iter__(self) -> Iterator[tuple[Optional[Enum], int, int, Enum]]:
+        '''Yield every lexeme as (token, start, end, mode).'''
+        pos = 0
+        for block in self.__blocks:
+            for token, length, mode, _ in block:
+                yield (token, pos, pos + length, mode)
+                pos += length
+    def __len__(self) -> int:
+        return sum(len(block) for block in self.__blocks)
+    def buffer(self) -> LexerBuffer:
+        '''Return the lexemes of the current text as a LexerBuffer, see LexerProcessor.buffer().'''
+        buffer  = LexerBuffer(self.__tokens, type(self.__start),
+                              LexerHeader(self.text, self.__header.name, self.__header.dir))
+        ids     = buffer.ids
+        lengths = array("I")
+        for b, block in enumerate(self.__blocks): # Only the blocks an edit replaced are packed again.
+            packed = self.__packed[b]
+            if packed is None:
+                packed = self.__packed[b] = (array("H", [ids[item[0]] for item in block]),
+                                             array("I", [item[1] for item in block]),
+                                             array("B", [item[2].value for item in block]))
+            buffer.kinds.extend(packed[0])
+            lengths.extend(packed[1])
+            buffer.modes.extend(packed[2])
+        buffer.ends.extend(itertools.accumulate(lengths))
+        buffer.starts.append(0)
+        buffer.starts.extend(buffer.ends[:-1])
+        if not lengths:
+            buffer.starts.pop()
+        return buffer
+
+    def __checkpoint(self, limit: int) -> tuple[int, int, int, int]:
+        '''Return (block, index, global index, offset) of the last safe lexeme starting at or before limit.'''
+        pos, count, found = 0, 0, (0, 0, 0, 0)
+        for b, block in enumerate(self.__blocks):
+            if pos > limit:
+                break
+            if pos + self.__sizes[b] <= limit: # Only the last safe lexeme of the block matters.
+                for i in range(len(block) - 1, -1, -1):
+                    if block[i][3]:
+                        found = (b, i, count + i, pos + sum(item[1] for item in block[:i]))
+                        break
+            else:
+                at = pos
+                for i, item in enumerate(block):
+                    if at > limit:
+                        break
+                    if item[3]:
+                        found = (b, i, count + i, at)
+                    at += item[1]
+            pos   += self.__sizes[b]
+            count += len(block)
+        return found
+
+    def edit(self, start: int, end: int, text: str) -> tuple[int, int, list[tuple]]:
+        '''
+            Replace self.text[start:end] by text, and re-lex only what changed.
+
+            parameter:
+                start int : Start of the replaced range, in the old text.
+                end   int : End of the replaced range (exclusive), in the old text.
+                text  str : The new text of the range.
+            return:
+                tuple : (index of the first changed lexeme, old lexemes removed,
+                         new lexemes as (token, start, end, mode)).
+        '''
+        if not 0 <= start <= end <= len(self.text):
+            exit(1) # ERROR: The edited range is outside of the file.
+        new   = self.text[:start] + text + self.text[end:]
+        delta = len(text) - (end - start)
+        done  = start + len(text) # End of the edit in the new text.
+        # Anything that could have matched a literal running into the edit is lexed again.
+        block, index, first, pos = self.__checkpoint(start - self.__table.margin + 1)
+        mode  = self.__blocks[block][index][2] if self.__blocks else self.__start
+
+        # Walk the old lexemes along the new ones, until a safe lexeme lines up.
+        old     = self.__old(block, index, pos)
+        current = next(old, None)
+        found   = []
+        aligned = None
+        for token, begin, finish, lmode, safe in self.__relex(LexerState(mode), pos, new):
+            if safe and begin >= done:
+                while current is not None and current[1] + delta < begin:
+                    current = next(old, None)
+                if (current is not None and current[1] + delta == begin
+                    and current[3] and current[2] is lmode):
+                    aligned = current
+                    break
+            found.append((token, begin, finish, lmode, safe))
+        # Without realignment everything from the checkpoint on was replaced.
+        removed = (len(self) if aligned is None else aligned[4]) - first
+        self.text = new
+        self.__splice(block, index, removed, found)
+        return first, removed, [(token, begin, finish, lmode) for token, begin, finish, lmode, _ in found]
+
+    def __old(self, block: int, index: int, pos: int) -> Iterator[tuple]:
+        '''Yield old lexemes as (token, start, mode, safe, global index) from a checkpoint.'''
+        count = sum(len(b) for b in self.__blocks[:block]) + index
+        for b in range(block, len(self.__blocks)):
+            items = self.__blocks[b]
+            for i in range(index if b == block else 0, len(items)):
+                token, length, mode, safe = items[i]
+                yield (token, pos, mode, safe, count)
+                pos   += length
+                count += 1
+    def __splice(self, block: int, index: int, removed: int, found: list[tuple]) -> None:
+        '''Replace removed old lexemes from (block, index) by the found ones.'''
+        # Find where the removed lexemes end.
+        last, skip = block, index + removed
+        while last < len(self.__blocks) and skip >= len(self.__blocks[last]):
+            skip -= len(self.__blocks[last])
+            last += 1
+        head = self.__blocks[block][:index] if self.__blocks else []
+        tail = self.__blocks[last][skip:] if last < len(self.__blocks) else []
+        items = head + [(token, end - start, mode, safe) for token, start, end, mode, safe in found] + tail
+        blocks = [items[i:i+self.BLOCK] for i in range(0, len(items), self.BLOCK)]
+        self.__blocks[block:last+1] = blocks
+        self.__sizes[block:last+1]  = [sum(item[1] for item in b) for b in blocks]
+        self.__packed[block:last+1] = [None] * len(blocks)
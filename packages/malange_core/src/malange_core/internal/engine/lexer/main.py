@@ -1,5 +1,130 @@
-from malange_core.internal.manager.config import MalangeConfig
+'''
+    malange_core.internal.engine.lexer.main
 
-class LexerMain:
-    def __init__(self):
-        pass
+    The lexer of the Malange template language (.mala), built on top of
+    LexerProcessor. Plain HTML is not tokenized, only what Malange cares
+    about: comments, blocks, specials, strings inside them, escapes, and
+    the raw text of <style> and <script> elements.
+'''
+
+from typing import Union
+
+from malange_core.internal.engine.lexer.mode import DefaultModes
+from malange_core.internal.engine.lexer.processor import (LexerProcessor, LexerHeader,
+                                                          NO_CONTEXT, ESCAPE)
+from malange_core.internal.engine.lexer.buffer import LexerBuffer
+from malange_core.internal.engine.lexer.table import context_push, context_pop
+from malange_core.internal.engine.lexer.stream import LexerStreamHeader
+
+M = DefaultModes
+
+# Modes in which Python-like strings are tracked, so closers inside them are ignored.
+STRING_MODES = ["PYTHON_CODE", "TAG_MALANGE", "TAG_HTML"]
+
+class LexerMain(LexerProcessor):
+    '''Lexer for the Malange template language.'''
+    def __init__(self, header: Union[LexerHeader, LexerStreamHeader], metadata: dict[str, str] = {}):
+        super().__init__(header, metadata, DefaultModes)
+    def prepare(self) -> tuple[dict, dict, dict]:
+        units = {
+            "LT"        : "<",
+            "GT"        : ">",
+            "BANG"      : "!",
+            "DASH"      : "-",
+            "SLASH"     : "/",
+            "STAR"      : "*",
+            "LBRACKET"  : "[",
+            "RBRACKET"  : "]",
+            "LBRACE"    : "{",
+            "RBRACE"    : "}",
+            "DOLLAR"    : "$",
+            "AT"        : "@",
+            "DQUOTE"    : '"',
+            "SQUOTE"    : "'",
+            "BACKSLASH" : "\\",
+            "SCRIPT"    : "script",
+            "STYLE"     : "style",
+        }
+        tokens = {
+            # Comments: <!-- ... -->
+            "COMMENT_OPEN"       : ["LT", "BANG", "DASH", "DASH"],
+            "COMMENT_CLOSE"      : ["DASH", "DASH", "GT"],
+            # Blocks: [ ... /] opening, [/ ... /] middle, [/ ... ] closing.
+            "BLOCK_OPEN"         : ["LBRACKET"],
+            "BLOCK_SLASH_OPEN"   : ["LBRACKET", "SLASH"],
+            "BLOCK_SLASH_CLOSE"  : ["SLASH", "RBRACKET"],
+            "BLOCK_CLOSE"        : ["RBRACKET"],
+            "BRACKET_OPEN"       : ["LBRACKET"],
+            # Script block: [script ... /] ... [/script]
+            "SCRIPT_OPEN"        : ["LBRACKET", "SCRIPT"],
+            "SCRIPT_CLOSE"       : ["LBRACKET", "SLASH", "SCRIPT", "RBRACKET"],
+            # Specials: ${ ... } injection and @{ ... } action.
+            "INJECT_OPEN"        : ["DOLLAR", "LBRACE"],
+            "ACTION_OPEN"        : ["AT", "LBRACE"],
+            "BRACE_OPEN"         : ["LBRACE"],
+            "BRACE_CLOSE"        : ["RBRACE"],
+            # Strings inside Python code and tags.
+            "DQUOTE3_OPEN"       : ["DQUOTE", "DQUOTE", "DQUOTE"],
+            "SQUOTE3_OPEN"       : ["SQUOTE", "SQUOTE", "SQUOTE"],
+            "DQUOTE_OPEN"        : ["DQUOTE"],
+            "SQUOTE_OPEN"        : ["SQUOTE"],
+            "DQUOTE3_CLOSE"      : ["DQUOTE", "DQUOTE", "DQUOTE"],
+            "SQUOTE3_CLOSE"      : ["SQUOTE", "SQUOTE", "SQUOTE"],
+            "DQUOTE_CLOSE"       : ["DQUOTE"],
+            "SQUOTE_CLOSE"       : ["SQUOTE"],
+            # Raw text elements: <style> ... </style> and <script> ... </script>
+            "STYLE_OPEN"         : ["LT", "STYLE"],
+            "STYLE_END"          : ["LT", "SLASH", "STYLE"],
+            "JS_OPEN"            : ["LT", "SCRIPT"],
+            "JS_END"             : ["LT", "SLASH", "SCRIPT"],
+            "TAG_CLOSE"          : ["GT"],
+            "CSS_COMMENT_OPEN"   : ["SLASH", "STAR"],
+            "CSS_COMMENT_CLOSE"  : ["STAR", "SLASH"],
+            # Escape: \ followed by any char.
+            "ESCAPE"             : ["BACKSLASH"],
+        }
+        context = {
+            "COMMENT_OPEN"      : ["NORMAL_CODE",  "NORMAL_COMME", NO_CONTEXT],
+            "COMMENT_CLOSE"     : ["NORMAL_COMME", "NORMAL_CODE",  NO_CONTEXT],
+            "BLOCK_OPEN"        : ["NORMAL_CODE",  "TAG_MALANGE",
+                                   context_push("BLOCK_CLOSE", "BLOCK_SLASH_CLOSE")],
+            "BLOCK_SLASH_OPEN"  : ["NORMAL_CODE",  "TAG_MALANGE",
+                                   context_push("BLOCK_CLOSE", "BLOCK_SLASH_CLOSE")],
+            "BLOCK_SLASH_CLOSE" : ["TAG_MALANGE",  "TAG_MALANGE",  context_pop],
+            "BLOCK_CLOSE"       : ["TAG_MALANGE",  "TAG_MALANGE",  context_pop],
+            "BRACKET_OPEN"      : ["TAG_MALANGE",  "TAG_MALANGE",  context_push("BLOCK_CLOSE")],
+            "SCRIPT_OPEN"       : ["NORMAL_CODE",  "TAG_MALANGE",
+                                   context_push("BLOCK_SLASH_CLOSE", after=M.PYTHON_SCRIPT)],
+            "SCRIPT_CLOSE"      : ["PYTHON_SCRIPT", "NORMAL_CODE", NO_CONTEXT],
+            "INJECT_OPEN"       : [["NORMAL_CODE", "TAG_HTML"], "PYTHON_CODE",
+                                   context_push("BRACE_CLOSE")],
+            "ACTION_OPEN"       : [["NORMAL_CODE", "TAG_HTML"], "PYTHON_CODE",
+                                   context_push("BRACE_CLOSE")],
+            "BRACE_OPEN"        : ["PYTHON_CODE",  "PYTHON_CODE",  context_push("BRACE_CLOSE")],
+            "BRACE_CLOSE"       : ["PYTHON_CODE",  "PYTHON_CODE",  context_pop],
+            "DQUOTE3_OPEN"      : [STRING_MODES,   "NORMAL_STR",   context_push("DQUOTE3_CLOSE")],
+            "SQUOTE3_OPEN"      : [STRING_MODES,   "NORMAL_STR",   context_push("SQUOTE3_CLOSE")],
+            "DQUOTE_OPEN"       : [STRING_MODES,   "NORMAL_STR",   context_push("DQUOTE_CLOSE")],
+            "SQUOTE_OPEN"       : [STRING_MODES,   "NORMAL_STR",   context_push("SQUOTE_CLOSE")],
+            "DQUOTE3_CLOSE"     : ["NORMAL_STR",   "NORMAL_STR",   context_pop],
+            "SQUOTE3_CLOSE"     : ["NORMAL_STR",   "NORMAL_STR",   context_pop],
+            "DQUOTE_CLOSE"      : ["NORMAL_STR",   "NORMAL_STR",   context_pop],
+            "SQUOTE_CLOSE"      : ["NORMAL_STR",   "NORMAL_STR",   context_pop],
+            "STYLE_OPEN"        : ["NORMAL_CODE",  "TAG_HTML",
+                                   context_push("TAG_CLOSE", after=M.CSS_CODE)],
+            "STYLE_END"         : ["CSS_CODE",     "TAG_HTML",
+                                   context_push("TAG_CLOSE", after=M.NORMAL_CODE)],
+            "JS_OPEN"           : ["NORMAL_CODE",  "TAG_HTML",
+                                   context_push("TAG_CLOSE", after=M.JS_CODE)],
+            "JS_END"            : ["JS_CODE",      "TAG_HTML",
+                                   context_push("TAG_CLOSE", after=M.NORMAL_CODE)],
+            "TAG_CLOSE"         : ["TAG_HTML",     "TAG_HTML",     context_pop],
+            "CSS_COMMENT_OPEN"  : ["CSS_CODE",     "CSS_COMME",    NO_CONTEXT],
+            "CSS_COMMENT_CLOSE" : ["CSS_COMME",    "CSS_CODE",     NO_CONTEXT],
+            "ESCAPE"            : [["NORMAL_CODE", "TAG_MALANGE", "NORMAL_STR", "PYTHON_CODE"],
+                                   "NORMAL_CODE",  ESCAPE],
+        }
+        return units, tokens, context
+    def process(self) -> LexerBuffer:
+        '''Lex the whole file.'''
+        return self.buffer()
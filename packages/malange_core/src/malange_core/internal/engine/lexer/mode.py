@@ -14,9 +14,10 @@ class DefaultModes(Enum):
     NORMAL_STR    = auto() # " ... " or ' ... ' or """ ... """ or ''' ... ''' or ` ... `
     # HTML and Malange tags.
     TAG_HTML      = auto() # < ... should end with > or />
-    TAG_MALANGE   = auto() # </ ... should end with >
+    TAG_MALANGE   = auto() # [ ... or [/ ... should end with ] or /]
     # Python: Any Python code.
     PYTHON_CODE   = auto() # Generic Python code.
+    PYTHON_SCRIPT = auto() # [script/] ... should end with [/script]
     PYTHON_COMME  = auto() # # .... should end with newline.
     # Javascript: JS Script is not taken care.
     JS_CODE       = auto()  # JS code wrapped in <script>
@@ -6,14 +6,20 @@
     - Token  : Lexical unit of analysis.
     - Unit   : Divisions of a token.
     - Header : Reader of the file stream.
+    - Lexeme : A token (or a run of plain text) found in the file.
 '''
 
 import re
 from enum import Enum
+from typing import Iterator, Optional, Union
 
 from malange_core.types import EmptyEnum
+from malange_core.internal.engine.lexer.table import LexerTable, LexerState
+from malange_core.internal.engine.lexer.stream import LexerStreamHeader
+from malange_core.internal.engine.lexer.buffer import LexerBuffer
 
 NO_CONTEXT = object() # Placeholder for no no context.
+ESCAPE     = object() # Placeholder for escape tokens, the char after it is taken verbatim.
 
 def valid_unit_token(string: str) -> bool:
     '''
@@ -39,6 +45,12 @@ class LexerHeader:
         self.__ind:  str = 0
         self.name:   str = name
         self.dir:    str = dir
+    def text(self) -> str:
+        '''Return the whole file text, used by the scanner to search it without stepping.'''
+        return self.__file
+    def read(self, start: int, end: int) -> str:
+        '''Return the text between two indexes, used by lexemes to get their text lazily.'''
+        return self.__file[start:end]
     def __call__(self) -> str:
         '''Return the current char.'''
         return self.__file[self.__ind]
@@ -86,112 +98,188 @@ class LexerUnit:
     '''Composing units, aka subdivision of tokens, e.g. < ... > has < and >.'''
     def __init__(self, content: any):
         self.__content = content
-    def __call__(self) -> tuple[any, int]:
-        return (self.__content, self.__ind)
+    def __call__(self) -> any:
+        return self.__content
+
+class LexerLexeme:
+    '''A token found by the scanner, or a run of plain text when token is None.'''
+    def __init__(self, token: Optional[Enum], start: int, end: int, mode: Enum,
+                 header: Union[LexerHeader, LexerStreamHeader]):
+        self.token  : Optional[Enum] = token  # The token, None for plain text.
+        self.start  : int            = start  # Start offset in the file.
+        self.end    : int            = end    # End offset in the file (exclusive).
+        self.mode   : Enum           = mode   # The mode the lexeme was found in.
+        self.header                  = header # The header the text is read from.
+    @property
+    def text(self) -> str:
+        '''The text of the lexeme, only read from the header when asked for.'''
+        return self.header.read(self.start, self.end)
+    def __repr__(self) -> str:
+        name = "TEXT" if self.token is None else self.token.name
+        return f"LexerLexeme({name}, {self.text!r}, {self.start}, {self.mode.name})"
 
 class LexerProcessor:
     '''Class for lexer processer, acting as the base template.'''
-    def __init__(self, header: LexerHeader, metadata: dict[str, str], mode):
+    START: str = "NORMAL_CODE" # The mode the header is in at the start of the file.
+
+    # Compiled (UNITS, TOKENS, CONTEXT, TABLE) per subclass and mode enum, built only once.
+    __compiled: dict[tuple[type, type[Enum]], tuple] = {}
+
+    def __init__(self, header: Union[LexerHeader, LexerStreamHeader], metadata: dict[str, str], mode):
         self.UNITS   : type[Enum]
         self.TOKENS  : type[Enum]
         self.CONTEXT : dict[type[Enum], list]
-        units        : dict[str, str]
-        tokens       : dict[str, list[str]]
-        context      : dict[str, list[str]]
-
-        self.UNITS   = EmptyEnum  # This will store enums of the units.
-        self.TOKENS  = EmptyEnum  # This will store enums of the tokens.
-        self.CONTEXT = {}         # This won't store an enum, just a map.
+        self.TABLE   : LexerTable
 
-        self.__header : LexerHeader    = header
+        self.__header                  = header
         self.__meta   : dict[str, str] = metadata
         self.__mode                    = mode
 
-        units, tokens, context = self.prepare()
+        compiled = LexerProcessor.__compiled.get((type(self), mode))
+        if compiled is None: # First instance of this subclass, compile it.
+            compiled = self.__compile(*self.prepare())
+            LexerProcessor.__compiled[(type(self), mode)] = compiled
+        self.UNITS, self.TOKENS, self.CONTEXT, self.TABLE = compiled
 
+    def __compile(self, units: dict[str, str], tokens: dict[str, list[str]],
+                  context: dict[str, list]) -> tuple:
         '''
             Preparing the processor by loading the valid units, tokens, and context.
             Context indicates what modes the header must be in to detect the token.
             The context is composed like this:
             TOKEN : [ENTRY_MODE, EXIT_MODE, CONTEXT]
-            - ENTRY_MODE: The mode the header must be in to detect the token.
+            - ENTRY_MODE: The mode the header must be in to detect the token, or a list of them.
             - EXIT_MODE : The mode the header must be in when exiting the token.
             - CONTEXT   : A callable that should be executed upon entry, set to NO_CONTEXT if no call.
+                          It is called with (LexerState, token) and may return a mode to use
+                          instead of EXIT_MODE. Set to ESCAPE for escape tokens.
 
             parameters:
                 units   dict[str, str]       : The key is the token name, the value is the text.
                 tokens  dict[str, list[str]] : The key is the token name, the list is the list of units.
                 context dict[str, list[any]] : The key is the token name, the list is the CONTEXT above.
-                mode                         : The list of modes.
+            return:
+                tuple : The UNITS enum, the TOKENS enum, the CONTEXT map, and the LexerTable.
         '''
-        
+        mode = self.__mode
+        UNITS   : type[Enum]             = EmptyEnum  # This will store enums of the units.
+        TOKENS  : type[Enum]             = EmptyEnum  # This will store enums of the tokens.
+        CONTEXT : dict[type[Enum], list] = {}         # This won't store an enum, just a map.
+        escapes : dict[Enum, tuple]      = {}         # Escape tokens and their entry modes.
 
         # Check if the units, tokens, and context are valid.
         if units == {} or tokens == {} or context == {}:
             exit(1) # ERROR: UNITS, TOKENS, and/or CONTEXT can not be an empty dictionary.
-        # Continue.
-        else:
 
-            # ----------------- Create a self.UNITS enum with self.tunits serving as temp storage.
-            tunits = {} # Create a temporary container for units.
-            for name, value in units.items():
-                if not isinstance(name, str) or not isinstance(value, str):
-                    exit(1) # ERROR: Units dictionary must follow dict[str, str]
-                else:
-                    if valid_unit_token(name):
-                        tunits[name] = LexerUnit(value)
-                    else:
-                        exit(1) # ERROR: Units naming scheme is invalid!
-            # Create the Units enum.
-            self.UNITS = Enum("LexerUnitList", tunits)
-
-            # ----------------- Create a self.TOKENS enum.
-            ttokens = {} # Temporary containers for tokens.
-            for token, value in tokens.items():
-                # Check if the dictionary is valid in the first place.
-                if (
-                    not isinstance(token, str) or
-                    not isinstance(value, list) or
-                    not all(isinstance(i, str) for i in value)
-                ):
-                    exit(1) # ERROR: Units dictionary must follow dict[str, list[str]]
-                # Continue.
+        # ----------------- Create a UNITS enum with tunits serving as temp storage.
+        tunits = {} # Create a temporary container for units.
+        for name, value in units.items():
+            if not isinstance(name, str) or not isinstance(value, str):
+                exit(1) # ERROR: Units dictionary must follow dict[str, str]
+            else:
+                if valid_unit_token(name):
+                    tunits[name] = LexerUnit(value)
                 else:
-                    # Check if the token name is valid.
-                    if valid_unit_token(token):
-                        ttokens[token] = ""
-                    else:
-                        exit(1) # ERROR: Token naming scheme is invalid!
-                    # Check if the tuple that contains the units are valid.
-                    tvalues = () # Temporary container for the tuple.
-                    for unit in value:
-                        try:
-                            lexer_unit: LexerUnit = self.UNITS[unit]
-                            tvalues.append(lexer_unit)
-                        except KeyError:
-                            exit(1) # ERROR: The mentioned unit in tokens dictionary does not exist.
-                    ttokens[token] = tvalues
-                    # Create the token enum.
-                    self.TOKENS = Enum("LexerToken", ttokens)
-
-            # ----------------- Create a self.CONTEXT map.
-            for token, cont in context.items():
-                # Check the actual token paired as the key.
-                try:
-                    actual_token = self.TOKENS[token]
-                except KeyError:
-                    exit(1) # ERROR: Invalid token mentioned in the contract.
-                # Check the first and second items of the context: The entry and exit modes.
+                    exit(1) # ERROR: Units naming scheme is invalid!
+        # Create the Units enum.
+        UNITS = Enum("LexerUnitList", tunits)
+
+        # ----------------- Create a TOKENS enum.
+        ttokens = {} # Temporary containers for tokens.
+        for token, value in tokens.items():
+            # Check if the dictionary is valid in the first place.
+            if (
+                not isinstance(token, str) or
+                not isinstance(value, list) or
+                not all(isinstance(i, str) for i in value)
+            ):
+                exit(1) # ERROR: Units dictionary must follow dict[str, list[str]]
+            # Check if the token name is valid.
+            if not valid_unit_token(token):
+                exit(1) # ERROR: Token naming scheme is invalid!
+            # Check if the tuple that contains the units are valid.
+            tvalues = [] # Temporary container for the tuple.
+            for unit in value:
                 try:
-                    entry_mode = mode[cont[0]]
-                    exit_mode  = mode[cont[1]]
+                    tvalues.append(UNITS[unit])
                 except KeyError:
-                    exit(1) # ERROR: Invalid modes mentioned in the contract.
-                # Check the third item of the context: The context function.
-                if callable(cont[2]) or isinstance(cont[2], NO_CONTEXT):
-                    self.CONTEXT[actual_token] = (entry_mode, exit_mode, cont[2])
-                else:
-                    exit(1) # ERROR: Invalid context function, it should be a callable or a NO_CONTEXT.
+                    exit(1) # ERROR: The mentioned unit in tokens dictionary does not exist.
+            # Wrapped like the units, so tokens sharing the same units are not merged as aliases.
+            ttokens[token] = LexerUnit(tuple(tvalues))
+        # Create the token enum.
+        TOKENS = Enum("LexerToken", ttokens)
+
+        # ----------------- Create a CONTEXT map.
+        for token, cont in context.items():
+            # Check the actual token paired as the key.
+            try:
+                actual_token = TOKENS[token]
+            except KeyError:
+                exit(1) # ERROR: Invalid token mentioned in the contract.
+            # Check the first and second items of the context: The entry and exit modes.
+            try:
+                entries    = cont[0] if isinstance(cont[0], list) else [cont[0]]
+                entry_mode = tuple(mode[entry] for entry in entries)
+                exit_mode  = mode[cont[1]]
+            except KeyError:
+                exit(1) # ERROR: Invalid modes mentioned in the contract.
+            # Check the third item of the context: The context function.
+            if cont[2] is ESCAPE:
+                escapes[actual_token] = entry_mode
+                CONTEXT[actual_token] = (entry_mode, exit_mode, cont[2])
+            elif cont[2] is NO_CONTEXT:
+                CONTEXT[actual_token] = (entry_mode, exit_mode, None)
+            elif callable(cont[2]):
+                CONTEXT[actual_token] = (entry_mode, exit_mode, cont[2])
+            else:
+                exit(1) # ERROR: Invalid context function, it should be a callable or a NO_CONTEXT.
+        if any(token not in CONTEXT for token in TOKENS):
+            exit(1) # ERROR: Every token must have its context defined.
+
+        return UNITS, TOKENS, CONTEXT, LexerTable(TOKENS, CONTEXT, escapes)
+
+    def state(self) -> LexerState:
+        '''Return the state the header is in at the start of the file.'''
+        return LexerState(self.__mode[self.START])
+    def header(self) -> Union[LexerHeader, LexerStreamHeader]:
+        '''Return the header of the processor.'''
+        return self.__header
+    def scan(self, state: Optional[LexerState] = None) -> Iterator[LexerLexeme]:
+        '''
+            Scan the file of the header with the compiled table.
+
+            parameter:
+                state LexerState : Where to start from, default is START with an empty stack.
+            return:
+                Iterator[LexerLexeme] : The lexemes, in order.
+        '''
+        header = self.__header
+        if state is None:
+            state = self.state()
+        if isinstance(header, LexerStreamHeader): # Streamed, lexemes hold byte offsets.
+            found = self.TABLE.scan_chunks(header.chunks(), state)
+        else:
+            found = self.TABLE.scan(header.text(), state)
+        for token, start, end, mode in found:
+            yield LexerLexeme(token, start, end, mode, header)
+    def buffer(self, state: Optional[LexerState] = None) -> LexerBuffer:
+        '''
+            Scan the file of the header into a LexerBuffer, without an object per lexeme.
+
+            parameter:
+                state LexerState : Where to start from, default is START with an empty stack.
+            return:
+                LexerBuffer : The lexemes, their text is read from the header on access.
+        '''
+        header = self.__header
+        if state is None:
+            state = self.state()
+        buffer = LexerBuffer(self.TOKENS, self.__mode, header)
+        if isinstance(header, LexerStreamHeader):
+            buffer.extend(self.TABLE.scan_chunks(header.chunks(), state))
+        else:
+            buffer.extend(self.TABLE.scan(header.text(), state))
+        return buffer
 
     def prepare(self):
         exit(1) # ERROR: prepare() must be defined by any subclasses of LexerProcessor.
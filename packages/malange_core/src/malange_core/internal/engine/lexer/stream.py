@@ -0,0 +1,135 @@
+'''
+    malange_core.internal.engine.lexer.stream
+
+    A header variant reading a file in fixed-size chunks, for large
+    templates that should not be decoded into memory as a whole.
+    - Indexes are byte offsets, not character offsets.
+    - The last chunk plus a lookback window stays in memory, so peek
+      and slice keep working across chunk boundaries.
+    - Anything outside of the window is read again from the file.
+
+    The engine lexes large templates through it (see MalangeCache.get()),
+    their byte offsets are then turned into char offsets of the decoded
+    text by LexerBuffer.characters().
+'''
+
+import os
+import mmap
+
+from typing import BinaryIO, Iterator, Union
+
+class LexerStreamHeader:
+    '''Header for reading the file in chunks from an mmap or a seekable binary file object.'''
+    def __init__(self, file: Union[mmap.mmap, BinaryIO], name: str, dir: str,
+                 chunk: int = 1 << 16, lookback: int = 1 << 12):
+        '''
+            Initialize the header, there should be one instance per file.
+
+            parameter:
+                file     mmap | BinaryIO : The file, must be random access.
+                name     str             : The file name.
+                dir      str             : The file directory.
+                chunk    int             : Bytes read per chunk.
+                lookback int             : Bytes kept before the current chunk.
+        '''
+        if not isinstance(file, mmap.mmap) and not file.seekable():
+            exit(1) # ERROR: The file of a stream header must be seekable.
+        if chunk <= 0 or lookback < 0:
+            exit(1) # ERROR: Invalid chunk or lookback size.
+        self.__file     : Union[mmap.mmap, BinaryIO] = file
+        self.__chunk    : int                        = chunk
+        self.__lookback : int                        = lookback
+        self.__window   : bytes                      = b"" # Bytes in memory.
+        self.__base     : int                        = 0   # Offset of the first byte of the window.
+        self.__ind      : int                        = 0
+        self.name       : str                        = name
+        self.dir        : str                        = dir
+    @classmethod
+    def map(cls, path: str, name: str, dir: str, **kwargs) -> "LexerStreamHeader":
+        '''Open the file at path with mmap, falling back to a file object for empty files.'''
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0: # mmap can not map an empty file.
+                return cls(open(path, "rb"), name, dir, **kwargs)
+            return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ), name, dir, **kwargs)
+    def close(self) -> None:
+        '''Close the underlying mmap or file.'''
+        self.__file.close()
+
+    # Reading.
+    def __read_at(self, offset: int, size: int) -> bytes:
+        '''Read size bytes at offset straight from the file.'''
+        if isinstance(self.__file, mmap.mmap):
+            return self.__file[offset:offset+size]
+        self.__file.seek(offset)
+        return self.__file.read(size)
+    def __load(self, offset: int, anchor: int) -> bool:
+        '''Load the chunk at offset into the window, keeping the lookback before anchor. False on EOF.'''
+        data = self.__read_at(offset, self.__chunk)
+        if not data:
+            return False
+        end = self.__base + len(self.__window)
+        if offset != end: # Not contiguous, start a new window.
+            self.__window, self.__base = data, offset
+            return True
+        keep = max(self.__base, min(anchor, offset) - self.__lookback)
+        self.__window = self.__window[keep-self.__base:] + data
+        self.__base   = keep
+        return True
+    def __byte(self, index: int) -> bytes:
+        '''Return the byte at index, loading chunks as needed.'''
+        if index < 0:
+            exit(1) # ERROR: Index is beyond the left edge of the file.
+        while index >= self.__base + len(self.__window):
+            if not self.__load(self.__base + len(self.__window), self.__ind):
+                exit(1) # ERROR: Index is beyond the right edge of the file.
+        if index < self.__base:
+            return self.__read_at(index, 1)
+        return self.__window[index-self.__base:index-self.__base+1]
+    def read(self, start: int, end: int) -> str:
+        '''Return the decoded text between two byte offsets, served from the window when possible.'''
+        if self.__base <= start and end <= self.__base + len(self.__window):
+            data = self.__window[start-self.__base:end-self.__base]
+        else:
+            data = self.__read_at(start, end - start)
+        return data.decode("utf-8", "surrogateescape")
+    def chunks(self) -> Iterator[tuple[int, bytes]]:
+        '''Yield (offset, bytes) chunks from the start of the file, the window follows along.'''
+        offset = 0
+        while True:
+            if not self.__load(offset, offset):
+                return
+            yield offset, self.__window[offset-self.__base:]
+            offset = self.__base + len(self.__window)
+
+    # Same interface as LexerHeader.
+    def __call__(self) -> str:
+        '''Return the current char.'''
+        return self.__byte(self.__ind).decode("utf-8", "surrogateescape")
+    def right(self) -> None:
+        '''Increase the pointer to the right by 1.'''
+        self.__byte(self.__ind + 1) # Fails on the right edge.
+        self.__ind += 1
+    def left(self) -> None:
+        '''Decrease the pointer to the left by 1.'''
+        if self.__ind == 0:
+            exit(1) # ERROR: Pointer is beyond the left edge of the file.
+        else:
+            self.__ind -= 1
+    def slice(self, index: int, left: int = 0, right: int = 0) -> str:
+        '''
+            Same as LexerHeader.slice, with byte offsets.
+
+            parameter:
+                - index int : The byte offset in the file.
+                - left  int : Take bytes to the left. Default is 0.
+                - right int : Take bytes to the right. Default is 0.
+            return:
+                - str : Return the decoded slice of the file.
+        '''
+        if index - left < 0: # If the target is beyond the left edge.
+            exit(1) # ERROR: Start slice is beyond the start of the file.
+        self.__byte(index + right) # If the target is beyond the right edge, this fails.
+        return self.read(index - left, index + right + 1)
+    def peek(self, shift: int) -> str:
+        '''Allows you to get a character relative to your current index'''
+        return self.__byte(self.__ind + shift).decode("utf-8", "surrogateescape")
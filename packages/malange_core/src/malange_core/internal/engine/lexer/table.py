@@ -0,0 +1,210 @@
+'''
+    malange_core.internal.engine.lexer.table
+
+    The compiled form of a LexerProcessor, built once per subclass.
+    - State  : The active mode plus the stack of pending closers.
+    - Table  : Per-mode regex and dispatch map, matching any opener in one step.
+
+    Every token is the concatenation of its units, e.g. COMMENT_OPEN is
+    LT BANG DASH DASH, which is "<!--". For each mode the table holds one
+    regex made of all the literals active in that mode (longest first), so
+    the scanner jumps straight from one literal to the next and everything
+    in between is emitted as a single run of plain text. The same table
+    is also compiled for bytes, so streamed files are scanned without
+    being decoded first.
+'''
+
+import re
+from enum import Enum
+from typing import Callable, Iterable, Iterator, Optional
+
+class LexerState:
+    '''The mode the scanner is in, plus the stack of (return mode, closers) pairs.'''
+    def __init__(self, mode: Enum, stack: Optional[list[tuple[Enum, frozenset]]] = None):
+        self.mode  : Enum                           = mode
+        self.stack : list[tuple[Enum, frozenset]]   = stack if stack is not None else []
+    def key(self) -> tuple:
+        '''Return a hashable snapshot of the state.'''
+        return (self.mode, tuple(self.stack))
+
+def context_push(*closers: str, after: Optional[Enum] = None) -> Callable:
+    '''
+        Build a context that remembers where to go once one of the closers is found.
+
+        parameter:
+            closers str  : Token names that end what the token opened.
+            after   Enum : Mode to enter on close, defaults to the mode the token was found in.
+        return:
+            Callable : The context, to be put as the third item of a CONTEXT entry.
+    '''
+    names = frozenset(closers)
+    def push(state: LexerState, token: Enum) -> None:
+        state.stack.append((state.mode if after is None else after, names))
+    return push
+
+def context_pop(state: LexerState, token: Enum) -> Optional[Enum]:
+    '''Return to the mode saved by the matching context_push, or stay if the token does not close it.'''
+    if state.stack and token.name in state.stack[-1][1]:
+        return state.stack.pop()[0]
+    return None
+
+class LexerTable:
+    '''Transition table compiled from the UNITS, TOKENS, and CONTEXT of a LexerProcessor.'''
+    def __init__(self, tokens: type[Enum], context: dict, escapes: dict[Enum, tuple]):
+        '''
+            Compile the table.
+
+            parameter:
+                tokens  type[Enum]           : The TOKENS enum, each value is a tuple of units.
+                context dict[Enum, tuple]    : token -> (entry modes, exit mode, context).
+                escapes dict[Enum, tuple]    : escape token -> entry modes, the next char is kept verbatim.
+        '''
+        self.TOKENS   : type[Enum]                      = tokens
+        self.literal  : dict[Enum, str]                 = {}
+        self.patterns : dict[Enum, re.Pattern]          = {}
+        self.actions  : dict[Enum, dict[str, tuple]]    = {}
+        self.escapes  : dict[Enum, Optional[Enum]]      = {}
+        self.bpatterns: dict[Enum, re.Pattern]          = {} # Same as patterns, for bytes.
+        self.bactions : dict[Enum, dict[bytes, tuple]]  = {} # Same as actions, for bytes.
+        self.margin   : int                             = 1  # Longest match, in bytes.
+
+        active: dict[Enum, dict[str, tuple]] = {}
+        for token in tokens:
+            literal = "".join(unit.value() for unit in token.value())
+            if literal == "":
+                exit(1) # ERROR: A token must be made of at least one non-empty unit.
+            self.literal[token] = literal
+            if token in escapes: # Escapes are matched as the literal plus any char.
+                for entry in escapes[token]:
+                    if entry in self.escapes:
+                        exit(1) # ERROR: Only one escape token is allowed per mode.
+                    self.escapes[entry] = token
+                    active.setdefault(entry, {})
+                continue
+            entries, exit_mode, func = context[token]
+            for entry in entries:
+                modes = active.setdefault(entry, {})
+                if literal in modes:
+                    exit(1) # ERROR: Two tokens share the same literal in the same mode.
+                modes[literal] = (token, exit_mode, func)
+
+        for mode, literals in active.items():
+            alternatives = [re.escape(lit) for lit in sorted(literals, key=len, reverse=True)]
+            if mode in self.escapes:
+                alternatives.append(re.escape(self.literal[self.escapes[mode]]) + ".")
+            # No capture groups, so the re engine keeps its literal-prefix fast path.
+            self.patterns[mode] = re.compile("|".join(alternatives), re.DOTALL)
+            self.actions[mode]  = literals
+            # For bytes, an escape takes one whole UTF-8 sequence.
+            balternatives = [re.escape(lit.encode()) for lit in sorted(literals, key=len, reverse=True)]
+            if mode in self.escapes:
+                balternatives.append(re.escape(self.literal[self.escapes[mode]].encode())
+                                     + rb"(?:[\x00-\x7f]|[\xc0-\xff][\x80-\xbf]{0,3})")
+            self.bpatterns[mode] = re.compile(b"|".join(balternatives))
+            self.bactions[mode]  = {lit.encode(): action for lit, action in literals.items()}
+        self.margin = max([len(lit.encode()) for lit in self.literal.values()] +
+                          [len(self.literal[token].encode()) + 4 for token in escapes])
+
+    def scan(self, text: str, state: LexerState, start: int = 0,
+             end: Optional[int] = None) -> Iterator[tuple[Optional[Enum], int, int, Enum]]:
+        '''
+            Scan text[start:end], updating state in place.
+
+            parameter:
+                text  str        : The source.
+                state LexerState : Where to start from, it is left at where the scan ended.
+                start int        : Index to start at.
+                end   int        : Index to stop at, default is the end of the text.
+            return:
+                Iterator : (token, start, end, mode), token is None for plain text.
+        '''
+        if end is None:
+            end = len(text)
+        patterns = self.patterns
+        actions  = self.actions
+        escapes  = self.escapes
+        mode     = state.mode
+        pos      = start
+        while pos < end:
+            pattern = patterns.get(mode)
+            match   = pattern.search(text, pos, end) if pattern is not None else None
+            if match is None:
+                yield (None, pos, end, mode)
+                pos = end
+                break
+            at, after = match.span()
+            if at > pos:
+                yield (None, pos, at, mode)
+            action = actions[mode].get(match.group())
+            if action is None: # Escape, the literal plus one verbatim char.
+                yield (escapes[mode], at, after, mode)
+                pos = after
+                continue
+            token, exit_mode, func = action
+            yield (token, at, after, mode)
+            if func is not None:
+                state.mode = mode
+                override   = func(state, token)
+                mode       = exit_mode if override is None else override
+            else:
+                mode = exit_mode
+            pos = after
+        state.mode = mode
+
+    def scan_chunks(self, chunks: Iterable[tuple[int, bytes]], state: LexerState
+                    ) -> Iterator[tuple[Optional[Enum], int, int, Enum]]:
+        '''
+            Scan a file given as contiguous byte chunks, updating state in place.
+            Plain text is not split at chunk boundaries, and a match is only taken
+            once enough bytes follow it to rule out a longer one.
+
+            parameter:
+                chunks Iterable   : (offset, bytes) in order, starting at offset 0.
+                state  LexerState : Where to start from, it is left at where the scan ended.
+            return:
+                Iterator : (token, start, end, mode) with byte offsets, token is None for plain text.
+        '''
+        patterns = self.bpatterns
+        actions  = self.bactions
+        escapes  = self.escapes
+        margin   = self.margin
+        mode     = state.mode
+        buf      = b"" # Bytes not consumed yet.
+        base     = 0   # Offset of buf[0] in the file.
+        pos      = 0   # Search position in buf.
+        last     = 0   # Offset where the current run of plain text started.
+        chunks   = iter(chunks)
+        pending  = next(chunks, None)
+        while pending is not None:
+            following = next(chunks, None)
+            buf       = buf[pos:] + pending[1] # Plain text is kept as offsets only.
+            base     += pos
+            pos       = 0
+            limit     = len(buf) if following is None else len(buf) - margin + 1
+            while pos < limit:
+                pattern = patterns.get(mode)
+                match   = pattern.search(buf, pos) if pattern is not None else None
+                if match is None or match.start() >= limit:
+                    pos = max(pos, limit)
+                    break
+                at, after = match.span()
+                if base + at > last:
+                    yield (None, last, base + at, mode)
+                action = actions[mode].get(match.group())
+                if action is None: # Escape, the literal plus one verbatim char.
+                    yield (escapes[mode], base + at, base + after, mode)
+                else:
+                    token, exit_mode, func = action
+                    yield (token, base + at, base + after, mode)
+                    if func is not None:
+                        state.mode = mode
+                        override   = func(state, token)
+                        mode       = exit_mode if override is None else override
+                    else:
+                        mode = exit_mode
+                pos  = after
+                last = base + after
+            pending = following
+        if base + len(buf) > last:
+            yield (None, last, base + len(buf), mode)
+        state.mode = mode
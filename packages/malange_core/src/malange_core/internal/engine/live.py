@@ -0,0 +1,149 @@
+'''
+    malange_core.internal.engine.live
+
+    A page rendered live stays open after its first output, and is patched
+    as the reactive values it read change (see reactive). A template is
+    compiled for it with live=True (see compiler.RenderBuilder), which
+    makes a region of every ${ ... } in text and every [if/], [for/] and
+    [switch/] block: its own MalangeEffect, rendering only that part of
+    the page. The condition of an [if/] is a MalangeComputed of its truth,
+    so its region reruns when the branch taken changes, not whenever what
+    the condition reads does. The output of a region is between markers, so a gateway can
+    find it in the document:
+        <!--malange:N-->...<!--/malange:N-->
+
+    The page gives its listeners one operation per change:
+    - ("region", number, output) : The region was rendered again, 0 is the whole page.
+    - ("list",   block, operations) : A keyed list was patched, see reconcile.
+    - ("action", number, value) : An @{ ... } has a new value, its element
+      has the attribute data-malange-action="N".
+
+    A region reruns with what it read, and before it does it disposes the
+    regions, conditions, keyed lists and actions its last run made. What is rendered
+    many times or kept (inside a [for/] or a [cache/] block) is not a region,
+    it belongs to the region around it; so is an injection inside a tag.
+'''
+
+from typing import Any, Callable, Iterable, Optional
+
+from malange_core.internal.engine.reactive import OBSERVER, MalangeComputed, MalangeEffect, MalangeNode
+from malange_core.internal.engine.reconcile import MalangeKeyedList
+
+class MalangeRegion:
+    '''A part of a live page, rendered again by its own effect when what it read changes.'''
+    def __init__(self, page: "MalangeLivePage", number: int, render: Callable[[], Iterable[bytes]]):
+        '''
+            Render the region now, and watch what it read.
+
+            parameter:
+                page   MalangeLivePage : The page it belongs to.
+                number int             : Its number in the template, 0 for the whole page.
+                render Callable        : Yields its output.
+        '''
+        self.page     : "MalangeLivePage" = page
+        self.number   : int               = number
+        self.render   : Callable          = render
+        self.children : list              = [] # What its last run made, disposed before the next.
+        self.effect   : MalangeEffect     = MalangeEffect(self.__run, self.__patch)
+        self.output   : bytes             = self.effect.current
+    def __run(self) -> bytes:
+        '''Render the region (in the effect), what is made meanwhile belongs to it.'''
+        self.release()
+        parent, self.page.parent = self.page.parent, self
+        try:
+            return b"".join(self.render())
+        finally:
+            self.page.parent = parent
+    def __patch(self, output: bytes) -> None:
+        self.output = output
+        self.page.emit(("region", self.number, output))
+    def release(self) -> None:
+        '''Dispose of what the last run made.'''
+        for child in self.children:
+            child.dispose()
+        if self.children:
+            self.page.forget()
+        self.children = []
+    def dispose(self) -> None:
+        self.release()
+        self.effect.dispose()
+
+class MalangeLivePage:
+    '''The regions, keyed lists and actions of a live page, see render.live().'''
+    def __init__(self):
+        self.regions   : dict[int, MalangeRegion]          = {}
+        self.lists     : dict[int, list[MalangeKeyedList]] = {} # By block, the ones rendered now.
+        self.actions   : dict[int, MalangeEffect]          = {}
+        self.listeners : list[Callable[[tuple], None]]     = []
+        self.parent    : Optional[MalangeRegion]           = None # The region rendering, see MalangeRegion.
+        self.root      : Optional[MalangeRegion]           = None
+    @property
+    def output(self) -> bytes:
+        '''The whole page as it is now.'''
+        return self.root.output
+    def start(self, render: Callable[[], Iterable[bytes]]) -> "MalangeLivePage":
+        '''Render the page as region 0.'''
+        self.root = self.regions[0] = MalangeRegion(self, 0, render)
+        return self
+    def subscribe(self, listener: Callable[[tuple], None]) -> None:
+        '''Call listener with every operation, in the order they happen.'''
+        self.listeners.append(listener)
+    def emit(self, operation: tuple) -> None:
+        for listener in self.listeners:
+            listener(operation)
+    def keep(self, child: Any, node: Optional[MalangeNode] = None) -> None:
+        '''
+            Give child to the region rendering, it is disposed when that region reruns;
+            node, the one of child, then runs after that region in a flush.
+        '''
+        if self.parent is not None:
+            self.parent.children.append(child)
+            if node is not None: # The effect of the region, running now.
+                node.owner = OBSERVER.get()
+    def adopt(self, block: int, view: MalangeKeyedList) -> MalangeKeyedList:
+        '''Keep a keyed list of the page, its patches become ("list", block, operations).'''
+        view.subscribe(lambda operations: self.emit(("list", block, operations)))
+        self.keep(view, view.effect)
+        self.lists.setdefault(block, []).append(view)
+        return view
+    def forget(self) -> None:
+        '''Drop what was disposed.'''
+        self.regions = {number: region for number, region in self.regions.items() if not region.effect.disposed}
+        self.actions = {number: action for number, action in self.actions.items() if not action.disposed}
+        lists = {}
+        for block, views in self.lists.items():
+            views = [view for view in views if not view.effect.disposed]
+            if views:
+                lists[block] = views
+        self.lists = lists
+    def dispose(self) -> None:
+        '''Stop patching the page, e.g. when its connection closes.'''
+        if self.root is not None:
+            self.root.dispose()
+        self.listeners.clear()
+
+def region(page: Optional[MalangeLivePage], number: int, render: Callable[[], Iterable[bytes]]) -> Iterable[bytes]:
+    '''Render a region of a live page between its markers, or as it is if the render is not live.'''
+    if page is None:
+        return render()
+    made = MalangeRegion(page, number, render)
+    page.keep(made, made.effect)
+    page.regions[number] = made
+    return (b"<!--malange:%d-->" % number, made.output, b"<!--/malange:%d-->" % number)
+
+def action(page: Optional[MalangeLivePage], number: int, function: Callable[[], Any], marker: bytes) -> bytes:
+    '''Watch the value of an @{ ... } of a live page, marker is the attribute naming it.'''
+    if page is None:
+        return b""
+    made = MalangeEffect(function, lambda value: page.emit(("action", number, value)))
+    page.keep(made, made)
+    page.actions[number] = made
+    return marker
+
+def truth(page: Optional[MalangeLivePage], function: Callable[[], Any]) -> bool:
+    '''Return the truth of an [if/] condition, read through a computed value on a live page.'''
+    if page is None:
+        return bool(function())
+    made = MalangeComputed(lambda: bool(function()))
+    page.keep(made) # Read by the region, so it runs before it.
+    return made.value
@@ -0,0 +1,154 @@
+'''
+    malange_core.internal.engine.markup
+
+    Escaping the values of ${ ... } injections, in one of three contexts
+    chosen by the compiler from where the injection is:
+    - text      : Between tags, & < and > are escaped.
+    - attribute : In a quoted attribute value, the quotes " and ' are escaped as well.
+    - unquoted  : Elsewhere inside a tag, e.g. <a href=${x}>, whitespace, = and ` too,
+                  so the value can not end the attribute and start another one.
+
+    The work depends on the type of the value: a str is escaped by a chain
+    of str.replace (each returns the str itself when there is nothing to
+    replace), ints, floats and bools are written as they are, and a Markup
+    (or anything with __html__) is HTML already and never escaped again.
+    Bytes are decoded as UTF-8 and escaped like a str: only Markup skips
+    escaping. The rendered chunks of the template never go through here.
+
+    The rows of a [for] are escaped in batches (see strings()): the plain
+    strings of a column are joined, escaped in one pass and split again.
+
+    Injections in <script> and <style> are escaped as text, use Markup for
+    code, e.g. Markup(json.dumps(data)) once checked.
+'''
+
+import inspect
+
+from typing import Any, Callable, Iterable, Sequence
+
+NUMBERS   = frozenset((int, float, bool)) # Written as str() gives them, nothing to escape.
+SEPARATOR = "\x00" # Joins the strings escaped in one pass, a value holding it is escaped alone.
+
+def escape_text(value: str) -> str:
+    return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def escape_attribute(value: str) -> str:
+    return (value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+                 .replace('"', "&#34;").replace("'", "&#39;"))
+
+UNQUOTED = str.maketrans({" ": "&#32;", "\t": "&#9;", "\n": "&#10;", "\r": "&#13;", "\f": "&#12;",
+                          "=": "&#61;", "`": "&#96;"}) # What ends an unquoted attribute value, or starts another.
+
+def escape_unquoted(value: str) -> str:
+    return escape_attribute(value).translate(UNQUOTED)
+
+class Markup(str):
+    '''A str of HTML, output by an injection as it is. What is combined with it is escaped.'''
+    __slots__ = ()
+    def __html__(self) -> 'Markup':
+        return self
+    def __add__(self, other: Any) -> 'Markup':
+        if isinstance(other, str):
+            return Markup(str.__add__(self, escape(other)))
+        return NotImplemented
+    def __radd__(self, other: Any) -> 'Markup':
+        if isinstance(other, str):
+            return Markup(str.__add__(escape(other), self))
+        return NotImplemented
+    def __mod__(self, arguments: Any) -> 'Markup':
+        if isinstance(arguments, tuple):
+            arguments = tuple(map(escape, arguments))
+        elif isinstance(arguments, dict):
+            arguments = {key: escape(value) for key, value in arguments.items()}
+        else:
+            arguments = escape(arguments)
+        return Markup(str.__mod__(self, arguments))
+    def format(self, *arguments: Any, **keywords: Any) -> 'Markup':
+        return Markup(str.format(self, *map(escape, arguments),
+                                 **{key: escape(value) for key, value in keywords.items()}))
+    def join(self, iterable: Iterable[Any]) -> 'Markup':
+        return Markup(str.join(self, map(escape, iterable)))
+    def __repr__(self) -> str:
+        return f"Markup({str.__repr__(self)})"
+
+def escape(value: Any) -> Markup:
+    '''Return value as Markup, escaped for either context unless it is HTML already.'''
+    if hasattr(value, "__html__"):
+        return Markup(value.__html__())
+    return Markup(escape_attribute(str(value)))
+
+def string(value: Any, escaper: Callable[[str], str]) -> str:
+    '''Return an injected value as escaped str, for the types that are not checked first.'''
+    if hasattr(value, "__html__"):
+        return value.__html__()
+    if isinstance(value, bytes):
+        return escaper(value.decode("utf-8"))
+    if inspect.isawaitable(value):
+        raise TypeError("An injection returned an awaitable, the template has to be rendered async.")
+    if callable(value): # E.g. ${lambda: ...}, or a reactive value.
+        value = value()
+        kind  = type(value)
+        if kind is str:
+            return escaper(value)
+        if kind in NUMBERS:
+            return str(value)
+        return "" if value is None else string(value, escaper)
+    return escaper(str(value))
+
+def text(value: Any) -> bytes:
+    '''Turn the value of an injection between tags into bytes, None renders nothing.'''
+    kind = type(value)
+    if kind is str:
+        return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").encode("utf-8")
+    if kind in NUMBERS:
+        return str(value).encode("ascii")
+    if value is None:
+        return b""
+    return string(value, escape_text).encode("utf-8")
+
+def attribute(value: Any) -> bytes:
+    '''Turn the value of an injection in a quoted attribute value into bytes, see text().'''
+    kind = type(value)
+    if kind is str:
+        return escape_attribute(value).encode("utf-8")
+    if kind in NUMBERS:
+        return str(value).encode("ascii")
+    if value is None:
+        return b""
+    return string(value, escape_attribute).encode("utf-8")
+
+def unquoted(value: Any) -> bytes:
+    '''Turn the value of an injection elsewhere inside a tag into bytes, see text().'''
+    kind = type(value)
+    if kind is str:
+        return escape_unquoted(value).encode("utf-8")
+    if kind in NUMBERS:
+        return str(value).encode("ascii")
+    if value is None:
+        return b""
+    return string(value, escape_unquoted).encode("utf-8")
+
+def strings(values: Sequence[Any], quote: bool) -> list[str]:
+    '''Return the values of one injection over a batch of rows as escaped str, quote for an attribute.'''
+    escaper = escape_attribute if quote else escape_text
+    output  = []
+    plain, where = [], [] # The str values, escaped together, and their index.
+    for value in values:
+        kind = type(value)
+        if kind is str:
+            where.append(len(output))
+            plain.append(value)
+            output.append(value)
+        elif kind in NUMBERS:
+            output.append(str(value))
+        elif value is None:
+            output.append("")
+        else:
+            output.append(string(value, escaper))
+    if plain:
+        escaped = escaper(SEPARATOR.join(plain)).split(SEPARATOR)
+        if len(escaped) != len(plain):
+            escaped = [escaper(value) for value in plain]
+        for index, value in zip(where, escaped):
+            output[index] = value
+    return output
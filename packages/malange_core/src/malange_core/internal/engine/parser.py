@@ -0,0 +1,284 @@
+'''
+    malange_core.internal.engine.parser
+
+    The syntax tree of a template, built from its lexemes in one pass.
+
+    Nodes are stored as parallel arrays instead of one object per node,
+    in source order, which is also the preorder of the tree. A node keeps
+    the size of its subtree, so its first child is the next node and its
+    next sibling is size nodes further: no child or sibling lists, and no
+    recursion to walk it, however deep the blocks are nested.
+    - kinds    array('B') : Kind of the node, see the constants below.
+    - name_ids array('H') : Index of its name in names, 0 for none.
+    - starts   array('I') : Start offset.
+    - ends     array('I') : End offset (exclusive).
+    - heads    array('i') : Start of its inside, -1 for none.
+    - tails    array('i') : End of its inside, -1 for none.
+    - parents  array('i') : Index of the parent, -1 for the root.
+    - sizes    array('I') : Nodes in the subtree, itself included.
+
+    What inside means by kind:
+    - INJECTION, ACTION : ${ ... } and @{ ... }, the code between the braces.
+    - BLOCK     : [name .../] up to its [/name], the content between both tags.
+                  The arguments are in the opening tag, from start + 1 to head - 2.
+    - BRANCH    : [/elif .../], [/else/] and [/case .../] in a block, the content up to
+                  the next branch or the closing tag. The tag itself ends at head.
+    - SOURCE    : [/script src=.../], its name and arguments.
+    - TAG       : Any other [ ... ] tag, e.g. a closing tag that closes nothing, its name
+                  and arguments. The compiler reports these.
+    - SCRIPT    : [script/] ... [/script], the code.
+    - ELEMENT   : <style ...> ... </style> or <script ...> ... </script>, the content
+                  between the tags; tail is -1 if the element is never closed, or if
+                  an injection or a tag is inside it (what it holds is only known when
+                  rendering). Its children are its ATTRIBUTEs, unless tail is -1.
+    - ATTRIBUTE : The value of an attribute of an ELEMENT, head is -1 without one.
+    - ESCAPE    : \\x, the escaped character.
+    Static text is not stored, it is what lies between the nodes.
+
+    Names (block keywords, tag and attribute names) are interned, so every
+    tree in the process shares the same str objects, and the names table
+    of a tree only holds the ones it uses.
+'''
+
+import re
+import sys
+
+from array import array
+from typing import Iterator, Optional
+
+from malange_core.internal.engine.lexer.buffer import LexerBuffer
+from malange_core.internal.engine.lexer.mode import DefaultModes
+
+(ROOT, INJECTION, ACTION, BLOCK, BRANCH, SOURCE, TAG, SCRIPT,
+ ELEMENT, ATTRIBUTE, ESCAPE) = range(11)
+KINDS = ("ROOT", "INJECTION", "ACTION", "BLOCK", "BRANCH", "SOURCE", "TAG", "SCRIPT",
+         "ELEMENT", "ATTRIBUTE", "ESCAPE")
+
+BRANCHES = frozenset(("elif", "else", "case")) # Middle tags that split a block.
+# An attribute of an HTML tag, with a double quoted, single quoted, bare or no value.
+ATTRIBUTE_PATTERN = re.compile(r'''([^\s=/>"']+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>"']+)))?''')
+
+class MalangeNode:
+    '''A node of a MalangeTree, read from the arrays on access.'''
+    __slots__ = ("tree", "index")
+    def __init__(self, tree: "MalangeTree", index: int):
+        self.tree  : MalangeTree = tree
+        self.index : int         = index
+    @property
+    def kind(self) -> int:
+        return self.tree.kinds[self.index]
+    @property
+    def name(self) -> str:
+        return self.tree.names[self.tree.name_ids[self.index]]
+    @property
+    def start(self) -> int:
+        return self.tree.starts[self.index]
+    @property
+    def end(self) -> int:
+        return self.tree.ends[self.index]
+    @property
+    def head(self) -> int:
+        return self.tree.heads[self.index]
+    @property
+    def tail(self) -> int:
+        return self.tree.tails[self.index]
+    @property
+    def parent(self) -> Optional["MalangeNode"]:
+        parent = self.tree.parents[self.index]
+        return None if parent < 0 else MalangeNode(self.tree, parent)
+    @property
+    def children(self) -> list["MalangeNode"]:
+        return [MalangeNode(self.tree, child) for child in self.tree.children(self.index)]
+    def __repr__(self) -> str:
+        name = self.name
+        return (f"MalangeNode({KINDS[self.kind]}{' ' + name if name else ''}, "
+                f"{self.start}, {self.end})")
+
+class MalangeTree:
+    '''Struct of arrays holding the syntax tree of one template, the root is node 0.'''
+    def __init__(self):
+        self.kinds    : array           = array("B")
+        self.name_ids : array           = array("H")
+        self.starts   : array           = array("I")
+        self.ends     : array           = array("I")
+        self.heads    : array           = array("i")
+        self.tails    : array           = array("i")
+        self.parents  : array           = array("i")
+        self.sizes    : array           = array("I")
+        self.names    : list[str]       = [""] # Interned, 0 is no name.
+        self.__ids    : dict[str, int]  = {"": 0}
+    def add(self, kind: int, parent: int, start: int, end: int, head: int = -1, tail: int = -1,
+            name: str = "") -> int:
+        '''Append a node, its subtree holds only itself until it is closed. Return its index.'''
+        index = len(self.kinds)
+        ident = self.__ids.get(name)
+        if ident is None:
+            ident = self.__ids[name] = len(self.names)
+            self.names.append(sys.intern(name))
+        self.kinds.append(kind)
+        self.name_ids.append(ident)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.heads.append(head)
+        self.tails.append(tail)
+        self.parents.append(parent)
+        self.sizes.append(1)
+        return index
+    def close(self, index: int) -> None:
+        '''End the subtree of a node at the last node appended.'''
+        self.sizes[index] = len(self.kinds) - index
+    def __len__(self) -> int:
+        return len(self.kinds)
+    def __getitem__(self, index: int) -> MalangeNode:
+        if index < 0:
+            index += len(self.kinds)
+        if not 0 <= index < len(self.kinds):
+            raise IndexError("MalangeTree index out of range")
+        return MalangeNode(self, index)
+    def name(self, index: int) -> str:
+        return self.names[self.name_ids[index]]
+    def children(self, index: int) -> Iterator[int]:
+        '''Yield the index of every child of a node, in order.'''
+        child, stop = index + 1, index + self.sizes[index]
+        while child < stop:
+            yield child
+            child += self.sizes[child]
+    def events(self, root: int = 0) -> Iterator[tuple[int, bool]]:
+        '''Yield (index, True) entering every node of a subtree in order, and (index, False) leaving it.'''
+        sizes  = self.sizes
+        stack  = [] # (index, end of its subtree) of the nodes entered and not left.
+        for index in range(root, root + sizes[root]):
+            while stack and stack[-1][1] <= index:
+                yield stack.pop()[0], False
+            yield index, True
+            stack.append((index, index + sizes[index]))
+        while stack:
+            yield stack.pop()[0], False
+
+    # Storage, used by the __malacache__.
+    def dump(self) -> tuple:
+        '''Return the arrays as bytes, and the names table.'''
+        return (tuple(target.tobytes() for target in (self.kinds, self.name_ids, self.starts, self.ends,
+                                                     self.heads, self.tails, self.parents, self.sizes)),
+                tuple(self.names))
+    def load(self, data: tuple) -> "MalangeTree":
+        '''Fill the arrays from what dump() returned.'''
+        arrays, names = data
+        for target, raw in zip((self.kinds, self.name_ids, self.starts, self.ends,
+                                self.heads, self.tails, self.parents, self.sizes), arrays):
+            del target[:]
+            target.frombytes(raw)
+        self.names = [sys.intern(name) for name in names]
+        self.__ids = {name: ident for ident, name in enumerate(self.names)}
+        return self
+
+def parse(lexemes: LexerBuffer, source: str) -> MalangeTree:
+    '''
+        Build the tree of a template from its lexemes. Nothing is reported here: a block
+        tag that does not fit is kept as a TAG node, for the compiler to say what is wrong.
+
+        parameter:
+            lexemes LexerBuffer : The lexemes of the source.
+            source  str         : The file text.
+        return:
+            MalangeTree : The tree.
+    '''
+    ids = {token.name: index for index, token in enumerate(lexemes.TOKENS) if token is not None}
+    (INJECT_OPEN, ACTION_OPEN, BRACE_OPEN, BRACE_CLOSE, SCRIPT_OPEN, BLOCK_SLASH_CLOSE,
+     SCRIPT_CLOSE, BLOCK_OPEN, BLOCK_SLASH_OPEN, BLOCK_CLOSE, BRACKET_OPEN, ESCAPE_TOKEN,
+     STYLE_OPEN, STYLE_END, JS_OPEN, JS_END, TAG_CLOSE) = (
+        ids[name] for name in ("INJECT_OPEN", "ACTION_OPEN", "BRACE_OPEN",
+        "BRACE_CLOSE", "SCRIPT_OPEN", "BLOCK_SLASH_CLOSE", "SCRIPT_CLOSE", "BLOCK_OPEN",
+        "BLOCK_SLASH_OPEN", "BLOCK_CLOSE", "BRACKET_OPEN", "ESCAPE",
+        "STYLE_OPEN", "STYLE_END", "JS_OPEN", "JS_END", "TAG_CLOSE"))
+    NORMAL_CODE = DefaultModes.NORMAL_CODE.value
+    starts, ends, modes = lexemes.starts, lexemes.ends, lexemes.modes
+    tree    = MalangeTree()
+    stack   = [tree.add(ROOT, -1, 0, len(source))] # Open ROOT, BLOCK and BRANCH nodes.
+    opened  = None  # (kind, start of the code, start of the tag) of what is being read.
+    depth   = 0     # Braces (or brackets) opened inside it.
+    element = None  # [node, end of its name, dynamic] of an open <style> or <script>.
+    def tag(opener: str, closer: str, start: int, end: int, header: int) -> None:
+        '''Place a block tag from start to end, its name and arguments start at header.'''
+        text = source[header:end - len(closer)].split(None, 1)
+        name = text[0] if text else ""
+        top  = stack[-1]
+        if opener == "[" and closer == "/]":
+            stack.append(tree.add(BLOCK, top, start, end, end, -1, name))
+        elif opener == "[/" and closer == "/]" and name in BRANCHES and len(stack) > 1:
+            if tree.kinds[top] == BRANCH: # The previous branch ends where this one starts.
+                tree.ends[top] = tree.tails[top] = start
+                tree.close(stack.pop())
+            stack.append(tree.add(BRANCH, stack[-1], start, end, end, -1, name))
+        elif opener == "[/" and closer == "/]" and name == "script":
+            tree.add(SOURCE, top, start, end, header, end - len(closer), name)
+        elif opener == "[/" and closer == "]" and len(stack) > 1 and tree.name(
+                stack[-2] if tree.kinds[top] == BRANCH else top) == name:
+            if tree.kinds[top] == BRANCH:
+                tree.ends[top] = tree.tails[top] = start
+                tree.close(stack.pop())
+            block = stack.pop()
+            tree.ends[block], tree.tails[block] = end, start
+            tree.close(block)
+        else:
+            tree.add(TAG, top, start, end, header, end - len(closer), name)
+    for index, kind in enumerate(lexemes.kinds):
+        if kind == 0: # Plain text.
+            continue
+        if element is not None and kind in (INJECT_OPEN, ACTION_OPEN, BLOCK_OPEN, BLOCK_SLASH_OPEN,
+                                            SCRIPT_OPEN, ESCAPE_TOKEN):
+            element[2] = True # Something dynamic inside the element, see ELEMENT.
+        if kind == INJECT_OPEN or kind == ACTION_OPEN:
+            opened, depth = ("$" if kind == INJECT_OPEN else "@", ends[index], starts[index]), 0
+        elif kind == BRACE_OPEN or kind == BRACKET_OPEN:
+            depth += 1
+        elif kind == BRACE_CLOSE and opened is not None:
+            if depth:
+                depth -= 1
+            else:
+                tree.add(INJECTION if opened[0] == "$" else ACTION, stack[-1],
+                         opened[2], ends[index], opened[1], starts[index])
+                opened = None
+        elif kind == BLOCK_OPEN or kind == BLOCK_SLASH_OPEN:
+            opened, depth = ("[" if kind == BLOCK_OPEN else "[/", ends[index], starts[index]), 0
+        elif (kind == BLOCK_CLOSE or kind == BLOCK_SLASH_CLOSE) and opened is not None and opened[0][0] == "[":
+            if depth and kind == BLOCK_CLOSE:
+                depth -= 1
+            else:
+                tag(opened[0], "]" if kind == BLOCK_CLOSE else "/]", opened[2], ends[index], opened[1])
+                opened = None
+        elif kind == SCRIPT_OPEN:
+            opened = ("script", None, starts[index])
+        elif kind == BLOCK_SLASH_CLOSE and opened is not None and opened[:2] == ("script", None):
+            opened = ("script", ends[index], opened[2]) # The body starts after [script ... /]
+        elif kind == SCRIPT_CLOSE and opened is not None and opened[0] == "script":
+            tree.add(SCRIPT, stack[-1], opened[2], ends[index],
+                     ends[index] if opened[1] is None else opened[1], starts[index])
+            opened = None
+        elif kind == ESCAPE_TOKEN and modes[index] == NORMAL_CODE: # \x renders as x.
+            tree.add(ESCAPE, stack[-1], starts[index], ends[index], starts[index] + 1, ends[index])
+        elif kind == STYLE_OPEN or kind == JS_OPEN:
+            name    = "style" if kind == STYLE_OPEN else "script"
+            element = [tree.add(ELEMENT, stack[-1], starts[index], ends[index], -1, -1, name), ends[index], False]
+        elif kind == TAG_CLOSE and element is not None and tree.heads[element[0]] == -1:
+            node = element[0]
+            tree.heads[node] = ends[index]
+            if not element[2]:
+                for match in ATTRIBUTE_PATTERN.finditer(source, element[1], starts[index]):
+                    value = next((group for group in (2, 3, 4) if match[group] is not None), None)
+                    tree.add(ATTRIBUTE, node, match.start(), match.end(),
+                             -1 if value is None else match.start(value),
+                             -1 if value is None else match.end(value), match[1].lower())
+                tree.close(node)
+        elif (kind == STYLE_END or kind == JS_END) and element is not None:
+            node = element[0]
+            tree.ends[node] = ends[index]
+            if not element[2] and tree.heads[node] != -1:
+                tree.tails[node] = starts[index]
+            element = None
+    while len(stack) > 1: # Never closed, the compiler reports it.
+        node = stack.pop()
+        tree.ends[node] = len(source)
+        tree.close(node)
+    tree.close(0)
+    return tree
@@ -0,0 +1,296 @@
+'''
+    malange_core.internal.engine.reactive
+
+    The dependency graph behind react(). Every injection, block and
+    binding of a live page is a node that records the reactive
+    values it read while it ran. Setting a value only marks the nodes that
+    read it, and a flush reruns the marked nodes in topological order:
+    - MalangeReact    : A value set by hand, level 0.
+    - MalangeComputed : A value derived from others, rerun only if read or marked.
+    - MalangeEffect   : A leaf, e.g. a region of a live page, its callback gets the new value.
+
+    The level of a node is one more than the highest level it reads, so a
+    node never runs before something it depends on (no glitches), and a
+    node that many changes marked still runs once. Changes made while a
+    batch is open, or in the same tick of a running event loop, are
+    flushed together. A node that raises does not stop the flush: the
+    others still run, and the errors are raised together at its end.
+
+    A page rendered once reads its reactive values once. Rendered live,
+    every injection and block is a region rendered by its own effect, and
+    the changes of a flush reach the gateway as patches of those regions
+    only (see malange_core.internal.engine.live).
+'''
+
+import heapq
+import asyncio
+import threading
+import contextvars
+import contextlib
+
+from typing import Any, Callable, Iterator, Optional
+
+# The node that is running, whatever it reads becomes its source.
+OBSERVER: contextvars.ContextVar = contextvars.ContextVar("malange_observer", default=None)
+
+class MalangeGraph:
+    '''Scheduler of the nodes: dirty queue, batches and flushes.'''
+    LIMIT: int = 100_000 # Node runs in one flush before it is assumed to be a cycle.
+
+    def __init__(self):
+        self.lock      : threading.RLock = threading.RLock()
+        self.__dirty   : list[tuple]     = [] # Heap of (level, order, node).
+        self.__order   : int             = 0  # Ties are run in the order they were marked.
+        self.__depth   : int             = 0  # Open batches.
+        self.__pending : bool            = False # A flush is scheduled on the event loop.
+        self.flushing  : bool            = False
+        self.flushes   : int             = 0
+        self.runs      : int             = 0
+
+    def mark(self, node: "MalangeNode", level: int = 0) -> None:
+        '''Queue a node, its level is raised above the source that marked it.'''
+        if level >= node.level:
+            node.level = level + 1
+        if node.dirty:
+            return
+        node.dirty = True
+        self.__order += 1
+        heapq.heappush(self.__dirty, (node.level, self.__order, node))
+    def changed(self) -> None:
+        '''Called after a value was set, flush now or when the batch or tick ends.'''
+        if self.__depth or self.flushing:
+            return # Picked up by the running flush, or the one closing the batch.
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if not self.__pending: # One flush per tick, however many values are set in it.
+            self.__pending = True
+            loop.call_soon(self.flush)
+
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[None]:
+        '''Defer flushing until the outermost batch exits.'''
+        with self.lock:
+            self.__depth += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.__depth -= 1
+                if not self.__depth:
+                    self.flush()
+    def flush(self) -> int:
+        '''
+            Rerun every marked node in topological order, return how many ran.
+
+            raise:
+                ExceptionGroup : Nodes raised, once every other marked node ran.
+                RuntimeError   : The update did not settle, see LIMIT.
+        '''
+        with self.lock:
+            self.__pending = False
+            if self.flushing or not self.__dirty:
+                return 0
+            self.flushing = True
+            count  = 0
+            errors = []
+            try:
+                while self.__dirty:
+                    level, _, node = heapq.heappop(self.__dirty)
+                    if not node.dirty or node.disposed:
+                        continue
+                    if level < node.level: # Raised since it was queued, wait for its turn.
+                        node.dirty = False
+                        self.mark(node)
+                        continue
+                    owner = node.owner
+                    if owner is not None and level <= owner.level: # It may be disposed when its owner reruns.
+                        node.dirty = False
+                        self.mark(node, owner.level)
+                        continue
+                    count += 1
+                    if count > self.LIMIT:
+                        raise RuntimeError("Reactive update did not settle, a node keeps setting its own source.")
+                    try:
+                        changed = node.update()
+                    except Exception as error: # Its observers keep the value it had.
+                        errors.append(error)
+                        continue
+                    if changed:
+                        for observer in list(node.observers):
+                            self.mark(observer, node.level)
+            finally:
+                for _, _, node in self.__dirty: # Left behind by an error.
+                    node.dirty = False
+                self.__dirty.clear()
+                self.flushing = False
+            self.flushes += 1
+            self.runs    += count
+        if errors:
+            raise ExceptionGroup(f"{len(errors)} reactive node(s) failed in a flush.", errors)
+        return count
+
+GRAPH = MalangeGraph()
+
+class MalangeSource:
+    '''Anything a node can read: keeps the nodes that read it.'''
+    def __init__(self, graph: Optional[MalangeGraph] = None):
+        self.graph     : MalangeGraph             = graph or GRAPH
+        self.observers : dict["MalangeNode", None] = {} # Ordered set.
+        self.level     : int                      = 0
+    def track(self) -> None:
+        '''Record the running node as an observer.'''
+        observer = OBSERVER.get()
+        if observer is not None and observer is not self:
+            self.observers[observer] = None
+            observer.sources[self]   = None
+    def notify(self) -> None:
+        '''Mark every observer, e.g. after mutating the value in place.'''
+        with self.graph.lock:
+            for observer in list(self.observers):
+                self.graph.mark(observer, self.level)
+        self.graph.changed()
+
+class MalangeReact(MalangeSource):
+    '''A reactive value, what react() returns.'''
+    def __init__(self, value: Any, kind: Optional[type] = None, graph: Optional[MalangeGraph] = None):
+        '''
+            parameter:
+                value any  : The initial value.
+                kind  type : If given, every value set must be an instance of it.
+                graph MalangeGraph : The graph it belongs to, the shared one by default.
+            raise:
+                TypeError : The value is not of kind.
+        '''
+        super().__init__(graph)
+        self.kind : Optional[type] = kind
+        self.__value : Any = self.__check(value)
+    def __check(self, value: Any) -> Any:
+        if self.kind is not None and not isinstance(value, self.kind):
+            raise TypeError(f"Reactive value of {self.kind.__name__} was given {type(value).__name__}.")
+        return value
+
+    @property
+    def value(self) -> Any:
+        '''Read the value, the running node now depends on it.'''
+        self.track()
+        return self.__value
+    @value.setter
+    def value(self, value: Any) -> None:
+        self.set(value)
+    def peek(self) -> Any:
+        '''Read the value without depending on it.'''
+        return self.__value
+    def set(self, value: Any) -> None:
+        '''Set the value, nothing is rerun if it is equal to the old one.'''
+        value = self.__check(value)
+        if value is self.__value or value == self.__value:
+            return
+        self.__value = value
+        self.notify()
+    def update(self, function: Callable[[Any], Any]) -> None:
+        '''Set the value to function(old value).'''
+        self.set(function(self.__value))
+    def __call__(self) -> Any:
+        return self.value
+
+    # So the value reads naturally inside ${ ... } and [script/].
+    def __iadd__(self, other: Any) -> "MalangeReact":
+        self.set(self.__value + other)
+        return self
+    def __isub__(self, other: Any) -> "MalangeReact":
+        self.set(self.__value - other)
+        return self
+    def __imul__(self, other: Any) -> "MalangeReact":
+        self.set(self.__value * other)
+        return self
+    def __str__(self) -> str:
+        return str(self.value)
+    def __format__(self, spec: str) -> str:
+        return format(self.value, spec)
+    def __bool__(self) -> bool:
+        return bool(self.value)
+    def __repr__(self) -> str:
+        return f"react({self.__value!r})"
+
+class MalangeNode(MalangeSource):
+    '''Something computed from sources, rerun when one of them changes.'''
+    def __init__(self, function: Callable[[], Any], graph: Optional[MalangeGraph] = None):
+        super().__init__(graph)
+        self.function : Callable[[], Any]         = function
+        self.sources  : dict[MalangeSource, None] = {}
+        self.dirty    : bool                      = False
+        self.disposed : bool                      = False
+        self.current  : Any                       = None
+        self.owner    : Optional[MalangeNode]     = None # Disposes of it when rerun, so it runs after it.
+    def __lt__(self, other: "MalangeNode") -> bool: # Heap ties never get here, order is unique.
+        return id(self) < id(other)
+    def run(self) -> Any:
+        '''Run the function, its sources are what it reads this time.'''
+        for source in self.sources: # Dependencies can change between runs, e.g. in an [if/].
+            source.observers.pop(self, None)
+        self.sources = {}
+        token = OBSERVER.set(self)
+        try:
+            value = self.function()
+        finally:
+            OBSERVER.reset(token)
+        self.level = 1 + max((source.level for source in self.sources), default=0)
+        return value
+    def update(self) -> bool:
+        '''Rerun in a flush, return whether the observers have to be marked.'''
+        self.dirty = False
+        value = self.run()
+        changed = not (value is self.current or value == self.current)
+        self.current = value
+        return changed
+    def dispose(self) -> None:
+        '''Stop rerunning, e.g. when the block holding it is removed.'''
+        for source in self.sources:
+            source.observers.pop(self, None)
+        self.sources, self.observers = {}, {}
+        self.disposed = True
+
+class MalangeComputed(MalangeNode):
+    '''A derived value, computed on first read and kept until a source changes.'''
+    def __init__(self, function: Callable[[], Any], graph: Optional[MalangeGraph] = None):
+        super().__init__(function, graph)
+        self.dirty = True # Nothing computed yet, but not queued either.
+    @property
+    def value(self) -> Any:
+        if self.dirty: # Never computed, or read before the flush got to it.
+            with self.graph.lock:
+                if self.update() and self.graph.flushing:
+                    for observer in list(self.observers):
+                        self.graph.mark(observer, self.level)
+        self.track()
+        return self.current
+    def __call__(self) -> Any:
+        return self.value
+    def __str__(self) -> str:
+        return str(self.value)
+    def __format__(self, spec: str) -> str:
+        return format(self.value, spec)
+
+class MalangeEffect(MalangeNode):
+    '''A leaf of the graph: a region, a binding or the iterable of a keyed list of a live page.'''
+    def __init__(self, function: Callable[[], Any], callback: Optional[Callable[[Any], None]] = None,
+                 graph: Optional[MalangeGraph] = None):
+        '''
+            Run function once now, then again whenever something it read changes.
+
+            parameter:
+                function Callable : Computes the value.
+                callback Callable : Given the new value when it changed, e.g. to patch a keyed list.
+                graph    MalangeGraph : The graph it belongs to, the shared one by default.
+        '''
+        super().__init__(function, graph)
+        self.callback : Optional[Callable[[Any], None]] = callback
+        self.current = self.run()
+    def update(self) -> bool:
+        changed = super().update()
+        if changed and self.callback is not None:
+            self.callback(self.current)
+        return False # Nothing reads an effect.
@@ -0,0 +1,180 @@
+'''
+    malange_core.internal.engine.reconcile
+
+    Keyed [for item in items key=item.id/] blocks. Every item is rendered
+    once and kept by its key; when the iterable changes only the keys are
+    compared, and the difference is a list of operations:
+    - ("remove", key)
+    - ("insert", key, before, output) : output is the rendered item.
+    - ("move",   key, before)
+    - ("update", key, output) : A kept item whose element changed, rendered again.
+    before is the key the item goes in front of, None for the end. An
+    element changed if it is neither the one kept for its key nor equal
+    to it, the way a reactive value changes.
+
+    The items that keep their relative order are the longest increasing
+    subsequence of their old positions, so they are never touched, and a
+    shared prefix and suffix are skipped before that. A few changes in a
+    long list cost a few operations, plus one pass over the keys.
+'''
+
+import bisect
+
+from typing import Any, Callable, Hashable, Iterable, Iterator, Sequence
+
+from malange_core.internal.engine.reactive import MalangeEffect, MalangeSource
+
+MISSING = object() # No element kept for a key.
+
+def increasing(sequence: Sequence[int]) -> set[int]:
+    '''Return the indexes of a longest increasing subsequence, values of -1 are skipped.'''
+    tails   : list[int] = [] # Smallest last value of an increasing run of each length.
+    ends    : list[int] = [] # Index of that value.
+    parents : list[int] = [-1] * len(sequence)
+    for index, value in enumerate(sequence):
+        if value < 0:
+            continue
+        at = bisect.bisect_left(tails, value)
+        if at:
+            parents[index] = ends[at - 1]
+        if at == len(tails):
+            tails.append(value)
+            ends.append(index)
+        else:
+            tails[at] = value
+            ends[at]  = index
+    found, index = set(), ends[-1] if ends else -1
+    while index >= 0:
+        found.add(index)
+        index = parents[index]
+    return found
+
+def reconcile(old: Sequence[Hashable], new: Sequence[Hashable]) -> list[tuple]:
+    '''
+        Return the operations turning the keys in old into the keys in new,
+        without the output of the inserted items (see MalangeKeyedList).
+
+        parameter:
+            old Sequence : The keys before, in order.
+            new Sequence : The keys after, in order.
+        return:
+            list : ("remove", key), ("insert", key, before) and ("move", key, before).
+        raise:
+            ValueError : A key is in new twice.
+    '''
+    start, old_end, new_end = 0, len(old), len(new)
+    while start < old_end and start < new_end and old[start] == new[start]:
+        start += 1
+    while old_end > start and new_end > start and old[old_end - 1] == new[new_end - 1]:
+        old_end -= 1
+        new_end -= 1
+    wanted = {key: index for index, key in enumerate(new[start:new_end], start)}
+    if len(wanted) != new_end - start:
+        raise ValueError("A keyed [for] has the same key twice.")
+    operations = []
+    kept       = {} # Key -> old index, of the keys in both.
+    for index in range(start, old_end):
+        key = old[index]
+        if key in wanted:
+            kept[key] = index
+        else:
+            operations.append(("remove", key))
+    sources = [kept.get(key, -1) for key in new[start:new_end]]
+    stay    = increasing(sources)
+    before  = new[new_end] if new_end < len(new) else None
+    for index in range(new_end - 1, start - 1, -1): # Backwards, so before is already in place.
+        key = new[index]
+        if sources[index - start] < 0:
+            operations.append(("insert", key, before))
+        elif index - start not in stay:
+            operations.append(("move", key, before))
+        before = key
+    return operations
+
+class MalangeKeyedList:
+    '''The rendered items of a keyed [for], patched when what it iterates changes.'''
+    def __init__(self, iterate: Callable[[], Iterable], key: Callable[[Any], Hashable],
+                 item: Callable[[Any], Iterator[bytes]]):
+        '''
+            Render every item, and watch the iterable.
+
+            parameter:
+                iterate Callable : Returns the iterable, reactive values read in it are watched.
+                key     Callable : Returns the key of an element.
+                item    Callable : Yields the output of an element.
+        '''
+        self.key        : Callable              = key
+        self.item       : Callable              = item
+        self.keys       : list[Hashable]        = []
+        self.output     : dict[Hashable, bytes] = {} # Key -> rendered item.
+        self.listeners  : list[Callable]        = [] # Called with the operations of a change.
+        self.__iterate  : Callable              = iterate
+        self.__elements : dict[Hashable, Any]   = {} # Key -> element, kept between changes, see __read().
+        self.effect     : MalangeEffect         = MalangeEffect(self.__read, self.__patch)
+        self.keys   = self.effect.current[0]
+        if len(self.__elements) != len(self.keys):
+            self.effect.dispose()
+            raise ValueError("A keyed [for] has the same key twice.")
+        self.output = {key: b"".join(item(self.__elements[key])) for key in self.keys}
+    def __read(self) -> tuple[list[Hashable], tuple]:
+        '''
+            Read the iterable (in the effect), return its keys and the (key, element) of the
+            kept keys whose element changed. The element of a new key is added to the index
+            in place, a changed one only replaces the kept one in __patch(), which also drops
+            the keys removed.
+        '''
+        elements = self.__iterate()
+        if isinstance(elements, MalangeSource): # E.g. [for row in rows key=row.id/] over react([...]).
+            elements = elements.value
+        keys, updated, index, key = [], [], self.__elements, self.key
+        for element in elements:
+            name = key(element)
+            kept = index.get(name, MISSING)
+            if kept is MISSING:
+                index[name] = element
+            elif not (kept is element or kept == element):
+                updated.append((name, element))
+            keys.append(name)
+        return keys, tuple(updated)
+    def __patch(self, read: tuple[list[Hashable], tuple]) -> None:
+        '''Render what was inserted or changed, and tell the listeners.'''
+        keys, updated = read
+        changes = reconcile(self.keys, keys) # A key twice in what changed raises here.
+        for operation in changes: # Or it is inserted while still kept before or after the change.
+            if operation[0] == "insert" and operation[1] in self.output:
+                for name in keys: # Not rendered, so not kept either.
+                    if name not in self.output:
+                        self.__elements.pop(name, None)
+                raise ValueError("A keyed [for] has the same key twice.")
+        operations = []
+        for operation in changes:
+            if operation[0] == "remove":
+                del self.output[operation[1]]
+                del self.__elements[operation[1]]
+                operations.append(operation)
+            elif operation[0] == "insert":
+                output = self.output[operation[1]] = b"".join(self.item(self.__elements[operation[1]]))
+                operations.append(operation + (output,))
+            else:
+                operations.append(operation)
+        for name, element in updated:
+            self.__elements[name] = element
+            output = b"".join(self.item(element))
+            if output != self.output[name]:
+                self.output[name] = output
+                operations.append(("update", name, output))
+        self.keys = keys
+        if operations:
+            for listener in self.listeners:
+                listener(operations)
+    def __iter__(self) -> Iterator[bytes]:
+        '''Yield the output of the items, in order.'''
+        for key in self.keys:
+            yield self.output[key]
+    def subscribe(self, listener: Callable[[list], None]) -> None:
+        '''Call listener with the operations of every change.'''
+        self.listeners.append(listener)
+    def dispose(self) -> None:
+        '''Stop watching the iterable.'''
+        self.effect.dispose()
+        self.listeners.clear()
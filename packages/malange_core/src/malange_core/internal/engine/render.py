@@ -0,0 +1,374 @@
+'''
+    malange_core.internal.engine.render
+
+    Running a compiled template. Every render gets a fresh namespace: the
+    helpers, the context, then what the [script/] block defines, and the
+    render generator is bound to it. The program of the template is only
+    executed once, to get the code of that generator, and a script that
+    needs nothing from the render runs once too (see script.MalangeScript),
+    so a render executes no code of the template until its first chunk.
+    The generator yields the output as bytes chunks, as soon as each
+    section is ready. Static runs are constants of the code object, so
+    rendering them costs one yield each and no encoding.
+
+    Rendered async (see stream_async) a template may await: coroutine
+    functions and awaitables injected by ${ ... } are started as tasks and
+    gathered together before the chunk holding them is sent, and a [for]
+    can iterate an async generator.
+
+    A [cache/] block goes through the fragment cache of the namespace: a
+    hit yields the stored bytes, a miss streams the block while keeping a
+    copy to store at its end.
+
+    Injections are escaped by type and context, see markup. A [for] the
+    compiler gave a row function renders BATCH_ROWS elements per chunk:
+    their values are escaped column by column and formatted into the
+    static text between them at once.
+
+    A keyed [for/] renders each element through its own function. Rendered
+    live (see live) it becomes a MalangeKeyedList, which keeps the output
+    of every element and patches it by key when what it iterates changes,
+    and a template compiled live renders its regions through their own
+    effects (see malange_core.internal.engine.live).
+'''
+
+import types
+import functools
+import asyncio
+import inspect
+import builtins
+import threading
+
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from malange_core.internal.engine.compiler import (MalangeTemplate, RENDER, RENDER_ASYNC,
+                                                   TEXT, TEXT_ASYNC, ATTR, ATTR_ASYNC, UNQUOTED, UNQUOTED_ASYNC,
+                                                   BATCH, BATCH_ASYNC,
+                                                   AITER, CACHED, CACHED_ASYNC, FRAGMENTS,
+                                                   KEYED, KEYED_ASYNC, LIVE, REGION, BIND, TRUTH)
+from malange_core.internal.engine.fragment import MalangeFragments, MemoryFragments
+from malange_core.internal.engine.live import MalangeLivePage, action, region, truth
+from malange_core.internal.engine.markup import attribute, strings, text, unquoted
+from malange_core.internal.engine.reactive import MalangeSource
+from malange_core.internal.engine.reconcile import MalangeKeyedList
+from malange_core.internal.engine.script import MalangeScript, load_source
+
+FRAGMENTS_DEFAULT: MalangeFragments = MemoryFragments() # Used when no backend is given.
+
+BATCH_ROWS: int = 64 # Elements of a [for] rendered per chunk, see batched().
+
+PREPARE_LOCK: threading.Lock = threading.Lock()
+
+def prepare(template: MalangeTemplate) -> dict[str, Any]:
+    '''
+        Return what every render of the template shares, built on its first render:
+        - base   : The names every namespace starts with.
+        - render : The code of RENDER, None if the template awaits.
+        - async  : The code of RENDER_ASYNC, None if the template was compiled live.
+        - script : The MalangeScript of an inline [script/] block, or None.
+    '''
+    runtime = template.runtime
+    if "base" in runtime:
+        return runtime
+    with PREPARE_LOCK:
+        if "base" in runtime:
+            return runtime
+        codes = {}
+        for program, name in ((template.program, RENDER), (template.program_async, RENDER_ASYNC)):
+            if program is not None: # Only defines the function, with no default nor closure.
+                scratch = {"__builtins__": builtins}
+                exec(program, scratch)
+                codes[name] = scratch[name].__code__
+        runtime["render"] = codes.get(RENDER)
+        runtime["async"]  = codes.get(RENDER_ASYNC)
+        runtime["script"] = MalangeScript(template.script, template.path) \
+                            if isinstance(template.script, types.CodeType) else None
+        runtime["base"]   = {"__name__": "__malange__", "__file__": template.path,
+                             "__builtins__": builtins, TEXT: text, TEXT_ASYNC: text_async,
+                             ATTR: attribute, ATTR_ASYNC: attribute_async, AITER: async_iter,
+                             UNQUOTED: unquoted, UNQUOTED_ASYNC: unquoted_async,
+                             BATCH: batched, BATCH_ASYNC: batched_async,
+                             CACHED: cached, CACHED_ASYNC: cached_async,
+                             KEYED: keyed, KEYED_ASYNC: keyed_async, REGION: region, BIND: action,
+                             TRUTH: truth}
+    return runtime
+
+def namespace(template: MalangeTemplate, context: Optional[dict[str, Any]] = None,
+              asynchronous: bool = False, fragments: Optional[MalangeFragments] = None,
+              page: Optional[MalangeLivePage] = None) -> dict[str, Any]:
+    '''
+        Build a new namespace for a render of the template, RENDER is then defined in it.
+
+        parameter:
+            template     MalangeTemplate  : The compiled template.
+            context      dict             : Names given to the template before its script runs.
+            asynchronous bool             : Define RENDER_ASYNC instead.
+            fragments    MalangeFragments : Backend of the [cache/] blocks, FRAGMENTS_DEFAULT if None.
+            page         MalangeLivePage  : The page of a live render, see live(). The script always
+                                            runs again then, as the page keeps its state.
+        return:
+            dict : The namespace.
+    '''
+    runtime = prepare(template)
+    names   = runtime["base"].copy()
+    names[FRAGMENTS] = FRAGMENTS_DEFAULT if fragments is None else fragments
+    names[LIVE]      = page
+    if context:
+        names.update(context)
+    script = runtime["script"]
+    if isinstance(template.script, str): # [/script src=.../], checked for changes now and then.
+        script = load_source(template.script_file())
+    if script is not None:
+        script.run(names, page is not None)
+    if asynchronous:
+        names[RENDER_ASYNC] = types.FunctionType(runtime["async"], names, RENDER_ASYNC)
+    else:
+        names[RENDER] = types.FunctionType(runtime["render"], names, RENDER)
+    return names
+
+STREAM_CHUNK: int = 4096 # Bytes joined before a chunk of stream() is yielded.
+
+def render(template: MalangeTemplate, context: Optional[dict[str, Any]] = None,
+           fragments: Optional[MalangeFragments] = None) -> Iterator[bytes]:
+    '''Render the template lazily, yield the chunks of the output in order.'''
+    if template.program is None:
+        raise TypeError(f"{template.path} awaits, it has to be rendered async.")
+    return namespace(template, context, False, fragments)[RENDER]()
+
+def cached(fragments: MalangeFragments, key: Any, ttl: Optional[float],
+           block: Callable[[], Iterator[bytes]]) -> Iterator[bytes]:
+    '''Render a [cache/] block, block is the generator of its body.'''
+    hit = fragments.get(key)
+    if hit is not None:
+        yield hit
+        return
+    chunks = []
+    for chunk in block():
+        chunks.append(chunk)
+        yield chunk
+    fragments.set(key, b"".join(chunks), ttl) # Not reached if the page is dropped half way.
+
+def keyed(page: Optional[MalangeLivePage], block: int, iterate: Callable[[], Any],
+          key: Callable[[Any], Any], item: Callable[[Any], Iterator[bytes]]) -> Iterator[bytes]:
+    '''Render a keyed [for/] block, as a MalangeKeyedList kept by the page when rendering live.'''
+    if page is not None:
+        yield from page.adopt(block, MalangeKeyedList(iterate, key, item))
+        return
+    elements = iterate()
+    if isinstance(elements, MalangeSource):
+        elements = elements.value
+    seen = set()
+    for element in elements:
+        name = key(element)
+        if name in seen:
+            raise ValueError("A keyed [for] has the same key twice.")
+        seen.add(name)
+        yield from item(element)
+
+def live(template: MalangeTemplate, context: Optional[dict[str, Any]] = None,
+         fragments: Optional[MalangeFragments] = None) -> MalangeLivePage:
+    '''
+        Render the template for a page that stays open, see malange_core.internal.engine.live.
+        The output is page.output, its patches go to page.subscribe(), call page.dispose()
+        when the page closes. A template not compiled live has one region, the whole page.
+    '''
+    if template.program is None:
+        raise TypeError(f"{template.path} awaits, it has to be rendered async.")
+    page = MalangeLivePage()
+    return page.start(namespace(template, context, False, fragments, page)[RENDER])
+
+def stream(template: MalangeTemplate, context: Optional[dict[str, Any]] = None,
+           size: int = STREAM_CHUNK, fragments: Optional[MalangeFragments] = None) -> Iterator[bytes]:
+    '''
+        Render the template lazily, small chunks are joined until they reach size
+        bytes so a server is not asked to write every injection on its own.
+
+        parameter:
+            template MalangeTemplate : The compiled template.
+            context  dict            : Names given to the template before its script runs.
+            size     int             : Least bytes per chunk, 0 yields every chunk as is.
+            fragments MalangeFragments : Backend of the [cache/] blocks.
+        return:
+            Iterator[bytes] : The output, chunk by chunk.
+    '''
+    chunks = render(template, context, fragments)
+    if size <= 0:
+        yield from chunks
+        return
+    pending, length = [], 0
+    for chunk in chunks:
+        pending.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b"".join(pending)
+            pending, length = [], 0
+    if pending:
+        yield b"".join(pending)
+
+@functools.lru_cache(maxsize=1024)
+def pattern(statics: tuple[bytes, ...]) -> str:
+    '''Return the static runs of a row as one %-format, a %s for each value between them.'''
+    return "%s".join(static.decode("utf-8").replace("%", "%%") for static in statics)
+
+def rows_of(rows: list[tuple], statics: tuple[bytes, ...], quotes: tuple[bool, ...]) -> bytes:
+    '''Render a batch of rows, every column is escaped in one go.'''
+    if not quotes:
+        return statics[0] * len(rows)
+    columns = [strings(column, quote) for column, quote in zip(zip(*rows), quotes)]
+    form    = pattern(statics)
+    return "".join([form % values for values in zip(*columns)]).encode("utf-8")
+
+def batched(elements: Any, row: Callable[[Any], tuple], statics: tuple[bytes, ...],
+            quotes: tuple[bool, ...]) -> Iterator[bytes]:
+    '''
+        Render a [for] the compiler gave a row function, BATCH_ROWS elements per chunk.
+
+        parameter:
+            elements Any      : What the [for] iterates.
+            row      Callable : Returns the values of the injections for an element.
+            statics  tuple    : The static runs around them, one more than the values.
+            quotes   tuple    : For each value, True inside a tag.
+    '''
+    rows = []
+    for element in elements:
+        rows.append(row(element))
+        if len(rows) == BATCH_ROWS:
+            yield rows_of(rows, statics, quotes)
+            rows = []
+    if rows:
+        yield rows_of(rows, statics, quotes)
+
+async def batched_async(elements: Any, row: Callable[[Any], tuple], statics: tuple[bytes, ...],
+                        quotes: tuple[bool, ...]) -> AsyncIterator[Any]:
+    '''See batched(), the values are escaped one by one, awaitables once the renderer awaits them.'''
+    last = statics[-1]
+    async for element in async_iter(elements):
+        for static, value, quote in zip(statics, row(element), quotes):
+            if static:
+                yield static
+            yield attribute_async(value) if quote else text_async(value)
+        if last:
+            yield last
+
+def escaped_async(value: Any, escaper: Callable[[Any], bytes]) -> Any:
+    '''Escape an injection in the async render, an awaitable is escaped once awaited.'''
+    if callable(value) and not inspect.isawaitable(value):
+        value = value()
+    if inspect.isawaitable(value):
+        return awaited(value, escaper)
+    return escaper(value)
+
+async def awaited(value: Any, escaper: Callable[[Any], bytes]) -> bytes:
+    return escaper(await value)
+
+def text_async(value: Any) -> Any:
+    '''Escape an injection between tags in the async render, see escaped_async().'''
+    return escaped_async(value, text)
+
+def attribute_async(value: Any) -> Any:
+    '''Escape an injection inside a tag in the async render, see escaped_async().'''
+    return escaped_async(value, attribute)
+
+def unquoted_async(value: Any) -> Any:
+    '''Escape an injection in a tag, out of quotes, in the async render, see escaped_async().'''
+    return escaped_async(value, unquoted)
+
+async def async_iter(iterable: Any) -> AsyncIterator[Any]:
+    '''Iterate an iterable, an async iterable, or what an awaitable returns, in an async for.'''
+    if inspect.isawaitable(iterable):
+        iterable = await iterable
+    if hasattr(iterable, "__aiter__"):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+def schedule(section: Any, pending: list, tasks: list[int]) -> int:
+    '''
+        Append a section of the async render to pending: a chunk, rendered and escaped
+        already, or an awaitable of one (see escaped_async()), started as a task and its
+        index kept in tasks. Return the bytes added, 0 for a task.
+    '''
+    if type(section) is bytes:
+        pending.append(section)
+        return len(section)
+    tasks.append(len(pending))
+    pending.append(asyncio.ensure_future(section)) # Runs while the page goes on.
+    return 0
+
+async def cached_async(fragments: MalangeFragments, key: Any, ttl: Optional[float],
+                       block: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[bytes]:
+    '''Render a [cache/] block in the async render, its awaits are gathered at its end.'''
+    hit = fragments.get(key)
+    if hit is not None:
+        yield hit
+        return
+    pending, tasks = [], []
+    try:
+        async for section in block():
+            schedule(section, pending, tasks)
+        value = await gather(pending, tasks)
+    finally:
+        for index in tasks:
+            pending[index].cancel()
+    fragments.set(key, value, ttl)
+    yield value
+
+async def keyed_async(page: Optional[MalangeLivePage], block: int, iterate: Callable[[], Any],
+                      key: Callable[[Any], Any], item: Callable[[Any], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+    '''Render a keyed [for/] block in the async render, it is not kept.'''
+    elements = iterate()
+    if isinstance(elements, MalangeSource):
+        elements = elements.value
+    seen = set()
+    async for element in async_iter(elements):
+        name = key(element)
+        if name in seen:
+            raise ValueError("A keyed [for] has the same key twice.")
+        seen.add(name)
+        async for section in item(element):
+            yield section
+
+async def stream_async(template: MalangeTemplate, context: Optional[dict[str, Any]] = None,
+                       size: int = STREAM_CHUNK,
+                       fragments: Optional[MalangeFragments] = None) -> AsyncIterator[bytes]:
+    '''
+        Render the template as an async generator, see stream(). Awaitables injected
+        before a chunk is complete run concurrently, through one asyncio.gather.
+
+        parameter:
+            template MalangeTemplate : The compiled template.
+            context  dict            : Names given to the template before its script runs.
+            size     int             : Least bytes per chunk, 0 sends a chunk per section.
+            fragments MalangeFragments : Backend of the [cache/] blocks.
+        return:
+            AsyncIterator[bytes] : The output, chunk by chunk.
+    '''
+    sections = namespace(template, context, True, fragments)[RENDER_ASYNC]()
+    pending, tasks, length = [], [], 0
+    try:
+        async for section in sections:
+            length += schedule(section, pending, tasks)
+            if length >= size:
+                yield await gather(pending, tasks)
+                pending, tasks, length = [], [], 0
+        if pending:
+            yield await gather(pending, tasks)
+    finally:
+        for index in tasks: # Left behind by an error or a closed connection.
+            pending[index].cancel()
+        await sections.aclose()
+
+async def gather(pending: list, tasks: list[int]) -> bytes:
+    '''Wait for the tasks in pending (at the indexes in tasks) together, then join it.'''
+    if tasks:
+        for index, value in zip(tasks, await asyncio.gather(*(pending[i] for i in tasks))):
+            pending[index] = value # Escaped by the task, see escaped_async().
+        tasks.clear()
+    return b"".join(pending)
+
+def render_bytes(template: MalangeTemplate, context: Optional[dict[str, Any]] = None,
+                 fragments: Optional[MalangeFragments] = None) -> bytes:
+    '''Render the template as one bytes object.'''
+    return b"".join(render(template, context, fragments))
@@ -0,0 +1,116 @@
+'''
+    malange_core.internal.engine.script
+
+    Running the [script/] block of a template, or the file of a
+    [/script src="./source.py"/] tag, without paying for it per render.
+
+    A script is compiled to a code object once. If it reads nothing but
+    what it defines itself and the builtins, what it defines can not
+    depend on the render, so it is executed once and kept as a frozen
+    snapshot: a render copies the snapshot into its namespace instead of
+    executing the script again. A script reading other names (e.g. the
+    request in the context), writing globals from its functions, or using
+    globals()/locals()/eval/exec runs on every render, as before.
+
+    Objects in a snapshot are shared by every render of the template, so a
+    script that runs once should not keep per-request state in them.
+
+    Script files are kept by path, shared by every template using them,
+    and compiled again when the file changes.
+'''
+
+import os
+import dis
+import time
+import types
+import builtins
+import threading
+
+from typing import Any, Mapping, Optional
+
+# Names that let a script reach the namespace without naming what it reads.
+INTROSPECTION = frozenset(("globals", "locals", "vars", "eval", "exec"))
+# Names the namespace has before a script runs.
+PRESET = frozenset(dir(builtins)) | {"__name__", "__file__", "__builtins__"}
+SOURCE_CHECK: float = 1.0 # Seconds between two checks that a script file did not change.
+
+LOADS  = frozenset(("LOAD_NAME", "LOAD_GLOBAL"))
+STORES = frozenset(("STORE_NAME", "DELETE_NAME", "STORE_GLOBAL", "DELETE_GLOBAL"))
+
+def context_free(code: types.CodeType) -> bool:
+    '''Return True if the script only reads names it defines, see the module docstring.'''
+    stored, free, nested = set(), set(), set()
+    for instruction in dis.get_instructions(code): # In order, x = x + 1 reads x from the context.
+        if instruction.opname in LOADS and instruction.argval not in stored:
+            free.add(instruction.argval)
+        elif instruction.opname in STORES:
+            stored.add(instruction.argval)
+    def walk(code: types.CodeType) -> bool:
+        '''Collect the globals read by a function (or class body), False if it writes one.'''
+        for instruction in dis.get_instructions(code):
+            if instruction.opname in LOADS:
+                nested.add(instruction.argval)
+            elif instruction.opname in ("STORE_GLOBAL", "DELETE_GLOBAL"):
+                return False
+        return all(walk(const) for const in code.co_consts if isinstance(const, types.CodeType))
+    if not all(walk(const) for const in code.co_consts if isinstance(const, types.CodeType)):
+        return False
+    return not (free - PRESET) and not (nested - stored - PRESET) and not ((free | nested) & INTROSPECTION)
+
+class MalangeScript:
+    '''A compiled script, and what it defines if it can run once.'''
+    def __init__(self, code: types.CodeType, path: str):
+        '''
+            parameter:
+                code CodeType : The compiled script.
+                path str      : The file it is in, its __file__.
+        '''
+        self.code     : types.CodeType             = code
+        self.path     : str                        = path
+        self.static   : bool                       = context_free(code)
+        self.__names  : Optional[Mapping[str, Any]] = None
+        self.__lock   : threading.Lock             = threading.Lock()
+    def names(self) -> Mapping[str, Any]:
+        '''Return what the script defines, executing it the first time.'''
+        if self.__names is None:
+            with self.__lock:
+                if self.__names is None:
+                    names = {"__name__": "__malange__", "__file__": self.path, "__builtins__": builtins}
+                    exec(self.code, names)
+                    self.__names = types.MappingProxyType({key: value for key, value in names.items()
+                                                           if key not in ("__name__", "__file__", "__builtins__")})
+        return self.__names
+    def run(self, names: dict[str, Any], fresh: bool = False) -> None:
+        '''Define the names of the script in names, executing it there unless it runs once.'''
+        if self.static and not fresh:
+            names.update(self.names())
+        else:
+            exec(self.code, names)
+
+SOURCES      : dict[str, list] = {} # Path -> [(mtime, size), checked at, MalangeScript].
+SOURCES_LOCK : threading.Lock  = threading.Lock()
+
+def load_source(path: str) -> MalangeScript:
+    '''
+        Return the script of a [/script src=.../] file, compiled once per version of the file.
+
+        raise:
+            OSError     : The file can not be read.
+            SyntaxError : The file is not valid Python.
+    '''
+    path  = os.path.abspath(path)
+    now   = time.monotonic()
+    entry = SOURCES.get(path)
+    if entry is not None and now - entry[1] < SOURCE_CHECK:
+        return entry[2]
+    stat  = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with SOURCES_LOCK:
+        entry = SOURCES.get(path)
+        if entry is not None and entry[0] == stamp:
+            entry[1] = now
+            return entry[2]
+        with open(path, "rb") as file:
+            script = MalangeScript(compile(file.read(), path, "exec"), path)
+        SOURCES[path] = [stamp, now, script]
+        return script
@@ -1,2 +1,39 @@
+'''
+
+malange_core.internal.gateway
+
+This contains the gateways, which serve the rendered templates of a
+project as an app.
+- wsgi    : A streaming WSGI application.
+- asgi    : A streaming ASGI application, templates may await.
+- prefork : A pre-fork server for the WSGI application, workers share what is loaded.
+
+A template is served at its path relative to the project pwd, without
+.mala, and index.mala at the path of its directory:
+- index.mala       -> /
+- pages/about.mala -> /pages/about
+- pages/index.mala -> /pages/
+
+'''
+
+from typing import Iterable
+
 def hello() -> str:
     return "Hello from malange-core!"
+
+def route_of(name: str) -> str:
+    '''Return the URL path a template is served at.'''
+    path = "/" + name.replace("\\", "/").removesuffix(".mala")
+    if path == "/index" or path.endswith("/index"):
+        path = path.removesuffix("index")
+    return path
+
+def routes(names: Iterable[str]) -> dict[str, str]:
+    '''Map URL paths to template names, a path ending with / is also served without it.'''
+    table = {}
+    for name in names:
+        path = route_of(name)
+        table[path] = name
+        if len(path) > 1 and path.endswith("/"):
+            table.setdefault(path[:-1], name)
+    return table
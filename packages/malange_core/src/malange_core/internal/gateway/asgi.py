@@ -0,0 +1,141 @@
+'''
+    malange_core.internal.gateway.asgi
+
+    Serving a project over ASGI. A page is rendered by the async render
+    generator of its template, so one worker serves many connections at
+    once: a template waiting on a slow backend only holds its own task.
+    Every chunk goes out as an http.response.body message as soon as it is
+    ready, awaits injected in the same chunk run concurrently.
+
+    The first chunk is rendered before http.response.start is sent, so an
+    error in the [script/] block or at the top of the page is still a 500.
+
+    A page goes through the middleware chain, composed once here (see
+    malange_core.internal.middleware), whose hooks may be plain or async.
+
+    With profiling enabled every request is timed until its last message
+    is sent, and the stats are served as JSON at the profile path if set.
+'''
+
+import json
+import time
+
+from typing import Any, Awaitable, Callable, Iterable, Optional, TYPE_CHECKING
+
+from malange_core.internal.engine.render import STREAM_CHUNK
+from malange_core.internal.gateway import routes
+from malange_core.internal.manager.profile import PROFILER
+from malange_core.internal.middleware import PAGE, MalangeMiddleware, MalangeResponse, compose_async
+
+if TYPE_CHECKING: # To prevent circular imports, only import for type checking.
+    from malange_core.internal.engine import MalangeEngine
+
+PLAIN = [(b"content-type", b"text/plain; charset=utf-8")]
+JSON  = [(b"content-type", b"application/json")]
+
+class MalangeASGI:
+    '''ASGI application serving the templates of an engine.'''
+    def __init__(self, engine: 'MalangeEngine', chunk: int = STREAM_CHUNK, profile: Optional[str] = None,
+                 middlewares: Iterable[MalangeMiddleware] = ()):
+        '''
+            parameter:
+                engine      MalangeEngine : The engine holding the compiled templates.
+                chunk       int           : Least bytes per message, 0 sends a message per section.
+                profile     str           : Path serving the profiler stats, not served if None.
+                middlewares Iterable      : The middlewares around every page, outermost first.
+        '''
+        self.engine  : 'MalangeEngine' = engine
+        self.chunk   : int             = chunk
+        self.profile : Optional[str]   = profile
+        self.routes  : dict[str, str]  = routes(engine.templates)
+        middlewares = list(middlewares)
+        self.__chain       : Callable = compose_async(middlewares, self.__page)
+        self.__chain_timed : Callable = compose_async(middlewares, self.__page, timed=True)
+    def context(self, scope: dict[str, Any]) -> dict[str, Any]:
+        '''Names given to the template, the request is available as scope.'''
+        return {"scope": scope}
+    async def __call__(self, scope: dict[str, Any], receive: Callable[[], Awaitable[dict]],
+                       send: Callable[[dict], Awaitable[None]]) -> None:
+        if scope["type"] == "lifespan":
+            await self.__lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise ValueError(f"The ASGI gateway does not serve {scope['type']}.")
+        path = scope.get("path") or "/"
+        name = self.routes.get(path)
+        if name is None:
+            if self.profile is not None and path == self.profile:
+                await self.__simple(send, 200, json.dumps(PROFILER.snapshot()).encode(), JSON)
+            else:
+                await self.__simple(send, 404, b"Not Found")
+            return
+        if not PROFILER.enabled:
+            await self.__serve(name, scope, send, self.__chain)
+            return
+        start = time.perf_counter_ns()
+        try:
+            await self.__serve(name, scope, send, self.__chain_timed)
+        finally:
+            PROFILER.record("gateway", name, time.perf_counter_ns() - start)
+    async def __serve(self, name: str, scope: dict[str, Any], send: Callable[[dict], Awaitable[None]],
+                      chain: Callable) -> None:
+        context = self.context(scope)
+        context[PAGE] = name
+        try:
+            response = await chain(context)
+        except Exception as error:
+            self.engine.log.error("Page %s failed: %r", name, error)
+            await self.__simple(send, 500, b"Internal Server Error")
+            return
+        body    = response.body
+        headers = [(key.lower().encode("latin-1"), value.encode("latin-1")) for key, value in response.headers]
+        try:
+            await send({"type": "http.response.start", "status": response.status, "headers": headers})
+            if scope.get("method") != "HEAD":
+                if isinstance(body, bytes):
+                    if body:
+                        await send({"type": "http.response.body", "body": body, "more_body": True})
+                elif hasattr(body, "__aiter__"):
+                    async for chunk in body:
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                else:
+                    for chunk in body:
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            if hasattr(body, "aclose"):
+                await body.aclose() # Cancels pending awaits if the client went away.
+            elif hasattr(body, "close"):
+                body.close()
+    async def __page(self, context: dict[str, Any]) -> MalangeResponse:
+        '''The innermost handler of the chain, renders the first chunk so an error raises here.'''
+        chunks = self.engine.stream_async(context[PAGE], context, self.chunk)
+        try:
+            first = await anext(chunks, b"")
+        except BaseException:
+            await chunks.aclose()
+            raise
+        return MalangeResponse(self.__body(first, chunks), 200, [("Content-Type", "text/html; charset=utf-8")])
+    async def __body(self, first: bytes, chunks: Any) -> Any:
+        '''Yield the rendered first chunk, then the rest; aclose() reaches the template.'''
+        try:
+            if first:
+                yield first
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+    async def __simple(self, send: Callable[[dict], Awaitable[None]], status: int, body: bytes,
+                       headers: list = PLAIN) -> None:
+        await send({"type": "http.response.start", "status": status, "headers": list(headers)})
+        await send({"type": "http.response.body", "body": body, "more_body": False})
+    async def __lifespan(self, receive: Callable[[], Awaitable[dict]],
+                         send: Callable[[dict], Awaitable[None]]) -> None:
+        '''The templates are compiled with the project, there is nothing to start or stop.'''
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
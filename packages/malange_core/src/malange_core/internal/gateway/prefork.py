@@ -0,0 +1,340 @@
+'''
+    malange_core.internal.gateway.prefork
+
+    A pre-fork server for the WSGI gateway, with three kinds of process:
+    - arbiter    : Owns the listening socket and nothing else, it never loads
+                   the project. It starts generations and replaces them.
+    - generation : Loads the project, its plugins and every compiled
+                   template, prepares them for rendering (see
+                   MalangeEngine.warm()), then gc.freeze() and forks the
+                   workers. It starts a worker again if one dies.
+    - worker     : Serves requests on the shared socket.
+
+    Everything the generation loaded is shared with its workers by copy on
+    write. gc.freeze() moves it out of the collected generations, so a
+    collection in a worker does not write to (and copy) those pages.
+
+    Signals to the arbiter:
+    - SIGHUP          : Reload. A new generation loads and compiles the project
+                        again, and the old one is stopped once the new one
+                        serves. The socket stays open, no request is refused.
+                        If the new generation fails to start, the old one
+                        keeps serving.
+    - SIGTERM, SIGINT : Stop. Workers finish the request they are in.
+    - SIGUSR1         : The generation logs the counters of its workers.
+
+    Every worker keeps its pid, its request count and its memory (RSS, PSS
+    and private, in kB, from /proc where there is one) in a slot of memory
+    shared with its generation. GATEWAY.STATS sets a path serving them as
+    JSON, from any worker.
+
+    Workers serve with wsgiref, one connection at a time each, HTTP/1.0, as
+    the app server behind a reverse proxy.
+'''
+
+import gc
+import os
+import sys
+import json
+import mmap
+import time
+import select
+import signal
+import socket
+import struct
+import logging
+import resource
+import traceback
+
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Optional
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
+
+from malange_core.api.log import FORMAT, MalangeLogger
+
+if TYPE_CHECKING: # To prevent circular imports, only import for type checking.
+    from malange_core.internal.manager.project import MalangeProject
+
+SLOT          = struct.Struct("qqqqqd") # pid, requests, rss, pss, private (kB), started.
+POLL: float   = 0.5   # Seconds between two checks of the signals, in every process.
+MEMORY: float = 1.0   # Least seconds between two readings of the memory of a worker.
+GRACE: float  = 30.0  # Seconds a worker is given to finish when stopped, then killed.
+READY: float  = 300.0 # Seconds a generation is given to load the project.
+
+def memory() -> tuple[int, int, int]:
+    '''Return the RSS, PSS and private memory of this process in kB, PSS and private are 0 without /proc.'''
+    try:
+        with open("/proc/self/smaps_rollup", "rb") as file:
+            fields = {name: int(value.split()[0]) for name, value in
+                      (line.split(b":", 1) for line in file.read().splitlines()[1:])}
+        return (fields.get(b"Rss", 0), fields.get(b"Pss", 0),
+                fields.get(b"Private_Clean", 0) + fields.get(b"Private_Dirty", 0))
+    except (OSError, ValueError):
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # Peak, in kB on Linux.
+        return (usage, 0, 0)
+
+def reap() -> Iterator[tuple[int, int]]:
+    '''Yield (pid, wait status) of every child that exited, without waiting.'''
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError: # No child left.
+            return
+        if pid == 0:
+            return
+        yield pid, status
+
+def finish(code: int) -> None:
+    '''Exit a forked process, without the atexit handlers of the arbiter, once its logs are written.'''
+    MalangeLogger.stop()
+    os._exit(code)
+
+class MalangeWorkerServer(WSGIServer):
+    '''wsgiref server on a socket made by the arbiter, counting the requests it handles.'''
+    def __init__(self, listener: socket.socket, app: Callable):
+        super().__init__(listener.getsockname()[:2], MalangeRequestHandler, bind_and_activate=False)
+        self.socket.close() # Made unbound, the one of the arbiter is used.
+        host, port       = listener.getsockname()[:2]
+        self.socket      = listener
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+        self.timeout     = POLL # handle_request() returns then, to check the signals.
+        self.requests    = 0
+        self.setup_environ()
+        self.set_app(app)
+    def get_request(self) -> tuple[socket.socket, Any]:
+        connection, address = self.socket.accept() # Non blocking, another worker may take it first.
+        connection.setblocking(True)
+        return connection, address
+    def finish_request(self, request: Any, client_address: Any) -> None:
+        super().finish_request(request, client_address)
+        self.requests += 1
+
+class MalangeRequestHandler(WSGIRequestHandler):
+    def log_message(self, format: str, *args: Any) -> None:
+        pass # Access logs are the job of the reverse proxy.
+
+class MalangePrefork:
+    '''The arbiter of a pre-fork server, see the module docstring.'''
+    def __init__(self, load: Callable[[], 'MalangeProject'], host: str = "127.0.0.1", port: int = 8000,
+                 workers: Optional[int] = None, backlog: int = 1024):
+        '''
+            parameter:
+                load    Callable : Returns the project, loaded from scratch. Called in each generation.
+                host    str      : Address to listen on.
+                port    int      : Port to listen on.
+                workers int      : Workers per generation, default is GATEWAY.WORKERS or the CPU count.
+                backlog int      : Connections waiting to be accepted.
+        '''
+        self.load       : Callable[[], 'MalangeProject'] = load
+        self.address    : tuple[str, int]                = (host, port)
+        self.workers    : Optional[int]                  = workers
+        self.backlog    : int                            = backlog
+        self.generation : int                            = 0
+        self.__signals  : set[int]                       = set() # Received and not handled yet.
+        self.__log      : logging.Logger                 = logging.getLogger("malange_prefork")
+        if not self.__log.handlers: # The arbiter loads no project, so it has no MalangeLogger.
+            stream = logging.StreamHandler(sys.stderr)
+            stream.setFormatter(logging.Formatter(FORMAT))
+            self.__log.addHandler(stream)
+            self.__log.setLevel(logging.INFO)
+            self.__log.propagate = False
+
+    # Arbiter.
+    def serve(self) -> None:
+        '''
+            Listen and serve until SIGTERM or SIGINT, in the arbiter (the calling process).
+
+            raise:
+                RuntimeError : The first generation failed to start.
+        '''
+        self.__listener = socket.create_server(self.address, backlog=self.backlog)
+        self.__listener.setblocking(False)
+        for number in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+            signal.signal(number, lambda number, frame: self.__signals.add(number))
+        self.__log.info("Listening on %s:%d.", *self.__listener.getsockname()[:2])
+        current = self.__spawn()
+        if current is None:
+            self.__listener.close()
+            raise RuntimeError("The first generation failed to start.")
+        serving = self.generation # Number of the current generation.
+        retired = [] # Old generations, stopping.
+        try:
+            while True:
+                time.sleep(POLL)
+                received, self.__signals = self.__signals, set()
+                if signal.SIGTERM in received or signal.SIGINT in received:
+                    break
+                if signal.SIGHUP in received:
+                    self.__log.info("Reloading.")
+                    fresh = self.__spawn()
+                    if fresh is None:
+                        self.__log.error("The new generation failed to start, generation %d keeps serving.",
+                                         serving)
+                    else:
+                        os.kill(current, signal.SIGTERM)
+                        retired.append(current)
+                        current, serving = fresh, self.generation
+                if signal.SIGUSR1 in received:
+                    os.kill(current, signal.SIGUSR1)
+                for pid, status in reap():
+                    if pid in retired:
+                        retired.remove(pid)
+                    elif pid == current:
+                        self.__log.error("Generation %d exited with status %d, starting another.",
+                                         serving, os.waitstatus_to_exitcode(status))
+                        current, serving = self.__spawn(), self.generation
+                        if current is None:
+                            raise RuntimeError("The generation failed to start again.")
+        finally:
+            self.__log.info("Stopping.")
+            for pid in (current, *retired):
+                if pid is not None:
+                    try:
+                        os.kill(pid, signal.SIGTERM)
+                    except ProcessLookupError:
+                        pass
+            for pid in (current, *retired):
+                if pid is not None:
+                    try:
+                        os.waitpid(pid, 0)
+                    except ChildProcessError:
+                        pass
+            self.__listener.close()
+    def __spawn(self) -> Optional[int]:
+        '''Fork a generation, return its pid once it serves, or None if it failed.'''
+        self.generation += 1
+        reader, writer = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(reader)
+            code = 1
+            try:
+                code = self.__generation(writer)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                finish(code)
+        os.close(writer)
+        try:
+            ready, _, _ = select.select([reader], [], [], READY)
+            if ready and os.read(reader, 1) == b"1":
+                self.__log.info("Generation %d (pid %d) is serving.", self.generation, pid)
+                return pid
+        finally:
+            os.close(reader)
+        try: # It died, or took too long.
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        os.waitpid(pid, 0)
+        return None
+
+    # Generation.
+    def __generation(self, ready: int) -> int:
+        '''Load the project, fork the workers and watch them, in the generation process.'''
+        signals = set()
+        signal.signal(signal.SIGTERM, lambda number, frame: signals.add(number))
+        signal.signal(signal.SIGUSR1, lambda number, frame: signals.add(number))
+        signal.signal(signal.SIGINT, signal.SIG_IGN) # Ctrl-C reaches the whole group, the arbiter handles it.
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        project = self.load()
+        log     = project.log
+        app     = project.wsgi()
+        project.engine.warm()
+        count   = self.workers or getattr(project.GATEWAY, "WORKERS", None) or os.cpu_count() or 1
+        stats   = getattr(project.GATEWAY, "STATS", None)
+        slots   = mmap.mmap(-1, SLOT.size * count) # Anonymous and shared, it survives the forks.
+        if stats is not None:
+            app = self.__stats(app, stats, slots, count)
+        gc.collect()
+        gc.freeze() # What is loaded now is shared with the workers, and left alone by their collections.
+        workers = {} # pid -> index of its slot.
+        for index in range(count):
+            workers[self.__fork(app, slots, index)] = index
+        log.info("Generation %d: %d template(s), %d worker(s), %d object(s) frozen.",
+                 self.generation, len(project.engine.templates), count, gc.get_freeze_count())
+        os.write(ready, b"1")
+        os.close(ready)
+        while signal.SIGTERM not in signals:
+            time.sleep(POLL)
+            if signal.SIGUSR1 in signals:
+                signals.discard(signal.SIGUSR1)
+                self.__report(log, slots, count)
+            for pid, status in reap():
+                index = workers.pop(pid, None)
+                if index is not None and signal.SIGTERM not in signals:
+                    log.error("Worker %d exited with status %d, starting another.",
+                              pid, os.waitstatus_to_exitcode(status))
+                    workers[self.__fork(app, slots, index)] = index
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + GRACE
+        while workers and time.monotonic() < deadline:
+            time.sleep(0.05)
+            for pid, _ in reap():
+                workers.pop(pid, None)
+        for pid in workers: # Still in a request past the grace period.
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.__report(log, slots, count)
+        return 0
+    def __fork(self, app: Callable, slots: mmap.mmap, index: int) -> int:
+        '''Fork a worker serving app with the slot index, return its pid.'''
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = self.__work(app, slots, index)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                finish(code)
+        return pid
+    def __report(self, log: MalangeLogger, slots: mmap.mmap, count: int) -> None:
+        '''Log the counters of every worker.'''
+        for entry in self.slots(slots, count):
+            log.info("Worker %d: %d request(s), RSS %d kB, PSS %d kB, private %d kB.", entry["pid"],
+                     entry["requests"], entry["rss_kb"], entry["pss_kb"], entry["private_kb"])
+    def __stats(self, app: Callable, path: str, slots: mmap.mmap, count: int) -> Callable:
+        '''Wrap app so path serves the counters of the workers as JSON.'''
+        generation = self.generation
+        def served(environ: dict[str, Any], start_response: Callable) -> Iterable[bytes]:
+            if environ.get("PATH_INFO") != path:
+                return app(environ, start_response)
+            start_response("200 OK", [("Content-Type", "application/json")])
+            return [json.dumps({"generation": generation, "pid": os.getppid(),
+                                "workers": self.slots(slots, count)}).encode()]
+        return served
+
+    # Worker.
+    def __work(self, app: Callable, slots: mmap.mmap, index: int) -> int:
+        '''Serve requests until SIGTERM, in a worker process.'''
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda number, frame: stopping.append(number))
+        for number in (signal.SIGINT, signal.SIGHUP, signal.SIGUSR1):
+            signal.signal(number, signal.SIG_IGN)
+        server  = MalangeWorkerServer(self.__listener, app)
+        started = time.time()
+        offset  = SLOT.size * index
+        SLOT.pack_into(slots, offset, os.getpid(), 0, *memory(), started)
+        checked = time.monotonic()
+        while not stopping:
+            server.handle_request()
+            now = time.monotonic()
+            if now - checked >= MEMORY:
+                SLOT.pack_into(slots, offset, os.getpid(), server.requests, *memory(), started)
+                checked = now
+            else: # Only the count, the rest of the slot is left as it is.
+                struct.pack_into("q", slots, offset + 8, server.requests)
+        return 0
+
+    @staticmethod
+    def slots(slots: mmap.mmap, count: int) -> list[dict[str, Any]]:
+        '''Return the counters of the workers of a generation, from its shared slots.'''
+        found = []
+        for index in range(count):
+            pid, requests, rss, pss, private, started = SLOT.unpack_from(slots, SLOT.size * index)
+            if pid:
+                found.append({"pid": pid, "requests": requests, "rss_kb": rss, "pss_kb": pss,
+                              "private_kb": private, "started": started})
+        return found
@@ -0,0 +1,104 @@
+'''
+    malange_core.internal.gateway.wsgi
+
+    Serving a project over WSGI. The rendered page is returned as the
+    render generator itself, so the server sends each chunk as soon as it
+    is ready instead of waiting for the whole page: a long [for] goes out
+    item by item, and memory does not grow with the size of the page.
+
+    The first chunk is rendered before start_response(), so an error in the
+    [script/] block or at the top of the page is still a 500.
+
+    A page goes through the middleware chain, composed once here (see
+    malange_core.internal.middleware), so a middleware can answer in its
+    place or change its response.
+
+    With profiling enabled every request is timed until the server closes
+    the body, and the stats are served as JSON at the profile path if set.
+'''
+
+import sys
+import json
+import time
+
+from http import HTTPStatus
+from typing import Any, Callable, Iterable, Iterator, Optional, TYPE_CHECKING
+
+from malange_core.internal.engine.render import STREAM_CHUNK
+from malange_core.internal.gateway import routes
+from malange_core.internal.manager.profile import PROFILER, timed
+from malange_core.internal.middleware import PAGE, MalangeMiddleware, MalangeResponse, compose
+
+if TYPE_CHECKING: # To prevent circular imports, only import for type checking.
+    from malange_core.internal.engine import MalangeEngine
+
+HTML   = [("Content-Type", "text/html; charset=utf-8")]
+JSON   = [("Content-Type", "application/json")]
+STATUS = {status.value: f"{status.value} {status.phrase}" for status in HTTPStatus}
+
+class MalangeWSGI:
+    '''WSGI application serving the templates of an engine.'''
+    def __init__(self, engine: 'MalangeEngine', chunk: int = STREAM_CHUNK, profile: Optional[str] = None,
+                 middlewares: Iterable[MalangeMiddleware] = ()):
+        '''
+            parameter:
+                engine      MalangeEngine : The engine holding the compiled templates.
+                chunk       int           : Least bytes per chunk sent, 0 sends every chunk as is.
+                profile     str           : Path serving the profiler stats, not served if None.
+                middlewares Iterable      : The middlewares around every page, outermost first.
+            raise:
+                TypeError : A middleware has an async hook.
+        '''
+        self.engine  : 'MalangeEngine' = engine
+        self.chunk   : int             = chunk
+        self.profile : Optional[str]   = profile
+        self.routes  : dict[str, str]  = routes(engine.templates)
+        middlewares = list(middlewares)
+        self.__chain       : Callable = compose(middlewares, self.__page)
+        self.__chain_timed : Callable = compose(middlewares, self.__page, timed=True)
+    def context(self, environ: dict[str, Any]) -> dict[str, Any]:
+        '''Names given to the template, the request is available as environ.'''
+        return {"environ": environ}
+    def __call__(self, environ: dict[str, Any], start_response: Callable) -> Iterable[bytes]:
+        path = environ.get("PATH_INFO") or "/"
+        name = self.routes.get(path)
+        if name is None:
+            if self.profile is not None and path == self.profile:
+                start_response("200 OK", list(JSON))
+                return [json.dumps(PROFILER.snapshot()).encode()]
+            start_response("404 Not Found", [("Content-Type", "text/plain; charset=utf-8")])
+            return [b"Not Found"]
+        if PROFILER.enabled:
+            start = time.perf_counter_ns()
+            return timed(self.__serve(name, environ, start_response, self.__chain_timed), "gateway", name, start)
+        return self.__serve(name, environ, start_response, self.__chain)
+    def __serve(self, name: str, environ: dict[str, Any], start_response: Callable,
+                chain: Callable) -> Iterable[bytes]:
+        context = self.context(environ)
+        context[PAGE] = name
+        try:
+            response = chain(context)
+        except Exception as error:
+            self.engine.log.error("Page %s failed: %r", name, error)
+            start_response("500 Internal Server Error", [("Content-Type", "text/plain; charset=utf-8")],
+                           sys.exc_info())
+            return [b"Internal Server Error"]
+        body = response.body
+        start_response(STATUS.get(response.status) or str(response.status), response.headers)
+        if isinstance(body, bytes):
+            return [] if environ.get("REQUEST_METHOD") == "HEAD" else [body]
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            if hasattr(body, "close"):
+                body.close()
+            return []
+        return body
+    def __page(self, context: dict[str, Any]) -> MalangeResponse:
+        '''The innermost handler of the chain, renders the first chunk so an error raises here.'''
+        chunks = self.engine.stream(context[PAGE], context, self.chunk)
+        first  = next(chunks, b"")
+        return MalangeResponse(self.__body(first, chunks), 200, list(HTML))
+    def __body(self, first: bytes, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        '''Yield the rendered first chunk, then the rest; close() reaches the template.'''
+        if first:
+            yield first
+        yield from chunks
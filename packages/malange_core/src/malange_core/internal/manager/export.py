@@ -0,0 +1,291 @@
+'''
+
+malange_core.internal.manager.export
+
+This contains the static export of a project: every template is rendered
+once to an .html file next to where its route would be (index.mala ->
+index.html, pages/about.mala -> pages/about.html), for a plain file server.
+
+Every output records what it was built from, each input by a hash of its
+content, in the manifest of the output directory:
+- engine               : The engine key, CACHE_VERSION and the executives configured.
+- source:{name}        : The .mala file.
+- script:{path}        : The file of its [/script src=.../].
+- plugin:{name}.{key}  : Every config entity given to a plugin, by repr().
+- executive:{class}    : Each executive its elements run, its VERSION and source file.
+- asset:{url}          : Each asset the output links to.
+An export renders again only the outputs with an input that changed (or
+with no output file), so editing one script file or one asset renders
+only the pages using it. An output rendering the same bytes as before is
+not written again.
+
+Files under the assets directory are copied with the hash of their content
+in their name (css/app.css -> css/app.1f2e3d4c.css), so they can be cached
+forever, and the links to them in the pages are rewritten. Text outputs get
+a .gz sibling, compressed once here instead of per request.
+
+Pages are rendered with no middleware, given an environ of a GET on their
+route only, like a request would.
+
+'''
+
+import os
+import re
+import json
+import gzip
+import asyncio
+import hashlib
+import inspect
+
+from typing import TYPE_CHECKING, Any, Optional
+
+from malange_core.internal.engine.cache import source_digest
+from malange_core.internal.engine.parser import ELEMENT
+from malange_core.internal.engine.compiler import MalangeTemplate
+from malange_core.internal.gateway import route_of
+
+if TYPE_CHECKING: # To prevent circular imports, only import for type checking.
+    from malange_core.internal.manager.project import MalangeProject
+
+MANIFEST       = ".malange-export.json" # In the output directory.
+EXPORT_VERSION = 1 # Bumped whenever the manifest changes, an older one renders everything again.
+COMPRESSIBLE   = frozenset((".html", ".css", ".js", ".mjs", ".json", ".map", ".svg", ".txt", ".xml"))
+GZIP_MIN: int  = 256 # Bytes, smaller files are not worth a .gz.
+HASH_LENGTH    = 8   # Hex digits of the content hash in the name of an asset.
+
+def hashed_name(path: str, digest: str) -> str:
+    '''Return the path with the hash before its extension, css/app.css -> css/app.1f2e3d4c.css.'''
+    root, extension = os.path.splitext(path)
+    return f"{root}.{digest[:HASH_LENGTH]}{extension}"
+
+def environ(route: str) -> dict[str, Any]:
+    '''Return the environ a page is rendered with, that of a GET on its route.'''
+    return {"REQUEST_METHOD": "GET", "PATH_INFO": route, "QUERY_STRING": "", "SCRIPT_NAME": "",
+            "SERVER_NAME": "localhost", "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1",
+            "wsgi.url_scheme": "http"}
+
+def write(path: str, data: bytes) -> None:
+    '''Write a file whole or not at all.'''
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(data)
+    os.replace(temporary, path)
+
+def remove(path: str) -> None:
+    '''Remove a file and its .gz sibling, if they exist.'''
+    for target in (path, f"{path}.gz"):
+        try:
+            os.remove(target)
+        except FileNotFoundError:
+            pass
+
+def compress(path: str, data: bytes) -> bool:
+    '''Write the .gz sibling of a text file, unless it would not be smaller. Return True if written.'''
+    if os.path.splitext(path)[1] in COMPRESSIBLE and len(data) >= GZIP_MIN:
+        packed = gzip.compress(data, 9, mtime=0) # No timestamp, the same file gives the same bytes.
+        if len(packed) < len(data):
+            write(f"{path}.gz", packed)
+            return True
+    try:
+        os.remove(f"{path}.gz")
+    except FileNotFoundError:
+        pass
+    return False
+
+class MalangeExportResult:
+    '''Result of an export: what was rendered, skipped and removed, and the failures.'''
+    def __init__(self):
+        self.rendered : list[str]      = [] # Templates rendered, by name.
+        self.written  : int            = 0  # Outputs whose bytes changed.
+        self.skipped  : list[str]      = [] # Templates none of whose inputs changed.
+        self.removed  : list[str]      = [] # Files of templates or assets that are gone.
+        self.assets   : int            = 0  # Assets copied.
+        self.failures : dict[str, str] = {} # Name -> error message.
+
+class MalangeExport:
+    '''The static export of a project to a directory, see the module docstring.'''
+    def __init__(self, project: 'MalangeProject', output: str, assets: Optional[str] = None,
+                 precompress: bool = True, force: bool = False):
+        '''
+            parameter:
+                project     MalangeProject : The project, its templates compiled.
+                output      str            : The output directory.
+                assets      str            : The directory of the assets, relative to the project pwd.
+                precompress bool           : Write a .gz sibling of the text outputs.
+                force       bool           : Render everything, whatever the manifest says.
+        '''
+        self.__proj      : 'MalangeProject'         = project
+        self.__pwd       : str                      = project.retrive_pwd()
+        self.__engine                               = project.engine
+        self.output      : str                      = os.path.abspath(output)
+        self.assets      : Optional[str]            = assets
+        self.precompress : bool                     = precompress
+        self.force       : bool                     = force
+        self.__digests   : dict[str, Optional[str]] = {} # Path -> digest, each file is hashed once.
+        self.__classes   : dict[type, str]          = {} # Executive class -> its digest.
+        self.__links     : dict[str, str]           = {} # URL of an asset -> URL of its hashed copy.
+        self.__hashes    : dict[str, str]           = {} # URL of an asset -> its digest.
+        self.__plugins   : dict[str, str]           = {  # The plugin config entities, shared by every output.
+            f"plugin:{plugin}.{entity}": hashlib.blake2b(repr(value).encode(), digest_size=16).hexdigest()
+            for plugin in sorted(project.plugin_names()) for entity, value in project.plugin_conf(plugin).items()}
+
+    def digest(self, path: str) -> Optional[str]:
+        '''Return the hash of a file, None if it can not be read.'''
+        if path not in self.__digests:
+            try:
+                with open(path, "rb") as file:
+                    self.__digests[path] = source_digest(file.read())
+            except OSError:
+                self.__digests[path] = None
+        return self.__digests[path]
+    def executive_digest(self, executive: type) -> str:
+        '''Return the hash of an executive class, from its VERSION and the file defining it.'''
+        if executive not in self.__classes:
+            try:
+                file = inspect.getsourcefile(executive)
+            except TypeError: # Built in.
+                file = None
+            code = None if file is None else self.digest(file)
+            self.__classes[executive] = f"{getattr(executive, 'VERSION', '')}:{code}"
+        return self.__classes[executive]
+    def inputs(self, name: str, template: MalangeTemplate) -> dict[str, Any]:
+        '''Return the inputs of the output of a template, but its assets, by key.'''
+        path   = os.path.join(self.__pwd, name)
+        found  = {"engine": self.__engine.cache.key, f"source:{name}": self.digest(path)}
+        if isinstance(template.script, str):
+            script = os.path.relpath(os.path.join(os.path.dirname(path), template.script), self.__pwd)
+            found[f"script:{script}"] = self.digest(os.path.join(self.__pwd, script))
+        found.update(self.__plugins)
+        executives = self.__engine.executives
+        if executives:
+            tree  = template.tree
+            heads, tails = tree.heads, tree.tails
+            try:
+                with open(path, encoding="utf-8") as file:
+                    source = file.read()
+            except (OSError, UnicodeDecodeError): # Then its source: input has changed already.
+                source = ""
+            for index in range(len(tree)):
+                if tree.kinds[index] != ELEMENT or tails[index] == -1:
+                    continue
+                for child in tree.children(index):
+                    value     = None if heads[child] == -1 else source[heads[child]:tails[child]]
+                    executive = executives.get((tree.name(index), tree.name(child), value))
+                    if executive is not None:
+                        kind = type(executive)
+                        found[f"executive:{kind.__module__}.{kind.__qualname__}"] = self.executive_digest(kind)
+        return found
+    def changed(self, entry: Optional[dict[str, Any]], inputs: dict[str, Any]) -> bool:
+        '''Whether an output has to be rendered again, from its entry in the last manifest.'''
+        if self.force or entry is None or not os.path.isfile(os.path.join(self.output, entry["file"])):
+            return True
+        last = {key: value for key, value in entry["inputs"].items() if not key.startswith("asset:")}
+        if last != inputs:
+            return True
+        return any(self.__hashes.get(key[6:]) != value # Asset changed, or gone.
+                   for key, value in entry["inputs"].items() if key.startswith("asset:"))
+
+    def run(self) -> MalangeExportResult:
+        '''Export the project, only rendering the outputs whose inputs changed since the last export.'''
+        result   = MalangeExportResult()
+        log      = self.__proj.log
+        manifest = os.path.join(self.output, MANIFEST)
+        try:
+            with open(manifest, encoding="utf-8") as file:
+                last = json.load(file)
+            if last.get("version") != EXPORT_VERSION:
+                last = {}
+        except (OSError, ValueError):
+            last = {}
+        outputs, assets = last.get("outputs", {}), last.get("assets", {})
+        assets = self.__copy_assets(assets, result)
+        links  = re.compile("|".join(r"(?<![\w/.-])" + re.escape(url) + r"(?![\w/.-])" for url in
+                                     sorted(self.__links, key=len, reverse=True)).encode()) if self.__links else None
+        done   = {}
+        for name in sorted(self.__engine.templates):
+            template = self.__engine.templates[name]
+            inputs   = self.inputs(name, template)
+            entry    = outputs.get(name)
+            if not self.changed(entry, inputs):
+                done[name] = entry
+                result.skipped.append(name)
+                continue
+            route = route_of(name)
+            try:
+                output = self.__render(name, template, {"environ": environ(route)})
+            except Exception as error:
+                result.failures[name] = f"{type(error).__name__}: {error}"
+                log.error("Page %s failed to export: %s", name, result.failures[name])
+                continue
+            if links is not None:
+                linked = set()
+                def link(match: re.Match) -> bytes:
+                    url = match.group().decode()
+                    linked.add(url)
+                    return self.__links[url].encode()
+                output = links.sub(link, output)
+                inputs.update((f"asset:{url}", self.__hashes[url]) for url in sorted(linked))
+            file   = os.path.splitext(name)[0] + ".html"
+            digest = source_digest(output)
+            if entry is None or entry.get("digest") != digest or not os.path.isfile(os.path.join(self.output, file)):
+                target = os.path.join(self.output, file)
+                write(target, output)
+                if self.precompress:
+                    compress(target, output)
+                result.written += 1
+            done[name] = {"file": file, "route": route, "digest": digest, "inputs": inputs}
+            result.rendered.append(name)
+        for name, entry in outputs.items(): # Templates that are gone.
+            if name not in done and name not in result.failures:
+                remove(os.path.join(self.output, entry["file"]))
+                result.removed.append(entry["file"])
+        for name in result.failures: # Kept in the manifest, so the next export tries them again.
+            if name in outputs:
+                done[name] = dict(outputs[name], inputs={})
+        write(manifest, json.dumps({"version": EXPORT_VERSION, "outputs": done, "assets": assets},
+                                   indent=1, sort_keys=True).encode())
+        log.info("Exported to %s: rendered %d (written %d), unchanged %d, removed %d, assets copied %d.",
+                 self.output, len(result.rendered), result.written, len(result.skipped),
+                 len(result.removed), result.assets)
+        return result
+
+    def __render(self, name: str, template: MalangeTemplate, context: dict[str, Any]) -> bytes:
+        '''Render a page as bytes, a template that awaits is rendered on an event loop.'''
+        if template.program is not None:
+            return self.__engine.render(name, context)
+        async def collect() -> bytes:
+            return b"".join([chunk async for chunk in self.__engine.stream_async(name, context)])
+        return asyncio.run(collect())
+    def __copy_assets(self, last: dict[str, str], result: MalangeExportResult) -> dict[str, str]:
+        '''Copy the assets under their hashed name, remove the copies of the last export that are gone.'''
+        copied = {} # Path relative to the pwd -> hashed path.
+        if self.assets is not None:
+            root = os.path.join(self.__pwd, self.assets)
+            for directory, dirs, files in os.walk(root):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                for name in sorted(files):
+                    if name.startswith("."):
+                        continue
+                    path     = os.path.join(directory, name)
+                    relative = os.path.relpath(path, self.__pwd).replace(os.sep, "/")
+                    digest   = self.digest(path)
+                    if digest is None:
+                        continue
+                    hashed   = hashed_name(relative, digest)
+                    copied[relative] = hashed
+                    self.__links[f"/{relative}"]  = f"/{hashed}"
+                    self.__hashes[f"/{relative}"] = digest
+                    target = os.path.join(self.output, hashed)
+                    if self.force or last.get(relative) != hashed or not os.path.isfile(target):
+                        with open(path, "rb") as file:
+                            data = file.read()
+                        write(target, data)
+                        if self.precompress:
+                            compress(target, data)
+                        result.assets += 1
+        for relative, hashed in last.items():
+            if copied.get(relative) != hashed:
+                remove(os.path.join(self.output, hashed))
+                result.removed.append(hashed)
+        return copied
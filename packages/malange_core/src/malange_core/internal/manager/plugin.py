@@ -0,0 +1,136 @@
+'''
+
+malange_core.internal.manager.plugin
+
+This contains the lazy handle of a plugin. A plugin is registered from its
+config module alone (NAME and ENTITIES), the package itself is only
+imported the first time something is looked up on it, e.g. an executive,
+a middleware, or a gateway hook.
+
+A plugin is a package (a directory with __init__.py) next to a config.py:
+- PACK : The key is the import name of an installed package.
+- PROJ : The key is the name of a directory under {pwd}/plugins.
+- DIRE : The key is the path of the directory.
+
+'''
+
+import os
+import sys
+import time
+import hashlib
+import types
+import importlib
+import importlib.util
+import importlib.machinery
+
+from typing import Optional
+
+from malange_core.internal.manager.config import MalangePluginType
+from malange_core.internal.manager.profile import PROFILER
+
+def namespace_parent(name: str) -> Optional[types.ModuleType]:
+    '''Return the parent of the dotted module name, made an empty namespace package if missing.'''
+    parent = name.rpartition(".")[0]
+    if not parent:
+        return None
+    if parent not in sys.modules:
+        spec = importlib.machinery.ModuleSpec(parent, None, is_package=True)
+        spec.submodule_search_locations = [] # Its modules are only ever loaded by load_file().
+        sys.modules[parent] = importlib.util.module_from_spec(spec)
+    return sys.modules[parent]
+
+def config_name(directory: str) -> str:
+    '''Return the module name of the config of the plugin at directory, unique by its path.'''
+    directory = os.path.normcase(os.path.abspath(directory))
+    digest    = hashlib.sha1(directory.encode("utf-8", "surrogateescape")).hexdigest()[:16]
+    return f"malange_plugin_config.{os.path.basename(directory)}_{digest}"
+
+def load_file(name: str, path: str, package: bool = False) -> types.ModuleType:
+    '''
+        Execute the file at path as the module name, raise ImportError if there is none.
+        If package, path is the __init__.py of a package, whose relative imports then work.
+    '''
+    locations = [os.path.dirname(path)] if package else None
+    spec = importlib.util.spec_from_file_location(name, path, submodule_search_locations=locations)
+    if spec is None or not os.path.isfile(path):
+        raise ImportError(f"No module at {path}.")
+    parent = namespace_parent(name)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    if parent is not None:
+        setattr(parent, name.rpartition(".")[2], module)
+    return module
+
+def plugin_directory(key: str, kind: MalangePluginType, pwd: str) -> str:
+    '''Return the directory of a plugin, raise ImportError if it can not be found.'''
+    if kind == MalangePluginType.PACK:
+        spec = importlib.util.find_spec(key) # Finds the package without executing it.
+        if spec is None or not spec.submodule_search_locations:
+            raise ImportError(f"No package named {key}.")
+        return list(spec.submodule_search_locations)[0]
+    if kind == MalangePluginType.PROJ:
+        return os.path.join(pwd, "plugins", key)
+    return key
+
+class MalangePlugin:
+    '''A registered plugin, its package is imported on first attribute lookup.'''
+    def __init__(self, key: str, kind: MalangePluginType, pwd: str):
+        '''
+            Load the config module of the plugin, and nothing else.
+
+            parameter:
+                key  str               : The key in the PLUGINS config entity.
+                kind MalangePluginType : The value in the PLUGINS config entity.
+                pwd  str               : The project directory.
+            raise:
+                ImportError : The plugin or its config module can not be found.
+        '''
+        start = time.perf_counter_ns()
+        self.key       : str                        = key
+        self.kind      : MalangePluginType          = kind
+        self.directory : str                        = plugin_directory(key, kind, pwd)
+        self.name      : Optional[str]              = None # Set from config.NAME by the project.
+        self.config    : types.ModuleType           = load_file(
+            config_name(self.directory), os.path.join(self.directory, "config.py"))
+        self.__module  : Optional[types.ModuleType] = None
+        # Timings in nanoseconds, import_ns stays None until the plugin is used.
+        self.config_ns   : int           = time.perf_counter_ns() - start
+        self.validate_ns : int           = 0
+        self.import_ns   : Optional[int] = None
+
+    @property
+    def loaded(self) -> bool:
+        '''Whether the package has been imported yet.'''
+        return self.__module is not None
+    @property
+    def module(self) -> types.ModuleType:
+        '''The package of the plugin, imported on first access.'''
+        if self.__module is None:
+            start = time.perf_counter_ns()
+            if self.kind == MalangePluginType.PACK:
+                module = importlib.import_module(self.key)
+            else:
+                module = load_file(f"malange_plugin.{self.name}",
+                                   os.path.join(self.directory, "__init__.py"), True)
+            if not hasattr(module, "config"): # Reuse the config that was already loaded.
+                module.config = self.config
+            self.__module  = module
+            self.import_ns = time.perf_counter_ns() - start
+            if PROFILER.enabled:
+                PROFILER.record("plugin", f"{self.name}.import", self.import_ns)
+        return self.__module
+    def __getattr__(self, attr: str) -> any:
+        '''Anything not on the handle is looked up on the package, importing it.'''
+        if attr.startswith("_MalangePlugin__"): # Not set yet, do not recurse into module.
+            raise AttributeError(attr)
+        return getattr(self.module, attr)
+    def report(self) -> str:
+        '''One line of the startup report.'''
+        imported = "deferred" if self.import_ns is None else f"{self.import_ns / 1e6:.3f} ms"
+        return (f"Plugin {self.name} ({self.kind.name}): config {self.config_ns / 1e6:.3f} ms, "
+                f"validation {self.validate_ns / 1e6:.3f} ms, import {imported}.")
@@ -0,0 +1,127 @@
+'''
+
+malange_core.internal.manager.profile
+
+This contains the profiler of Malange, which counts the calls and the
+time (perf_counter_ns) spent in each phase, per template or plugin:
+- startup    : Bootstrap of the project, by step (mode, plugins, engine).
+- plugin     : Loading the config, validating and importing each plugin.
+- cache      : Loading a template from __malacache__.
+- lex        : Lexing a template.
+- compile    : Compiling the lexemes of a template.
+- render     : Time spent inside the render generator of a template.
+- middleware : Each hook of a middleware, by class and hook (e.g. Auth.request).
+- gateway    : A whole request, by route, including the time the server spends sending.
+
+Instrumented code checks PROFILER.enabled before reading the clock, so a
+disabled profiler costs one attribute read per call site.
+
+'''
+
+import json
+import time
+import threading
+
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Iterator
+
+class MalangeProfiler:
+    '''Counts and timings by phase and key.'''
+    def __init__(self):
+        self.enabled : bool                               = False
+        self.__stats : dict[tuple[str, str], list[int]]   = {} # (phase, key) -> [count, total, max] in ns.
+        self.__lock  : threading.Lock                     = threading.Lock()
+    def enable(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+    def record(self, phase: str, key: str, elapsed: int, count: int = 1) -> None:
+        '''Add a timing, in ns, to a phase and key.'''
+        with self.__lock:
+            entry = self.__stats.get((phase, key))
+            if entry is None:
+                self.__stats[(phase, key)] = [count, elapsed, elapsed]
+            else:
+                entry[0] += count
+                entry[1] += elapsed
+                if elapsed > entry[2]:
+                    entry[2] = elapsed
+    def snapshot(self) -> dict[str, dict[str, dict[str, int]]]:
+        '''Return a copy of the stats, {phase: {key: {count, total_ns, mean_ns, max_ns}}}.'''
+        with self.__lock:
+            items = [(phase, key, list(entry)) for (phase, key), entry in self.__stats.items()]
+        stats = {}
+        for phase, key, (count, total, most) in sorted(items):
+            stats.setdefault(phase, {})[key] = {"count": count, "total_ns": total,
+                                                "mean_ns": total // count if count else 0, "max_ns": most}
+        return stats
+    def merge(self, stats: dict[str, dict[str, dict[str, int]]]) -> None:
+        '''Add a snapshot, e.g. taken in a build worker, to the stats.'''
+        with self.__lock:
+            for phase, keys in stats.items():
+                for key, entry in keys.items():
+                    current = self.__stats.setdefault((phase, key), [0, 0, 0])
+                    current[0] += entry["count"]
+                    current[1] += entry["total_ns"]
+                    current[2]  = max(current[2], entry["max_ns"])
+    def reset(self) -> None:
+        with self.__lock:
+            self.__stats.clear()
+    def dump(self, path: str) -> None:
+        '''Write a snapshot to path as JSON.'''
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.snapshot(), file, indent=2)
+    @contextmanager
+    def span(self, phase: str, key: str) -> Iterator[None]:
+        '''Time the body of a with statement, for code that does not run per request.'''
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(phase, key, time.perf_counter_ns() - start)
+
+PROFILER: MalangeProfiler = MalangeProfiler() # Shared by the whole process.
+
+def profiled(chunks: Iterator[bytes], phase: str, key: str) -> Iterator[bytes]:
+    '''Yield the chunks, recording the time spent producing them but not consuming them.'''
+    elapsed = 0
+    try:
+        while True:
+            start = time.perf_counter_ns()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter_ns() - start
+            yield chunk
+    finally:
+        chunks.close()
+        PROFILER.record(phase, key, elapsed)
+
+async def profiled_async(chunks: AsyncIterator[bytes], phase: str, key: str) -> AsyncIterator[bytes]:
+    '''See profiled(), time spent waiting on awaits of the template counts as its own.'''
+    elapsed = 0
+    try:
+        while True:
+            start = time.perf_counter_ns()
+            try:
+                chunk = await anext(chunks)
+            except StopAsyncIteration:
+                return
+            finally:
+                elapsed += time.perf_counter_ns() - start
+            yield chunk
+    finally:
+        await chunks.aclose()
+        PROFILER.record(phase, key, elapsed)
+
+def timed(chunks: Any, phase: str, key: str, start: int) -> Iterator[bytes]:
+    '''Yield the chunks, then record the time since start, once the server is done with them.'''
+    try:
+        yield from chunks
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+        PROFILER.record(phase, key, time.perf_counter_ns() - start)
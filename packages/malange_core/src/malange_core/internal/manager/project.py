@@ -8,33 +8,90 @@ are done by the trio components: Engine, middleware, and gateway.
 
 '''
 
-import sys
+import os
+import time
 import types
+import atexit
 import logging
 import importlib
-import importlib.util
 
-from typing import Union
-from importlib.machinery import ModuleSpec
+from typing import Optional, Union
 
 from malange_core.api.log import MalangeLogger
 from malange_core.internal.engine import MalangeEngine
+from malange_core.internal.engine.render import STREAM_CHUNK
 from malange_core.internal.manager.config import (MalangePluginType,
                                                   MalangeModeType, MalangePluginConfigNull)
 from malange_core.internal.manager import MalangeManagerLogger
+from malange_core.internal.manager.plugin import MalangePlugin
+from malange_core.internal.manager.profile import PROFILER
+from malange_core.internal.manager.export import MalangeExport, MalangeExportResult
+from malange_core.internal.gateway.wsgi import MalangeWSGI
+from malange_core.internal.gateway.asgi import MalangeASGI
+from malange_core.internal.middleware import MalangeMiddleware, middlewares
 
 class MalangeProject:
     def __call__(self, conf: types.ModuleType, pwd: str):
         self.__conf   : types.ModuleType = conf            # Save the configuration module.
         self.__pwd    : str              = pwd             # Working directory.
         self.__log    : MalangeLogger    = MalangeLogger() # Register log for Malange Core first.
+        self.__profile_register()    # Profile the startup too, if enabled.
         # Register components.
-        log = self.__mode_register() # Register mode (debug / verbose / normal)
-        self.__plug_register()       # Register plugins.
-        self.__log.conf(log)         # Disable locking phase.
+        with PROFILER.span("startup", "mode"):
+            log = self.__mode_register() # Register mode (debug / verbose / normal)
+        with PROFILER.span("startup", "plugins"):
+            self.__plug_register()       # Register plugins.
+        self.__log.conf(log, self.__levels_register()) # Disable locking phase.
+        if self.__log.enabled(logging.INFO): # Startup report, once the levels are set.
+            for plugin in self.__plugin.values():
+                self.__log.info("%s", plugin.report())
         self.__role_register()       # Register roles.
         # Initialize components.
-        self.__engine: MalangeEngine = MalangeEngine(self)
+        with PROFILER.span("startup", "engine"):
+            self.__engine: MalangeEngine = MalangeEngine(self)
+
+    @property
+    def log(self) -> MalangeLogger:
+        '''The malange_mgr logger, shared with the components.'''
+        return self.__log
+    @property
+    def engine(self) -> MalangeEngine:
+        return self.__engine
+    @property
+    def middlewares(self) -> list[MalangeMiddleware]:
+        '''The middlewares of MIDDLEWARE.CHAIN, outermost first.'''
+        return self.__middlewares
+    def wsgi(self) -> MalangeWSGI:
+        '''Return the WSGI application of the project, GATEWAY.CHUNK sets the least bytes per chunk.'''
+        try:
+            return MalangeWSGI(self.__engine, getattr(self.GATEWAY, "CHUNK", STREAM_CHUNK),
+                               getattr(self.PROFILE, "ENDPOINT", None), self.__middlewares)
+        except TypeError as error:
+            self.__log.critical(str(error), TypeError)
+    def asgi(self) -> MalangeASGI:
+        '''Return the ASGI application of the project, GATEWAY.CHUNK sets the least bytes per message.'''
+        return MalangeASGI(self.__engine, getattr(self.GATEWAY, "CHUNK", STREAM_CHUNK),
+                           getattr(self.PROFILE, "ENDPOINT", None), self.__middlewares)
+
+    def export(self, output: Optional[str] = None, force: bool = False) -> MalangeExportResult:
+        '''
+            Render every template to static files, again only those whose inputs changed since the
+            last export, see malange_core.internal.manager.export. The optional EXPORT conf sets:
+            - OUTPUT      : The output directory, relative to the pwd, "dist" by default.
+            - ASSETS      : The directory of the assets, copied under hashed names, none by default.
+            - PRECOMPRESS : Write a .gz sibling of the text outputs, True by default.
+
+            parameter:
+                output str  : The output directory, in place of EXPORT.OUTPUT.
+                force  bool : Render everything.
+            return:
+                MalangeExportResult : What was rendered, skipped and removed, and the failures.
+        '''
+        conf = getattr(self.__conf, "EXPORT", None)
+        if output is None:
+            output = os.path.join(self.__pwd, getattr(conf, "OUTPUT", "dist"))
+        return MalangeExport(self, output, getattr(conf, "ASSETS", None),
+                             getattr(conf, "PRECOMPRESS", True), force).run()
 
     # Retrive configurations.
     def raw_module(self, conf: str) -> any:
@@ -47,6 +104,24 @@ class MalangeProject:
         return self.__pwd
 
     # Register methods.
+    def __profile_register(self) -> None:
+        '''
+            Retrive the optional PROFILE conf and enable the profiler, its attributes are:
+            - ENABLED  : Profile, True by default.
+            - FILE     : Write the stats there as JSON when the process exits.
+            - ENDPOINT : Path serving the stats as JSON from the gateway, e.g. "/__profile__".
+        '''
+        try:
+            self.PROFILE = self.__conf.PROFILE
+        except AttributeError:
+            self.PROFILE = None
+            return
+        if not getattr(self.PROFILE, "ENABLED", True):
+            return
+        PROFILER.enable()
+        path: str = getattr(self.PROFILE, "FILE", None)
+        if path is not None:
+            atexit.register(PROFILER.dump, os.path.join(self.__pwd, path))
     def __mode_register(self) -> int:
         '''Retrive DEBUG conf and set logging configurations.'''
         try:
@@ -65,8 +140,25 @@ class MalangeProject:
         # Set MalangeManagerLogger, that will function as the malange_mgr logger.
         MalangeManagerLogger = self.__log
         return log
+    def __levels_register(self) -> dict[str, int]:
+        '''Retrive the optional LOGS conf, the levels of components that differ from the mode.'''
+        try:
+            levels: dict[str, Union[int, str]] = self.__conf.LOGS
+        except AttributeError:
+            return {}
+        if not isinstance(levels, dict):
+            self.__log.critical("LOGS is not a dictionary.", TypeError)
+        names: dict[str, int] = logging.getLevelNamesMapping()
+        formatted: dict[str, int] = {}
+        for name, level in levels.items(): # E.g. {"malange_proj": "DEBUG", "my_plugin": logging.INFO}
+            if isinstance(level, str) and level.upper() in names:
+                level = names[level.upper()]
+            if not isinstance(level, int):
+                self.__log.critical(f"LOGS has an invalid level for {name}.", ValueError)
+            formatted[name] = level
+        return formatted
     def __plug_register(self):
-        '''Register plugins.'''
+        '''Register plugins from their config module, the packages are imported on first use.'''
         try:
             self.PLUGINS: dict[str, Union[
                 MalangePluginType.PACK,
@@ -77,40 +169,23 @@ class MalangeProject:
             self.__log.critical("PLUGINS is not defined as a config entity.")
 
         if isinstance(self.PLUGINS, dict):
-            # Variable to store the plugin modules.
-            self.__plugin      : dict[str, types.ModuleType] = {}
+            # Variable to store the plugins, the modules are loaded lazily.
+            self.__plugin      : dict[str, MalangePlugin]  = {}
             # Variable to store the plugin configurations.
-            self.__plugin_conf : dict[str, dict[str, any]]   = {}
+            self.__plugin_conf : dict[str, dict[str, any]] = {}
             for index, (key, value) in enumerate(self.PLUGINS.items()):
                 # Check the key.
                 if not isinstance(key, str):
                     self.__log.critical(f"Key of index {index} of PLUGINS is not a string.")
-                # Attempt to import (and check the value)
-                if value == MalangePluginType.PACK:
-                    try:
-                        plugin: types.ModuleType = importlib.import_module(key)
-                    except ImportError:
-                        self.__log.critical(f"Plugin index {index} is not found as a package import.")
-                elif value == MalangePluginType.PROJ:
-                    try:
-                        directory: str = f"{self.__pwd}/plugins/{value}"
-                        spec: ModuleSpec = importlib.util.spec_from_file_location("plugin", directory)
-                        plugin: types.ModuleType = importlib.util.module_from_spec(spec)
-                        sys.modules["plugin"] = plugin
-                        spec.loader.exec_module(plugin)
-                    except ImportError:
-                        self.__log.critical(f"Plugin index {index} is not found as a package import.")
-                elif value == MalangePluginType.DIRE:
-                    try:
-                        directory: str = value
-                        spec: ModuleSpec = importlib.util.spec_from_file_location("plugin", directory)
-                        plugin: types.ModuleType = importlib.util.module_from_spec(spec)
-                        sys.modules["plugin"] = plugin
-                        spec.loader.exec_module(plugin)
-                    except ImportError:
-                        self.__log.critical(f"Plugin index {index} is not found as a package import.")
-                else:
+                # Check the value.
+                if value not in (MalangePluginType.PACK, MalangePluginType.PROJ, MalangePluginType.DIRE):
                     self.__log.critical(f"Value of index {index} of PLUGINS is not valid.")
+                # Load the config of the plugin, not the plugin itself.
+                try:
+                    plugin: MalangePlugin = MalangePlugin(key, value, self.__pwd)
+                except ImportError:
+                    self.__log.critical(f"Plugin index {index} or its config is not found.")
+                start: int = time.perf_counter_ns()
                 # Get the name.
                 try:
                     name = plugin.config.NAME
@@ -122,8 +197,8 @@ class MalangeProject:
                 if name in self.__plugin:
                     self.__log.critical(f"Duplicate plugin name is detected at plugin index {index}")
                 else:
+                    plugin.name = name
                     self.__plugin[name] = plugin
-                self.__log(self.__plugin.keys()) # Configure plugin loggers.
                 # Set the plugin configuration in self.__plugin_conf with key being the plugin name
                 # and the value being a dictionary full of the list of configs the plugin requests.
                 try: # Obtain the requested config that the plugin wants, inside plugin.config.ENTITIES
@@ -133,27 +208,48 @@ class MalangeProject:
                 formatted_plugin_conf: dict[str, any] = {}
                 # Entity = config name, ent_type = the type of the value of the config entity.
                 for i, (entity, ent_type) in enumerate(plugin_conf_req.items()):
-                    if isinstance(entity, str): # Entity must be a str.
-                        self.CRITICAL(f"Plugin {name} has config index {i} with non-str key.")
+                    if not isinstance(entity, str): # Entity must be a str.
+                        self.__log.critical(f"Plugin {name} has config index {i} with non-str key.")
                     if entity[-1] == "*": # This indicates the config is totally optional.
+                        entity = entity[:-1]
                         try: # Check if the config exists.
-                            value: any = getattr(self.__conf, name)[entity[:-1]]
-                        except AttributeError or KeyError:
+                            value: any = getattr(self.__conf, name)[entity]
+                        except (AttributeError, KeyError):
                             value: MalangePluginConfigNull = MalangePluginConfigNull
                     else: # The config is not optional.
                         try: # Check if the config exists.
                             value: any = getattr(self.__conf, name)[entity]
                         except AttributeError:
-                            self.CRITICAL(f"Plugin {name} has its config class undefined.")
+                            self.__log.critical(f"Plugin {name} has its config class undefined.")
                         except KeyError:
-                            self.CRITICAL(f"Plugin {name} has config {entity} which is not defined.")                            
-                    if isinstance(value, ent_type): # Check the config value.
+                            self.__log.critical(f"Plugin {name} has config {entity} which is not defined.")
+                    if value is MalangePluginConfigNull or isinstance(value, ent_type): # Check the value.
                         formatted_plugin_conf[entity] = value
                     else:
-                        self.CRITICAL(f"Plugin {name} has config {entity} whose value is invalid.")
+                        self.__log.critical(f"Plugin {name} has config {entity} whose value is invalid.")
                 self.__plugin_conf[name] = formatted_plugin_conf # Add it up to the self.__plugin_conf
+                plugin.validate_ns = time.perf_counter_ns() - start
+                if PROFILER.enabled:
+                    PROFILER.record("plugin", f"{name}.config", plugin.config_ns)
+                    PROFILER.record("plugin", f"{name}.validate", plugin.validate_ns)
+            self.__log.plugin(list(self.__plugin.keys())) # Configure plugin loggers.
         else:
             self.__log.critical("PLUGINS is not a dictionary.")
+    def plugin(self, name: str) -> MalangePlugin:
+        '''Return a registered plugin, its package is imported the first time it is used.'''
+        try:
+            return self.__plugin[name]
+        except KeyError:
+            self.__log.critical(f"Plugin {name} is not registered.", KeyError)
+    def plugin_conf(self, name: str) -> dict[str, any]:
+        '''Return the config entities requested by a plugin.'''
+        return self.__plugin_conf[name]
+    def plugin_names(self) -> list[str]:
+        '''Return the names of the registered plugins, in the order of PLUGINS.'''
+        return list(self.__plugin)
+    def plugin_report(self) -> list[str]:
+        '''Return the timing report of every plugin, import is "deferred" until first use.'''
+        return [plugin.report() for plugin in self.__plugin.values()]
     def __role_register(self):
         '''Register the three important configs for role of plugins: GATEWAY, MIDDLE, and ENGINE.'''
         try:
@@ -164,6 +260,10 @@ class MalangeProject:
             self.MIDDLEWARE = self.__conf.MIDDLEWARE
         except AttributeError:
             self.__log.critical("MIDDLEWARE is not defined as a config entity.")
+        try:
+            self.__middlewares: list[MalangeMiddleware] = middlewares(getattr(self.MIDDLEWARE, "CHAIN", ()))
+        except TypeError as error:
+            self.__log.critical(str(error), TypeError)
         try:
             self.ENGINE = self.__conf.ENGINE
         except AttributeError:
@@ -1,2 +1,183 @@
-def hello() -> str:
-    return "Hello from malange-core!"
+'''
+
+malange_core.internal.middleware
+
+This contains the middleware pipeline, which runs between a gateway and
+the engine for every page that is served. A middleware subclasses
+MalangeMiddleware and defines either hook, plain or async:
+- request(context)           : Before the page renders. Names set in the context are given to
+                               the template. Returning a MalangeResponse short-circuits: inner
+                               middlewares and the page are skipped, e.g. a cache hit or a 401.
+- response(context, response) : After, in reverse order, returns the response (or another one).
+
+MIDDLEWARE.CHAIN lists them, outermost first, as classes (instantiated once)
+or instances. A gateway composes the chain once when it is created: every
+hook is bound into a closure calling the next one, so a request costs one
+call per hook defined and nothing for hooks left out. The WSGI gateway
+only takes plain hooks, the ASGI one takes both.
+
+A second chain timing every hook (phase "middleware" of the profiler) is
+composed next to it, and used while profiling is enabled.
+
+'''
+
+import time
+import inspect
+
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable, Optional, Union
+
+from malange_core.internal.manager.profile import PROFILER
+
+PAGE = "__malange_page__" # Context key of the template being served, set by the gateway.
+
+class MalangeResponse:
+    '''What a middleware, or the page, answers.'''
+    __slots__ = ("body", "status", "headers")
+    def __init__(self, body: Union[bytes, Iterable[bytes], AsyncIterable[bytes]] = b"", status: int = 200,
+                 headers: Optional[list[tuple[str, str]]] = None):
+        '''
+            parameter:
+                body    bytes | Iterable | AsyncIterable : The body, streamed if not bytes.
+                status  int                              : The HTTP status.
+                headers list                             : (name, value) pairs, HTML if None.
+        '''
+        self.body    = body
+        self.status  = status
+        self.headers = [("Content-Type", "text/html; charset=utf-8")] if headers is None else headers
+
+class MalangeMiddleware:
+    '''Base class of the middlewares, the hooks that are not overridden are not called.'''
+    def request(self, context: dict[str, Any]) -> Optional[MalangeResponse]:
+        return None
+    def response(self, context: dict[str, Any], response: MalangeResponse) -> MalangeResponse:
+        return response
+
+Handler      = Callable[[dict[str, Any]], MalangeResponse]
+AsyncHandler = Callable[[dict[str, Any]], Awaitable[MalangeResponse]]
+
+def middlewares(chain: Iterable[Any]) -> list[MalangeMiddleware]:
+    '''
+        Instantiate the classes of MIDDLEWARE.CHAIN, instances are kept as they are.
+
+        raise:
+            TypeError : An entry is not a MalangeMiddleware.
+    '''
+    found = []
+    for index, entry in enumerate(chain):
+        if isinstance(entry, type) and issubclass(entry, MalangeMiddleware):
+            entry = entry()
+        if not isinstance(entry, MalangeMiddleware):
+            raise TypeError(f"Entry {index} of MIDDLEWARE.CHAIN is not a MalangeMiddleware.")
+        found.append(entry)
+    return found
+
+def hooks(middleware: MalangeMiddleware) -> tuple[Optional[Callable], Optional[Callable]]:
+    '''Return the bound request and response hooks, None for those not overridden.'''
+    kind = type(middleware)
+    return (middleware.request  if kind.request  is not MalangeMiddleware.request  else None,
+            middleware.response if kind.response is not MalangeMiddleware.response else None)
+
+def timer(hook: Callable, key: str) -> Callable:
+    '''Wrap a plain hook so its time is recorded.'''
+    def timed(*args: Any) -> Any:
+        start = time.perf_counter_ns()
+        try:
+            return hook(*args)
+        finally:
+            PROFILER.record("middleware", key, time.perf_counter_ns() - start)
+    return timed
+
+def timer_async(hook: Callable, key: str) -> Callable:
+    '''Wrap an async hook so its time (awaits included) is recorded.'''
+    async def timed(*args: Any) -> Any:
+        start = time.perf_counter_ns()
+        try:
+            return await hook(*args)
+        finally:
+            PROFILER.record("middleware", key, time.perf_counter_ns() - start)
+    return timed
+
+def layer(before: Optional[Callable], after: Optional[Callable], inner: Handler) -> Handler:
+    '''Return the handler running the hooks of one middleware around inner.'''
+    if before is not None and after is not None:
+        def handler(context: dict[str, Any]) -> MalangeResponse:
+            response = before(context)
+            return after(context, inner(context) if response is None else response)
+    elif before is not None:
+        def handler(context: dict[str, Any]) -> MalangeResponse:
+            response = before(context)
+            return inner(context) if response is None else response
+    elif after is not None:
+        def handler(context: dict[str, Any]) -> MalangeResponse:
+            return after(context, inner(context))
+    else:
+        return inner
+    return handler
+
+def layer_async(before: Optional[Callable], after: Optional[Callable], inner: AsyncHandler) -> AsyncHandler:
+    '''See layer(), a closure is made for each mix of plain and async hooks so none is checked per request.'''
+    wait_before = before is not None and inspect.iscoroutinefunction(before)
+    wait_after  = after  is not None and inspect.iscoroutinefunction(after)
+    if before is None and after is None:
+        return inner
+    if after is None:
+        if wait_before:
+            async def handler(context: dict[str, Any]) -> MalangeResponse:
+                response = await before(context)
+                return await inner(context) if response is None else response
+        else:
+            async def handler(context: dict[str, Any]) -> MalangeResponse:
+                response = before(context)
+                return await inner(context) if response is None else response
+    elif before is None:
+        if wait_after:
+            async def handler(context: dict[str, Any]) -> MalangeResponse:
+                return await after(context, await inner(context))
+        else:
+            async def handler(context: dict[str, Any]) -> MalangeResponse:
+                return after(context, await inner(context))
+    else:
+        async def handler(context: dict[str, Any]) -> MalangeResponse:
+            response = await before(context) if wait_before else before(context)
+            if response is None:
+                response = await inner(context)
+            return await after(context, response) if wait_after else after(context, response)
+    return handler
+
+def compose(chain: list[MalangeMiddleware], endpoint: Handler, timed: bool = False) -> Handler:
+    '''
+        Compose the chain around the endpoint, for the WSGI gateway.
+
+        parameter:
+            chain    list     : The middlewares, outermost first.
+            endpoint Callable : Renders the page, called with the context.
+            timed    bool     : Record the time of every hook in the profiler.
+        raise:
+            TypeError : A hook is async.
+    '''
+    handler = endpoint
+    for middleware in reversed(chain):
+        before, after = hooks(middleware)
+        name = type(middleware).__name__
+        for hook in (before, after):
+            if hook is not None and inspect.iscoroutinefunction(hook):
+                raise TypeError(f"{name} has an async hook, the WSGI gateway only takes plain ones.")
+        if timed:
+            before = before and timer(before, f"{name}.request")
+            after  = after  and timer(after,  f"{name}.response")
+        handler = layer(before, after, handler)
+    return handler
+
+def compose_async(chain: list[MalangeMiddleware], endpoint: AsyncHandler, timed: bool = False) -> AsyncHandler:
+    '''Compose the chain around the async endpoint, for the ASGI gateway, see compose().'''
+    handler = endpoint
+    for middleware in reversed(chain):
+        before, after = hooks(middleware)
+        name = type(middleware).__name__
+        if timed:
+            before = before and (timer_async if inspect.iscoroutinefunction(before) else timer)(
+                before, f"{name}.request")
+            after  = after  and (timer_async if inspect.iscoroutinefunction(after) else timer)(
+                after, f"{name}.response")
+        handler = layer_async(before, after, handler)
+    return handler
@@ -0,0 +1,25 @@
+import logging
+
+import pytest
+
+from malange_core.internal.engine import MalangeEngine
+
+class Project:
+    '''The parts of MalangeProject an engine uses, for a project of a few templates.'''
+    class ENGINE:
+        EXECUTIVES    = {}
+        BUILD_WORKERS = 1
+    def __init__(self, pwd: str):
+        self.pwd = pwd
+        self.log = logging.getLogger("malange_test")
+    def retrive_pwd(self) -> str:
+        return self.pwd
+
+@pytest.fixture
+def project(tmp_path):
+    '''Write templates, by name, then return an engine holding them.'''
+    def make(**templates: str) -> MalangeEngine:
+        for name, source in templates.items():
+            (tmp_path / f"{name}.mala").write_text(source)
+        return MalangeEngine(Project(str(tmp_path)))
+    return make
@@ -0,0 +1,45 @@
+import time
+import asyncio
+
+from malange_core.internal.engine.compiler import compile_template
+from malange_core.internal.engine.render import stream_async
+from malange_core.internal.gateway.asgi import MalangeASGI
+
+SLOW = '''[script/]
+import asyncio
+async def slow(value):
+    await asyncio.sleep(0.1)
+    return value
+[/script]'''
+
+async def rendered(template, context=None) -> bytes:
+    return b"".join([chunk async for chunk in stream_async(template, context)])
+
+async def served(app, path: str) -> tuple[int, bytes]:
+    messages = []
+    async def receive():
+        return {"type": "http.request"}
+    async def send(message):
+        messages.append(message)
+    await app({"type": "http", "path": path, "method": "GET"}, receive, send)
+    return messages[0]["status"], b"".join(message.get("body", b"") for message in messages[1:])
+
+def test_await_in_injection():
+    template = compile_template(SLOW + "<p>${await slow('<a>')}</p>", "page.mala")
+    assert template.program is None # Only renders async.
+    assert asyncio.run(rendered(template)) == b"<p>&lt;a&gt;</p>"
+
+def test_await_in_for_body_and_header():
+    template = compile_template(SLOW + "[for x in await slow([1, 2])/]<i>${await slow(x)}</i>[/for]", "page.mala")
+    assert asyncio.run(rendered(template)) == b"<i>1</i><i>2</i>"
+
+def test_awaitables_of_a_chunk_run_together():
+    template = compile_template(SLOW + "${slow(1)}${slow(2)}${slow(3)}${slow(4)}", "page.mala")
+    start = time.perf_counter()
+    assert asyncio.run(rendered(template)) == b"1234"
+    assert time.perf_counter() - start < 0.3
+
+def test_await_through_asgi(project):
+    app = MalangeASGI(project(index=SLOW + "<p>${await slow('<b>')}</p>"))
+    assert asyncio.run(served(app, "/")) == (200, b"<p>&lt;b&gt;</p>")
+    assert asyncio.run(served(app, "/missing"))[0] == 404
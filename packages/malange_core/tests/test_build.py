@@ -0,0 +1,49 @@
+import sys
+
+from concurrent.futures.process import BrokenProcessPool
+
+from malange_core.internal.engine.build import build
+from malange_core.internal.engine.cache import MalangeCache, engine_key
+from malange_core.internal.engine.render import render_bytes
+
+def written(tmp_path, count: int) -> list[str]:
+    paths = []
+    for index in range(count):
+        (tmp_path / f"{index}.mala").write_text(f"<p>${{{index} * 2}}</p>")
+        paths.append(str(tmp_path / f"{index}.mala"))
+    return paths
+
+def test_pool_build(tmp_path):
+    paths  = written(tmp_path, 4)
+    result = build(paths, MalangeCache(engine_key()), workers=2)
+    assert (result.compiled, result.failures) == (4, {})
+    assert render_bytes(result.templates[paths[3]]) == b"<p>6</p>"
+
+def test_broken_pool_falls_back_to_compiling_in_place(tmp_path, monkeypatch):
+    class Pool:
+        def __init__(self, **_):
+            pass
+        def __enter__(self):
+            return self
+        def __exit__(self, *_):
+            return False
+        def map(self, function, paths, *arguments, chunksize):
+            yield function(paths[0], *(argument[0] for argument in arguments))
+            raise BrokenProcessPool("A worker died.")
+    monkeypatch.setattr(sys.modules[build.__module__], "ProcessPoolExecutor", Pool)
+    paths  = written(tmp_path, 3)
+    result = build(paths, MalangeCache(engine_key()), workers=3)
+    assert (result.compiled, result.failures) == (3, {})
+    assert sorted(result.templates) == sorted(paths)
+
+def test_any_error_fails_only_its_template(tmp_path, monkeypatch):
+    paths = written(tmp_path, 2)
+    get   = MalangeCache.get
+    def failing(self, path):
+        if path == paths[0]:
+            raise RuntimeError("executive failed")
+        return get(self, path)
+    monkeypatch.setattr(MalangeCache, "get", failing)
+    result = build(paths, MalangeCache(engine_key()), workers=1)
+    assert result.failures == {paths[0]: "RuntimeError: executive failed"}
+    assert list(result.templates) == [paths[1]]
@@ -0,0 +1,25 @@
+import pytest
+
+from malange_core.internal.engine import cache
+from malange_core.internal.engine.cache import MalangeCache, engine_key
+from malange_core.internal.engine.compiler import compile_template
+from malange_core.internal.engine.render import render_bytes
+
+SOURCE = '''[script/]
+names = ["Ünïcode", "日本", "x"]
+[/script]<h1 title="${'é' * 2}">Ça — ${names[0]}</h1>
+[for name in names/]<li>${name} ✓</li>[/for]<style>p::before { content: "→"; }</style>'''
+
+@pytest.mark.parametrize("size", [0, 1 << 30], ids=["mapped", "read"])
+def test_large_files_are_lexed_from_a_mapping(tmp_path, monkeypatch, size):
+    monkeypatch.setattr(cache, "STREAM_SIZE", size)
+    path = tmp_path / "page.mala"
+    path.write_text(SOURCE, encoding="utf-8")
+    store    = MalangeCache(engine_key())
+    template = store.get(str(path))
+    expected = compile_template(SOURCE, str(path))
+    assert list(template.tree.starts) == list(expected.tree.starts) # Char offsets, not bytes.
+    assert list(template.tree.heads) == list(expected.tree.heads)
+    assert render_bytes(template) == render_bytes(expected)
+    assert store.get(str(path)).digest == template.digest
+    assert (store.hits, store.misses) == (1, 1)
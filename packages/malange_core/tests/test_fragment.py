@@ -0,0 +1,34 @@
+import pytest
+
+from malange_core.internal.engine.cache import MalangeCache, engine_key
+from malange_core.internal.engine.fragment import DiskFragments, MalangeFragments, MemoryFragments
+from malange_core.internal.engine.render import render_bytes
+
+@pytest.fixture(params=["memory", "disk"])
+def fragments(request, tmp_path):
+    if request.param == "memory":
+        return MemoryFragments()
+    return DiskFragments(str(tmp_path / "fragments"))
+
+def test_edited_template_misses_its_fragments(tmp_path, fragments):
+    source = tmp_path / "page.mala"
+    cache  = MalangeCache(engine_key())
+    source.write_text("[cache/]<nav>old</nav>[/cache]")
+    assert render_bytes(cache.get(str(source)), None, fragments) == b"<nav>old</nav>"
+    assert render_bytes(cache.get(str(source)), None, fragments) == b"<nav>old</nav>"
+    assert fragments.stats()["hits"] == 1
+    source.write_text("[cache/]<nav>new</nav>[/cache]")
+    assert render_bytes(cache.get(str(source)), None, fragments) == b"<nav>new</nav>"
+    assert fragments.stats()["misses"] == 2
+
+def test_backends_implement_the_interface():
+    with pytest.raises(TypeError):
+        MalangeFragments()
+
+@pytest.mark.parametrize("key", [1.5, b"x", ("page.mala", object()), frozenset({1})])
+def test_disk_rejects_keys_without_a_stable_repr(tmp_path, key):
+    fragments = DiskFragments(str(tmp_path))
+    with pytest.raises(TypeError):
+        fragments.get(key)
+    fragments.set(("page.mala", "digest", 1, ("user", 7, None)), b"x")
+    assert fragments.get(("page.mala", "digest", 1, ("user", 7, None))) == b"x"
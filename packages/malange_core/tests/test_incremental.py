@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from malange_core.internal.engine.lexer.incremental import LexerIncremental, difference
+from malange_core.internal.engine.lexer.main import LexerMain
+from malange_core.internal.engine.lexer.processor import LexerHeader
+
+PIECES = ["<p>", "${a}", "@{b}", "[if x/]", "[/if]", "[script/]x = '[/script]'\n[/script]", "<style>a{}</style>",
+          "<script>var a = '${x}';</script>", "<!-- [c] -->", "'", '"', "{", "}", "[", "]", "/]", "\\[",
+          "text ", "${'}'}", "[for x in y key=x/]", "[/for]", '<b title="${t}">']
+
+def lexed(buffer) -> list[tuple]:
+    return list(zip(buffer.kinds, buffer.starts, buffer.ends, buffer.modes))
+
+def full(text: str) -> list[tuple]:
+    return lexed(LexerMain(LexerHeader(text, "page.mala", "")).process())
+
+@pytest.mark.parametrize("old, new", [
+    ("<p>${a}</p>", "<p>${a + '}'}</p>"),                      # A string in code hides a closer.
+    ("<p>x</p>[if a/]y[/if]", "<p>x</p>[script/]\n[if a/]y[/if]"), # Into a script block and out at its end.
+    ("[script/]\nx = 1\n[/script]<p>${x}</p>", "[script/]\nx = 1\n<p>${x}</p>"), # Its end removed.
+    ("<style>a{}</style>${x}", "<style>a{} /* ${x} */${x}"),   # Raw text left open.
+    ("<!-- a -->${x}", "<!-- a ${x}"),                         # A comment left open.
+    ("${a}" * 50, "${a}" * 25 + "${" + "${a}" * 25),           # An unclosed special swallows the rest.
+])
+def test_edit_across_modes_matches_a_full_lex(old, new):
+    lexer = LexerIncremental(LexerMain(LexerHeader(old, "page.mala", "")))
+    lexer.edit(*difference(old, new))
+    assert lexer.text == new
+    assert lexed(lexer.buffer()) == full(new)
+    lexer.edit(*difference(new, old))
+    assert lexed(lexer.buffer()) == full(old)
+
+def test_random_edits_match_a_full_lex():
+    generator = random.Random(4)
+    for _ in range(200):
+        text  = "".join(generator.choice(PIECES) for _ in range(40))
+        lexer = LexerIncremental(LexerMain(LexerHeader(text, "page.mala", "")))
+        for _ in range(5):
+            start = generator.randint(0, len(text))
+            end   = generator.randint(start, min(len(text), start + 10))
+            text  = text[:start] + "".join(generator.choice(PIECES) for _ in range(generator.randint(0, 3))) + text[end:]
+            lexer.edit(*difference(lexer.text, text))
+            assert lexed(lexer.buffer()) == full(text)
+
+def test_difference():
+    assert difference("abcdef", "abXYef") == (2, 4, "XY")
+    assert difference("aaaa", "aaaaa") == (4, 4, "a")
+    assert difference("abc", "") == (0, 3, "")
+
+def test_engine_reload(project, tmp_path):
+    engine = project(index="<p>${1 + 1}</p>")
+    assert engine.reload("index.mala") is engine.template("index.mala") # Not changed.
+    (tmp_path / "index.mala").write_text("<p>${1 + 2}</p>[if True/]!")
+    with pytest.raises(SyntaxError):
+        engine.reload("index.mala")
+    assert engine.render("index.mala") == b"<p>2</p>" # The last valid one is kept.
+    (tmp_path / "index.mala").write_text("<p>${1 + 2}</p>[if True/]![/if]")
+    engine.reload("index.mala")
+    assert engine.render("index.mala") == b"<p>3</p>!"
+    assert lexed(engine.lexers["index.mala"].buffer()) == full("<p>${1 + 2}</p>[if True/]![/if]")
@@ -0,0 +1,63 @@
+from malange_core.api.engine import batch, react
+from malange_core.internal.engine.compiler import compile_template
+from malange_core.internal.engine.render import live, render_bytes
+
+def opened(source: str, **context):
+    page, operations = live(compile_template(source, "page.mala", live=True), context), []
+    page.subscribe(operations.append)
+    return page, operations
+
+def test_counter_patches_its_region_only():
+    count = react(0)
+    page, operations = opened("<h1>Title</h1><button>${count}</button><p>${label}</p>", count=count, label="x")
+    assert page.output == b"<h1>Title</h1><button><!--malange:1-->0<!--/malange:1--></button><p><!--malange:2-->x<!--/malange:2--></p>"
+    count.value += 1
+    assert operations == [("region", 1, b"1")]
+
+def test_block_region_reruns_and_disposes_its_children():
+    count = react(1)
+    page, operations = opened("[if count.value > 1/]<b>${count}</b>[/else/]small[/if]", count=count)
+    assert page.output == b"<!--malange:2-->small<!--/malange:2-->"
+    count.value = 2
+    assert operations == [("region", 2, b"<b><!--malange:3-->2<!--/malange:3--></b>")]
+    count.value = 3
+    assert operations[1:] == [("region", 3, b"3")] # The [if/] read the same, only the injection reruns.
+    count.value = 0
+    count.value = 5
+    assert operations[2:] == [("region", 2, b"small"), ("region", 2, b"<b><!--malange:3-->5<!--/malange:3--></b>")]
+    assert sorted(page.regions) == [0, 2, 3]
+
+def test_batch_flushes_once_and_dispose_stops_patches():
+    first, second = react("a"), react("b")
+    page, operations = opened("${first}${second}[for x in [first.value, second.value]/]${x}[/for]",
+                              first=first, second=second)
+    with batch():
+        first.value, second.value = "c", "d"
+    assert sorted(operations) == [("region", 1, b"c"), ("region", 2, b"d"), ("region", 4, b"cd")]
+    page.dispose()
+    first.value = "e"
+    assert len(operations) == 3
+
+def test_keyed_list_and_action_patches():
+    rows, count = react([{"id": 1}]), react(0)
+    page, operations = opened('<ol>[for row in rows key=row["id"]/]<li>${row["id"]}</li>[/for]</ol>'
+                              '<button @{count.value}>+</button>', rows=rows, count=count)
+    assert b' data-malange-action="3"' in page.output
+    rows.value = [{"id": 2}, {"id": 1}]
+    count.value = 1
+    assert operations == [("list", 1, [("insert", 2, 1, b"<li>2</li>")]), ("action", 3, 1)]
+
+def test_no_region_where_a_marker_would_show():
+    source = "<title>${name}</title><a href=${name} title='${name}'>x</a>"
+    page, _ = opened(source, name="n")
+    assert page.output == render_bytes(compile_template(source, "page.mala"), {"name": "n"})
+
+def test_engine_live(project):
+    count  = react(0)
+    engine = project(index="<p>${count}</p>")
+    page   = engine.live("index.mala", {"count": count})
+    operations = []
+    page.subscribe(operations.append)
+    count.value = 1
+    assert operations == [("region", 1, b"1")]
+    assert engine.render("index.mala", {"count": 2}) == b"<p>2</p>"
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from malange_core.api.engine import Markup, escape
+from malange_core.internal.engine.compiler import compile_template
+from malange_core.internal.engine.render import render_bytes, stream_async
+
+# Text, a quoted attribute, a single quoted one, an unquoted one, and a batched [for/] row.
+PAGE = '''<p title="${V}" data-x='${V}' class=${V}>${V}</p>[for i in [0]/]<li title="${V}">${V}</li>[/for]'''
+
+SAME = '''[script/]
+async def same(value):
+    return value
+[/script]'''
+
+def rendered(value, awaiting: bool) -> bytes:
+    if not awaiting:
+        return render_bytes(compile_template(PAGE.replace("${V}", "${v}"), "page.mala"), {"v": value})
+    async def run() -> bytes:
+        template = compile_template(SAME + PAGE.replace("${V}", "${await same(v)}"), "page.mala")
+        return b"".join([chunk async for chunk in stream_async(template, {"v": value})])
+    return asyncio.run(run())
+
+def page(text: bytes, quoted: bytes, unquoted: bytes) -> bytes:
+    return (b'<p title="%s" data-x=\'%s\' class=%s>%s</p><li title="%s">%s</li>'
+            % (quoted, quoted, unquoted, text, quoted, text))
+
+@pytest.mark.parametrize("awaiting", [False, True], ids=["sync", "async"])
+@pytest.mark.parametrize("value, expected", [
+    ('<a href="x">&\'', page(b'&lt;a href="x"&gt;&amp;\'', b"&lt;a href=&#34;x&#34;&gt;&amp;&#39;",
+                            b"&lt;a&#32;href&#61;&#34;x&#34;&gt;&amp;&#39;")),
+    (b'<b>&"', page(b'&lt;b&gt;&amp;"', b"&lt;b&gt;&amp;&#34;", b"&lt;b&gt;&amp;&#34;")), # Like str.
+    ("a b=c`", page(b"a b=c`", b"a b=c`", b"a&#32;b&#61;c&#96;")), # Would split an unquoted value.
+    (Markup("<i>ok</i>"), page(b"<i>ok</i>", b"<i>ok</i>", b"<i>ok</i>")), # As it is.
+    (escape("<"), page(b"&lt;", b"&lt;", b"&lt;")), # Not escaped twice.
+    (3, page(b"3", b"3", b"3")),
+    (None, page(b"", b"", b"")),
+])
+def test_injections_are_escaped_for_their_context(value, expected, awaiting):
+    assert rendered(value, awaiting) == expected
+
+def test_escape():
+    assert escape('<"&\'>') == Markup("&lt;&#34;&amp;&#39;&gt;")
+    assert escape(Markup("<b>")) == Markup("<b>")
+    assert Markup("<b>%s</b>") % "<" == Markup("<b>&lt;</b>")
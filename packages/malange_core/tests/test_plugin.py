@@ -0,0 +1,14 @@
+import sys
+
+from malange_core.internal.manager.config import MalangePluginType
+from malange_core.internal.manager.plugin import MalangePlugin
+
+def test_direct_plugins_with_the_same_basename_keep_their_own_config(tmp_path):
+    plugins = []
+    for side in ("one", "two"):
+        directory = tmp_path / side / "auth"
+        directory.mkdir(parents=True)
+        (directory / "config.py").write_text(f"NAME = 'auth_{side}'\n")
+        plugins.append(MalangePlugin(str(directory), MalangePluginType.DIRE, str(tmp_path)))
+    assert [plugin.config.NAME for plugin in plugins] == ["auth_one", "auth_two"]
+    assert [sys.modules[plugin.config.__name__] for plugin in plugins] == [plugin.config for plugin in plugins]
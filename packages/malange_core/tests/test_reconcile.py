@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from malange_core.api.engine import batch, effect, react
+from malange_core.internal.engine.reconcile import MalangeKeyedList, increasing, reconcile
+
+def applied(old: list, operations: list[tuple]) -> list:
+    '''Apply the operations the way a client would: removes first, then the rest in order.'''
+    keys = [key for key in old if ("remove", key) not in operations]
+    for operation in operations:
+        if operation[0] in ("insert", "move"):
+            if operation[0] == "move":
+                keys.remove(operation[1])
+            keys.insert(len(keys) if operation[2] is None else keys.index(operation[2]), operation[1])
+    return keys
+
+def keyed(rows) -> MalangeKeyedList:
+    return MalangeKeyedList(lambda: rows, lambda row: row["id"], lambda row: iter([f"<{row['id']}:{row['v']}>".encode()]))
+
+def test_increasing():
+    found = increasing([3, 0, -1, 1, 5, 2, 4])
+    assert sorted(found) == [1, 3, 5, 6] # 0, 1, 2, 4.
+    assert increasing([]) == set()
+    assert increasing([-1, -1]) == set()
+
+@pytest.mark.parametrize("old, new, expected", [
+    ([1, 2, 3], [1, 2, 3], []),
+    ([1, 2, 3, 4, 5], [1, 3, 2, 4, 5], [("move", 3, 2)]), # One move, the rest stays.
+    ([1, 2, 3], [3, 1, 2], [("move", 3, 1)]),
+    ([1, 2, 3], [1, 4, 3], [("remove", 2), ("insert", 4, 3)]),
+    ([], [1, 2], [("insert", 2, None), ("insert", 1, 2)]),
+])
+def test_reconcile(old, new, expected):
+    assert reconcile(old, new) == expected
+    assert applied(old, expected) == new
+
+def test_reconcile_random():
+    generator = random.Random(13)
+    for _ in range(2000):
+        old = generator.sample(range(30), generator.randint(0, 20))
+        new = generator.sample(range(30), generator.randint(0, 20))
+        if generator.random() < 0.5: # Mostly the same keys, reordered.
+            new = old[:]
+            generator.shuffle(new)
+        operations = reconcile(old, new)
+        assert applied(old, operations) == new
+        assert sum(operation[0] == "move" for operation in operations) <= len(new) - len(increasing(
+            [old.index(key) if key in old else -1 for key in new]))
+
+def test_reconcile_duplicate():
+    with pytest.raises(ValueError):
+        reconcile([1], [2, 2])
+
+def test_kept_key_with_a_changed_element_is_updated():
+    rows = react([{"id": 1, "v": "a"}, {"id": 2, "v": "b"}])
+    view = keyed(rows)
+    got  = []
+    view.subscribe(got.append)
+    rows.value = [{"id": 2, "v": "B"}, {"id": 1, "v": "a"}] # Moved and changed.
+    assert got == [[("move", 2, 1), ("update", 2, b"<2:B>")]]
+    rows.value = [{"id": 2, "v": "B"}, {"id": 1, "v": "a"}] # Equal, nothing to do.
+    rows.value = [{"id": 2, "v": "B"}, {"id": 1, "v": "z"}]
+    assert got[1:] == [[("update", 1, b"<1:z>")]]
+    assert b"".join(view) == b"<2:B><1:z>"
+
+def test_duplicate_key_does_not_abort_the_flush():
+    rows, other = react([{"id": 1, "v": "a"}]), react(0)
+    view, seen = keyed(rows), []
+    effect(lambda: other.value, seen.append)
+    with pytest.raises(ExceptionGroup) as error:
+        with batch():
+            rows.value = [{"id": 2, "v": "b"}, {"id": 2, "v": "c"}]
+            other.value = 1
+    assert isinstance(error.value.exceptions[0], ValueError)
+    assert seen == [1] # Still ran.
+    assert b"".join(view) == b"<1:a>" # Kept as it was.
+    rows.value = [{"id": 1, "v": "a"}, {"id": 3, "v": "c"}]
+    assert b"".join(view) == b"<1:a><3:c>"
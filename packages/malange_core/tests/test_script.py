@@ -0,0 +1,36 @@
+import os
+
+from malange_core.internal.engine import script
+from malange_core.internal.engine.compiler import compile_template
+from malange_core.internal.engine.render import live, render_bytes
+
+RANDOM = "[script/]\nimport random\ntoken = str(random.random())\n[/script]${token}"
+
+def test_a_context_free_script_runs_once_into_a_snapshot():
+    template = compile_template(RANDOM + "${globals().update(token='changed')}", "page.mala")
+    first = render_bytes(template)
+    assert render_bytes(template) == first
+    assert render_bytes(template, {"token": "context"}) == first # The script defines it after the context.
+    assert template.runtime["script"].static
+    assert template.runtime["script"].names()["token"].encode() == first # Not changed by a render.
+    assert live(compile_template(RANDOM, "page.mala", live=True)).output != first # Runs again.
+
+def test_a_script_reading_the_context_runs_per_render():
+    template = compile_template("[script/]\nshout = name.upper()\n[/script]${shout}", "page.mala")
+    assert render_bytes(template, {"name": "a"}) == b"A"
+    assert render_bytes(template, {"name": "b"}) == b"B"
+    assert not template.runtime["script"].static
+
+def test_a_script_writing_globals_starts_fresh_every_render():
+    template = compile_template("[script/]\nn = 0\ndef bump():\n    global n\n    n += 1\n[/script]"
+                                "${bump() or n}${bump() or n}", "page.mala")
+    assert render_bytes(template) == render_bytes(template) == b"12"
+
+def test_script_file_is_compiled_again_when_it_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(script, "SOURCE_CHECK", 0.0)
+    (tmp_path / "source.py").write_text("value = 'old'\n")
+    (tmp_path / "page.mala").write_text('[/script src="./source.py"/]${value}')
+    template = compile_template((tmp_path / "page.mala").read_text(), str(tmp_path / "page.mala"))
+    assert render_bytes(template) == b"old"
+    (tmp_path / "source.py").write_text("value = 'newer'\n") # Another size, if the mtime is the same.
+    assert render_bytes(template) == b"newer"
@@ -0,0 +1,7 @@
+'''
+
+malange_web.api
+
+The public API of the web components, see its modules.
+
+'''
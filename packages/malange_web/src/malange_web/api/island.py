@@ -0,0 +1,28 @@
+'''
+
+    malange_web.api.island
+
+    Provides the islands output mode, a page rendered as static HTML with
+    the client runtime and state only sent for its reactive parts.
+
+    - island_page(path, executives) : Compile a .mala file for the islands output mode.
+    - MalangeIslandPage             : The compiled page, render(context) returns (bytes, MalangePayload).
+    - MalangePayload                : The size of a render: html, state, runtime, islands and total.
+
+    How islands are found is described in malange_web.internal.island.
+
+'''
+
+from typing import Optional
+
+from malange_core.internal.engine.executive import ExecutiveTable
+from malange_core.internal.engine.cache import source_digest
+from malange_web.internal.island import MalangeIsland, MalangeIslandPage, MalangePayload
+
+__all__ = ["island_page", "MalangeIsland", "MalangeIslandPage", "MalangePayload"]
+
+def island_page(path: str, executives: Optional[ExecutiveTable] = None) -> MalangeIslandPage:
+    '''Read and compile a .mala file for the islands output mode, see MalangeIslandPage.'''
+    with open(path, "rb") as file:
+        raw = file.read()
+    return MalangeIslandPage(raw.decode("utf-8"), path, source_digest(raw), executives)
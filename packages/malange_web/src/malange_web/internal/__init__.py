@@ -0,0 +1,8 @@
+'''
+
+malange_web.internal
+
+This contains the machinery behind the web components.
+- The islands output mode: static HTML, with client state only for the reactive parts.
+
+'''
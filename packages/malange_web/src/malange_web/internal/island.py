@@ -0,0 +1,310 @@
+'''
+    malange_web.internal.island
+
+    The islands output mode: a page is rendered as static HTML, and only
+    the parts of it that are reactive ("islands") are handed to the client,
+    with the state they start from.
+
+    The reactive names of a template are those its script assigns from
+    react() or computed() (e.g. count = react(0)), found in the source of
+    the [script/] block or of the [/script src=.../] file. A trigger is then
+    - an @{ ... } action,
+    - a ${ ... } injection reading a reactive name,
+    - a block whose arguments (or those of one of its branches) read one.
+    The island of a trigger is the innermost HTML element holding it. A
+    trigger outside any element (or right under <html>, <head> or <body>)
+    is wrapped in a <malange-island> element instead. An island inside
+    another one is merged into it, its names and actions included.
+
+    The islands are marked in the source before it is compiled, with a
+    data-island="N" attribute on the opening tag of the element. Nothing
+    else in the source moves, so errors point to the same lines. Elements
+    repeated by a [for] share their island, and their state.
+
+    A render outputs the page, then before </body> one JSON script
+    {"state": {name: value}, "islands": [{"names": [...], "actions": [code]}]}
+    holding each reactive name once, however many islands read it, and the
+    RUNTIME loader. A page without islands is plain HTML, nothing is sent
+    for the client. Every render reports its payload in a MalangePayload.
+'''
+
+import os
+import re
+import ast
+import json
+
+from typing import Any, Iterator, Optional
+
+from malange_core.internal.engine.lexer.main import LexerMain
+from malange_core.internal.engine.lexer.processor import LexerHeader
+from malange_core.internal.engine.parser import (MalangeTree, parse, INJECTION, ACTION, BLOCK, BRANCH,
+                                                 SOURCE, TAG, SCRIPT, ELEMENT, ESCAPE)
+from malange_core.internal.engine.compiler import RENDER, SRC, MalangeTemplate, compile_template
+from malange_core.internal.engine.executive import ExecutiveTable
+from malange_core.internal.engine.reactive import MalangeReact, MalangeComputed
+from malange_core.internal.engine.render import namespace
+
+REACTIVE = frozenset(("react", "computed", "MalangeReact", "MalangeComputed")) # Calls making a reactive name.
+VOID     = frozenset(("area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+                      "meta", "param", "source", "track", "wbr")) # Elements without a closing tag.
+DOCUMENT = frozenset(("html", "head", "body")) # Never an island, the whole page would be one.
+
+TAG_OPEN   = re.compile(r"<(/?)([A-Za-z][\w:.-]*)")
+TAG_END    = re.compile(r"""(?:"[^"]*"|'[^']*'|[^"'>])*>""")
+COMMENT    = re.compile(r"<!--.*?(?:-->|\Z)", re.S)
+IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+
+WRAPPER = "malange-island" # Element wrapping an island that is not one element.
+RUNTIME = ('<script>(()=>{const page=JSON.parse(document.querySelector("script[data-islands]").textContent);'
+           'page.islands.forEach((island,id)=>{island.nodes=document.querySelectorAll(\'[data-island="\'+id+\'"]\')});'
+           'window.__malange_islands__=page;'
+           'document.dispatchEvent(new CustomEvent("malange:islands",{detail:page}));})();</script>')
+# The loader, it finds the nodes of every island and hands them, with the state, to the client runtime.
+
+class MalangeIsland:
+    '''A reactive part of a page.'''
+    __slots__ = ("index", "tag", "start", "end", "names", "actions")
+    def __init__(self, tag: Optional[str], start: int, end: int, names: set[str], actions: list[str]):
+        '''
+            parameter:
+                tag     str  : The name of the element, None if it is wrapped.
+                start   int  : Start offset in the source.
+                end     int  : End offset in the source (exclusive).
+                names   set  : The reactive names it reads, its state.
+                actions list : The code of its @{ ... } actions.
+        '''
+        self.index   : int           = -1 # Its number, in source order.
+        self.tag     : Optional[str] = tag
+        self.start   : int           = start
+        self.end     : int           = end
+        self.names   : set[str]      = names
+        self.actions : list[str]     = actions
+    def __repr__(self) -> str:
+        return f"MalangeIsland({self.index}, {self.tag or WRAPPER}, {self.start}, {self.end}, {sorted(self.names)})"
+
+class MalangePayload:
+    '''What a render of a page sends, in bytes.'''
+    __slots__ = ("html", "state", "runtime", "islands")
+    def __init__(self, html: int, state: int, runtime: int, islands: int):
+        self.html    : int = html    # The page itself.
+        self.state   : int = state   # The JSON script of the islands.
+        self.runtime : int = runtime # The RUNTIME loader, 0 without islands.
+        self.islands : int = islands
+    @property
+    def total(self) -> int:
+        return self.html + self.state + self.runtime
+    def __repr__(self) -> str:
+        return (f"MalangePayload(html={self.html}, state={self.state}, runtime={self.runtime}, "
+                f"islands={self.islands}, total={self.total})")
+
+def names_in(code: str) -> set[str]:
+    '''Return the names read by a piece of code, every identifier in it if it is not valid alone.'''
+    try:
+        tree = ast.parse(code.strip(), mode="exec")
+    except SyntaxError: # E.g. the arguments of a block, "x in items" or "cache key ttl=3".
+        return set(IDENTIFIER.findall(code))
+    return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)}
+
+def reactive_names(code: str) -> set[str]:
+    '''Return the names a script assigns from react() or computed(), nothing if it is not valid.'''
+    try:
+        tree = ast.parse(code)
+    except SyntaxError: # Reported by the compiler.
+        return set()
+    found = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Assign, ast.AnnAssign)) and isinstance(node.value, ast.Call):
+            function = node.value.func
+            called   = function.id if isinstance(function, ast.Name) else \
+                       function.attr if isinstance(function, ast.Attribute) else None
+            if called in REACTIVE:
+                for target in node.targets if isinstance(node, ast.Assign) else (node.target,):
+                    found.update(name.id for name in ast.walk(target) if isinstance(name, ast.Name))
+    return found
+
+def script_of(tree: MalangeTree, source: str, path: str) -> str:
+    '''Return the code of the script of a template, from its [script/] block or its src file.'''
+    for index in range(len(tree)):
+        kind = tree.kinds[index]
+        if kind == SCRIPT:
+            return source[tree.heads[index]:tree.tails[index]]
+        if kind == SOURCE:
+            match = SRC.search(source, tree.starts[index], tree.ends[index])
+            if match is not None:
+                try:
+                    with open(os.path.join(os.path.dirname(path), match.group(1) or match.group(2)),
+                              encoding="utf-8") as file:
+                        return file.read()
+                except OSError: # Reported by the compiler.
+                    return ""
+    return ""
+
+def masked(tree: MalangeTree, source: str) -> str:
+    '''Return the source with the Malange syntax, comments and <style>/<script> content blanked out.'''
+    kinds, starts, ends, heads, tails = tree.kinds, tree.starts, tree.ends, tree.heads, tree.tails
+    spans = []
+    for index in range(1, len(tree)):
+        kind = kinds[index]
+        if kind in (INJECTION, ACTION, SOURCE, TAG, SCRIPT, ESCAPE):
+            spans.append((starts[index], ends[index]))
+        elif kind == BLOCK:
+            spans.append((starts[index], heads[index]))
+            spans.append((tails[index], ends[index]))
+        elif kind == BRANCH:
+            spans.append((starts[index], heads[index]))
+        elif kind == ELEMENT and heads[index] != -1:
+            spans.append((heads[index], ends[index] if tails[index] == -1 else tails[index]))
+    pieces, last = [], 0
+    for start, end in sorted(spans): # Nested spans are inside the one before them.
+        if end <= last:
+            continue
+        start = max(start, last)
+        pieces.append(source[last:start])
+        pieces.append(" " * (end - start))
+        last = end
+    pieces.append(source[last:])
+    return COMMENT.sub(lambda match: " " * len(match.group()), "".join(pieces))
+
+def elements(text: str) -> Iterator[tuple[str, int, int, int]]:
+    '''
+        Yield (name, start, end of its name, end) for every HTML element of the masked source.
+        An element that is never closed, or closed out of order, ends with its opening tag.
+    '''
+    stack    = [] # (name, start, end of its name, end of the opening tag) of the open elements.
+    position = 0
+    while (match := TAG_OPEN.search(text, position)) is not None:
+        close    = TAG_END.match(text, match.end())
+        position = len(text) if close is None else close.end()
+        name     = match.group(2).lower()
+        if match.group(1): # A closing tag, the elements it skips were never closed.
+            if any(entry[0] == name for entry in stack):
+                while stack:
+                    entry = stack.pop()
+                    if entry[0] == name:
+                        yield entry[0], entry[1], entry[2], position
+                        break
+                    yield entry
+        elif name in VOID or text[position - 2:position] == "/>":
+            yield name, match.start(), match.end(), position
+        else:
+            stack.append((name, match.start(), match.end(), position))
+    yield from stack
+
+def triggers(tree: MalangeTree, source: str, reactive: set[str]) -> Iterator[tuple[int, int, set[str], Optional[str]]]:
+    '''Yield (start, end, reactive names read, action code) for every trigger, see the module docstring.'''
+    kinds, starts, ends, heads, tails = tree.kinds, tree.starts, tree.ends, tree.heads, tree.tails
+    for index in range(1, len(tree)):
+        kind = kinds[index]
+        if kind == ACTION:
+            code = source[heads[index]:tails[index]]
+            yield starts[index], ends[index], names_in(code) & reactive, code.strip()
+        elif kind == INJECTION:
+            read = names_in(source[heads[index]:tails[index]]) & reactive
+            if read:
+                yield starts[index], ends[index], read, None
+        elif kind == BLOCK or kind == BRANCH:
+            skip = 1 if kind == BLOCK else 2 # [name or [/name.
+            read = names_in(source[starts[index] + skip + len(tree.name(index)):heads[index] - 2]) & reactive
+            if read:
+                block = index if kind == BLOCK else tree.parents[index]
+                yield starts[block], ends[block], read, None
+
+def find_islands(tree: MalangeTree, source: str, path: str) -> list[MalangeIsland]:
+    '''Return the islands of a template in source order, numbered, see the module docstring.'''
+    reactive = reactive_names(script_of(tree, source, path))
+    spans    = [entry for entry in elements(masked(tree, source)) if entry[0] not in DOCUMENT]
+    found    = {} # (start, end) -> MalangeIsland.
+    for start, end, read, action in triggers(tree, source, reactive):
+        holder = None # The innermost element holding the trigger, the one starting last.
+        for entry in spans:
+            if entry[1] <= start and end <= entry[3] and (holder is None or entry[1] > holder[1]):
+                holder = entry
+        key    = (start, end) if holder is None else (holder[1], holder[3])
+        island = found.get(key)
+        if island is None:
+            island = found[key] = MalangeIsland(None if holder is None else holder[0], *key, set(), [])
+        island.names |= read
+        if action is not None:
+            island.actions.append(action)
+    islands = []
+    for island in sorted(found.values(), key=lambda island: (island.start, -island.end)):
+        if islands and island.end <= islands[-1].end: # Inside the last one kept, merged into it.
+            islands[-1].names |= island.names
+            islands[-1].actions.extend(island.actions)
+            continue
+        island.index = len(islands)
+        islands.append(island)
+    return islands
+
+def mark(source: str, islands: list[MalangeIsland]) -> str:
+    '''Return the source with every island marked, no line moves.'''
+    edits = [] # (offset, closes first, text).
+    for island in islands:
+        if island.tag is None:
+            edits.append((island.start, 1, f'<{WRAPPER} data-island="{island.index}" style="display:contents">'))
+            edits.append((island.end,   0, f"</{WRAPPER}>"))
+        else:
+            edits.append((island.start + 1 + len(island.tag), 1, f' data-island="{island.index}"'))
+    pieces, last = [], 0
+    for offset, _, text in sorted(edits, key=lambda edit: edit[:2]):
+        pieces.append(source[last:offset])
+        pieces.append(text)
+        last = offset
+    pieces.append(source[last:])
+    return "".join(pieces)
+
+def state_of(value: Any) -> Any:
+    '''Return what a reactive name holds, without tracking the read.'''
+    if isinstance(value, MalangeReact):
+        return value.peek()
+    if isinstance(value, MalangeComputed):
+        return value.value
+    return value
+
+class MalangeIslandPage:
+    '''A template compiled for the islands output mode.'''
+    def __init__(self, source: str, path: str, digest: str = "", executives: Optional[ExecutiveTable] = None):
+        '''
+            parameter:
+                source     str            : The file text.
+                path       str            : Path of the file.
+                digest     str            : Hash of the source.
+                executives ExecutiveTable : Executives by (tag, attribute, value), see executive_table().
+            raise:
+                SyntaxError : The template is not valid, see compile_template().
+        '''
+        tree = parse(LexerMain(LexerHeader(source, path, "")).process(), source)
+        self.path     : str                 = path
+        self.islands  : list[MalangeIsland] = find_islands(tree, source, path)
+        self.template : MalangeTemplate     = compile_template(mark(source, self.islands) if self.islands else source,
+                                                               path, digest, executives)
+    def render(self, context: Optional[dict[str, Any]] = None) -> tuple[bytes, MalangePayload]:
+        '''
+            Render the page with the state of its islands.
+
+            parameter:
+                context dict : Names given to the template before its script runs.
+            return:
+                bytes          : The output.
+                MalangePayload : Its size, by part.
+            raise:
+                TypeError : The template awaits.
+        '''
+        if self.template.program is None:
+            raise TypeError(f"{self.path} awaits, the islands output mode renders it as a static page.")
+        names = namespace(self.template, context)
+        html  = b"".join(names[RENDER]())
+        if not self.islands:
+            return html, MalangePayload(len(html), 0, 0, 0)
+        read    = sorted(set().union(*(island.names for island in self.islands)))
+        data    = json.dumps({"state": {name: state_of(names.get(name)) for name in read},
+                              "islands": [{"names": sorted(island.names), "actions": island.actions}
+                                          for island in self.islands]},
+                             default=str, separators=(",", ":")).replace("</", "<\\/") # Never ends the script.
+        state   = f'<script type="application/json" data-islands>{data}</script>'.encode("utf-8")
+        runtime = RUNTIME.encode("utf-8")
+        body    = html.rfind(b"</body>")
+        if body == -1:
+            body = len(html)
+        return html[:body] + state + runtime + html[body:], MalangePayload(len(html), len(state), len(runtime),
+                                                                          len(self.islands))
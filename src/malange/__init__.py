@@ -0,0 +1,70 @@
+'''
+
+malange
+
+The command line of Malange, installed as malange:
+    malange build [PROJECT] [--config config.py] [--output DIR] [--force]
+    malange serve [PROJECT] [--config config.py] [--bind HOST:PORT] [--workers N]
+
+build starts the project in PROJECT (the current directory by default)
+from its config module, then exports every template to static files. A
+build after the first one only renders the pages whose inputs changed, see
+malange_core.internal.manager.export. It exits with 1 if a page failed.
+
+serve runs the project under the pre-fork WSGI server: the project is
+loaded once, then shared by the workers. SIGHUP reloads it, see
+malange_core.internal.gateway.prefork.
+
+'''
+
+import os
+import sys
+import argparse
+
+from malange_core.internal.manager.plugin import load_file
+from malange_core.internal.manager.project import MalangeProject
+from malange_core.internal.gateway.prefork import MalangePrefork
+
+def load_project(pwd: str, config: str) -> MalangeProject:
+    '''Start the project in pwd from its config module, raise ImportError if there is none.'''
+    pwd = os.path.abspath(pwd)
+    if pwd not in sys.path: # The config imports from the project, like the run.py of a project would.
+        sys.path.insert(0, pwd)
+    project = MalangeProject()
+    project(load_file("config", os.path.join(pwd, config)), pwd)
+    return project
+
+def main(argv: list[str] = None) -> int:
+    parser   = argparse.ArgumentParser(prog="malange", description="The Malange framework.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    building = commands.add_parser("build", help="Export the project to static files, rendering only what changed.")
+    building.add_argument("project", nargs="?", default=".", help="Directory of the project.")
+    building.add_argument("--config", default="config.py", help="Config module, relative to the project.")
+    building.add_argument("--output", help="Output directory, EXPORT.OUTPUT of the config by default.")
+    building.add_argument("--force",  action="store_true", help="Render every page, whatever changed.")
+    serving  = commands.add_parser("serve", help="Serve the project with pre-forked workers.")
+    serving.add_argument("project", nargs="?", default=".", help="Directory of the project.")
+    serving.add_argument("--config",  default="config.py", help="Config module, relative to the project.")
+    serving.add_argument("--bind",    default="127.0.0.1:8000", help="Address to listen on, HOST:PORT.")
+    serving.add_argument("--workers", type=int, help="Workers, GATEWAY.WORKERS or the CPU count by default.")
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        host, _, port = args.bind.rpartition(":")
+        try: # The project is loaded in each generation of the server, never here.
+            MalangePrefork(lambda: load_project(args.project, args.config), host or "127.0.0.1", int(port),
+                           args.workers).serve()
+        except (OSError, RuntimeError) as error:
+            print(f"malange: {error}", file=sys.stderr)
+            return 1
+        return 0
+    try:
+        project = load_project(args.project, args.config)
+    except ImportError as error:
+        print(f"malange: {error}", file=sys.stderr)
+        return 2
+    result = project.export(args.output, args.force)
+    print(f"{len(result.rendered)} rendered ({result.written} written), {len(result.skipped)} unchanged, "
+          f"{len(result.removed)} removed, {result.assets} asset(s) copied.")
+    for name, error in result.failures.items():
+        print(f"malange: {name}: {error}", file=sys.stderr)
+    return 1 if result.failures else 0